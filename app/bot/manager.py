@@ -1,10 +1,17 @@
 from typing import Optional, List, Dict
 from app.bot.telegram_api import telegram_api
+from app.bot.responses import ResponseBuilder
+from app.bot.media import media_uploads
+from app.database.connection import AsyncSessionLocal
 from app.database.crud import BotCRUD
+from app.bot.registry import bot_registry
 from app.redis.cache import cache_manager
+from app.utils.metrics import metrics
 from app.config import settings
+from functools import partial
 import secrets
 import hashlib
+import os
 
 class BotManager:
     @staticmethod
@@ -43,6 +50,7 @@ class BotManager:
         }
         
         bot = await BotCRUD.create_bot(db, bot_data, user_id)
+        bot_registry.set_bot(bot)
         
         return {
             'success': True,
@@ -55,23 +63,26 @@ class BotManager:
         }
     
     @staticmethod
-    async def update_bot_config(db, bot_id: str, config: Dict) -> bool:
+    async def update_bot_config(db, bot_id: str, config: Dict, user_id: Optional[int] = None) -> bool:
         """Atualizar configuração do bot"""
-        await BotCRUD.update_bot(db, bot_id, config)
+        bot = await BotCRUD.update_bot(db, bot_id, config, user_id)
         await cache_manager.invalidate_bot_config(bot_id)
-        return True
-    
-    @staticmethod
-    async def get_bot_config(db, bot_id: str) -> Optional[Dict]:
-        """Obter configuração do bot com cache"""
-        cached = await cache_manager.get_bot_config(bot_id)
-        if cached:
-            return cached
         
-        bot = await BotCRUD.get_bot_by_id(db, bot_id)
-        if not bot:
-            return None
+        if bot:
+            bot_registry.set_bot(bot)
+            # Plano do /start calculado aqui, não a cada update
+            saved = BotManager.config_of(bot)
+            await cache_manager.set_bot_config(bot_id, saved)
+            
+            # Mídia nova: file_id obtido em segundo plano, antes do primeiro /start
+            if saved['media_url'] and not saved['media_file_id'] and settings.MEDIA_WARMUP_CHAT_ID:
+                media_uploads.warm(BotManager.warm_start_media(bot_id, saved))
         
+        return bot is not None
+    
+    @staticmethod
+    def config_of(bot) -> Dict:
+        """Configuração do bot como fica no cache (com o plano de envio do /start)"""
         config = {
             'bot_id': bot.bot_id,
             'token': bot.token,
@@ -82,10 +93,149 @@ class BotManager:
             'message_2': bot.message_2,
             'plans': bot.plans or []
         }
+        config['start_plan'] = ResponseBuilder.start_plan(config)
+        return config
+    
+    @staticmethod
+    async def get_bot_config(db, bot_id: str) -> Optional[Dict]:
+        """Obter configuração do bot com cache"""
+        cached = await cache_manager.get_bot_config(bot_id)
+        if cached:
+            return cached
+        
+        bot = await BotCRUD.get_bot_by_id(db, bot_id)
+        if not bot:
+            return None
+        
+        config = BotManager.config_of(bot)
         
         await cache_manager.set_bot_config(bot_id, config)
         return config
     
+    @staticmethod
+    async def send_start_step(db, bot_id: str, chat_id: str, config: Dict, step: Dict) -> bool:
+        """Enviar um passo do plano do /start (mídia com legenda ou mensagem)"""
+        if step['media']:
+            if await BotManager.send_start_media(db, bot_id, chat_id, config, step['text'], step['reply_markup']):
+                return True
+            if not step['text']:
+                return False
+            # Mídia falhou: texto e botões da legenda ainda chegam como mensagem
+            print("⚠️ Mídia não enviada, legenda vai como mensagem")
+        
+        result = await telegram_api.send_message(config['token'], chat_id, step['text'], step['reply_markup'])
+        return result is not None
+    
+    @staticmethod
+    async def send_start_media(db, bot_id: str, chat_id: str, config: Dict,
+                               caption: str = None, reply_markup: Dict = None) -> bool:
+        """Enviar mídia do /start (via file_id quando disponível)"""
+        if not config.get('media_url') and not config.get('media_file_id'):
+            return False
+        
+        token = config['token']
+        media_type = config.get('media_type', 'photo')
+        print(f"📸 Enviando mídia...")
+        
+        if config.get('media_file_id'):
+            print(f"⚡ Usando file_id existente: {config['media_file_id'][:20]}...")
+            success = await telegram_api.send_media_by_file_id(
+                token,
+                chat_id,
+                config['media_file_id'],
+                media_type,
+                caption,
+                reply_markup
+            )
+            if success:
+                print(f"✅ Mídia enviada via file_id (super rápido!)")
+            return success
+        
+        print(f"📤 Primeira vez - obtendo file_id")
+        file_id, shared = await media_uploads.run(
+            (bot_id, config['media_url']),
+            partial(BotManager._upload_start_media, db, bot_id, chat_id, config, caption, reply_markup)
+        )
+        
+        if not file_id:
+            return False
+        
+        if shared:
+            # Outro /start (ou o pré-aquecimento) fez o upload: aqui basta o file_id
+            return await telegram_api.send_media_by_file_id(token, chat_id, file_id, media_type, caption, reply_markup)
+        
+        return True
+    
+    @staticmethod
+    async def warm_start_media(bot_id: str, config: Dict):
+        """Obter o file_id da mídia nova no chat de aquecimento, sem esperar o primeiro /start
+        
+        O chat (`MEDIA_WARMUP_CHAT_ID`) é o mesmo para todos os bots, e o
+        Telegram só deixa um bot enviar para quem já falou com ele. Quando o
+        bot não alcança o chat o pré-aquecimento é pulado e o file_id sai no
+        primeiro /start, como sem pré-aquecimento.
+        """
+        try:
+            if not await telegram_api.get_chat(config['token'], settings.MEDIA_WARMUP_CHAT_ID):
+                metrics.increment('media_warmups_skipped')
+                print(f"⚠️ Bot {bot_id} sem acesso ao chat de aquecimento, mídia fica para o primeiro /start")
+                return
+            
+            async with AsyncSessionLocal() as db:
+                file_id, shared = await media_uploads.run(
+                    (bot_id, config['media_url']),
+                    partial(BotManager._upload_start_media, db, bot_id, settings.MEDIA_WARMUP_CHAT_ID, config)
+                )
+            
+            if file_id and not shared:
+                metrics.increment('media_warmups')
+                print(f"🔥 Mídia do bot {bot_id} pré-aquecida")
+        
+        except Exception as e:
+            print(f"❌ Erro no pré-aquecimento da mídia do bot {bot_id}: {str(e)}")
+    
+    @staticmethod
+    async def _upload_start_media(db, bot_id: str, chat_id: str, config: Dict,
+                                  caption: str = None, reply_markup: Dict = None) -> Optional[str]:
+        """Enviar a mídia pela URL, salvar o file_id e apagar o arquivo local (um por vez via media_uploads)"""
+        file_id = await telegram_api.send_media_and_get_file_id(
+            config['token'],
+            chat_id,
+            config['media_url'],
+            config.get('media_type', 'photo'),
+            caption,
+            reply_markup
+        )
+        
+        if not file_id:
+            print(f"❌ Não foi possível obter file_id para a mídia")
+            return None
+        
+        print(f"✅ File_id obtido: {file_id[:20]}...")
+        
+        # Salvar file_id no banco (invalida cache e atualiza registro)
+        await BotManager.update_bot_config(db, bot_id, {
+            'media_file_id': file_id,
+            'media_file_processed': True
+        })
+        print(f"🔄 Cache invalidado para bot {bot_id}")
+        
+        # Deletar arquivo local se existir
+        try:
+            filename = config['media_url'].split('/')[-1].split('?')[0]
+            filepath = f"static/uploads/{filename}"
+            
+            if os.path.exists(filepath):
+                os.remove(filepath)
+                print(f"🗑️ Arquivo local deletado: {filename}")
+            else:
+                print(f"📁 Arquivo não encontrado localmente: {filename}")
+                
+        except Exception as e:
+            print(f"⚠️ Não foi possível deletar arquivo: {e}")
+        
+        return file_id
+    
     @staticmethod
     async def remove_bot(db, bot_id: str, user_id: int) -> bool:
         """Remover bot do sistema"""
@@ -96,6 +246,7 @@ class BotManager:
         await telegram_api.delete_webhook(bot.token)
         await BotCRUD.delete_bot(db, bot_id, user_id)
         await cache_manager.invalidate_bot_config(bot_id)
+        bot_registry.remove(bot_id)
         
         return True
     
@@ -0,0 +1,83 @@
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+from collections import OrderedDict
+from app.utils.metrics import metrics
+from app.config import settings
+import asyncio
+
+Upload = Callable[[], Awaitable[Optional[str]]]
+
+class MediaUploads:
+    """Obtenção do file_id da mídia do /start: um upload por (bot, mídia) em andamento
+    
+    Enquanto o bot não tem file_id, cada /start faria o Telegram baixar a URL
+    de novo e gravaria o file_id no banco. Aqui o primeiro executa o upload e
+    os que chegam durante ele esperam o mesmo resultado (e enviam pelo
+    file_id); se ele não obtiver o file_id, o primeiro deles tenta de novo. O
+    file_id obtido fica guardado para configs lidas do cache antes da
+    gravação, só para as `max_file_ids` mídias mais recentes (depois disso a
+    config já traz o file_id). Vale por processo; entre processos o
+    pré-aquecimento ao salvar a mídia (`warm`) tira a corrida do primeiro /start.
+    """
+    
+    def __init__(self, max_file_ids: int):
+        self.max_file_ids = max_file_ids
+        self.flights: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.file_ids: OrderedDict = OrderedDict()
+        self.warming: Set[asyncio.Task] = set()
+    
+    async def run(self, key: Tuple[str, str], upload: Upload) -> Tuple[Optional[str], bool]:
+        """Executar `upload` ou esperar o que já está em andamento: (file_id, compartilhado)"""
+        while True:
+            if key in self.file_ids:
+                return self.file_ids[key], True
+            
+            flight = self.flights.get(key)
+            if flight is None:
+                break
+            
+            metrics.increment('media_upload_shared')
+            file_id = await asyncio.shield(flight)
+            if file_id:
+                return file_id, True
+        
+        flight = asyncio.get_running_loop().create_future()
+        self.flights[key] = flight
+        try:
+            file_id = await upload()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Sem ninguém esperando a exceção não fica pendente no loop
+            flight.exception()
+            raise
+        else:
+            if file_id:
+                self.file_ids[key] = file_id
+                while len(self.file_ids) > self.max_file_ids:
+                    self.file_ids.popitem(last=False)
+            flight.set_result(file_id)
+            return file_id, False
+        finally:
+            self.flights.pop(key, None)
+    
+    def warm(self, job: Awaitable):
+        """Rodar um pré-aquecimento em segundo plano (acompanhado até o desligamento)"""
+        task = asyncio.create_task(job)
+        self.warming.add(task)
+        task.add_done_callback(self.warming.discard)
+    
+    async def close(self, timeout: float):
+        """Aguardar os pré-aquecimentos em andamento por até `timeout` segundos"""
+        if not self.warming:
+            return
+        
+        done, pending = await asyncio.wait(list(self.warming), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            print(f"⚠️ {len(pending)} pré-aquecimentos de mídia interrompidos no desligamento")
+
+media_uploads = MediaUploads(max_file_ids=settings.MEDIA_FILE_ID_MEMO_SIZE)
@@ -0,0 +1,78 @@
+from typing import Dict, Optional
+from sqlalchemy import select
+from app.database.crud import BotCRUD
+from app.database.models import Bot
+from app.config import settings
+import time
+
+class BotRegistry:
+    """Registro em memória dos bots (bot_id → token, secret, status, versão)"""
+
+    def __init__(self):
+        self._bots: Dict[str, Dict] = {}
+        self._missing: Dict[str, float] = {}
+        self.loaded = False
+
+    async def warm(self, db) -> int:
+        """Carregar todos os bots com uma única query"""
+        result = await db.execute(
+            select(Bot.bot_id, Bot.token, Bot.webhook_secret, Bot.is_active)
+        )
+
+        bots = {}
+        for row in result:
+            previous = self._bots.get(row.bot_id)
+            bots[row.bot_id] = {
+                'token': row.token,
+                'webhook_secret': row.webhook_secret,
+                'is_active': bool(row.is_active),
+                'version': previous['version'] if previous else 1
+            }
+
+        self._bots = bots
+        self._missing.clear()
+        self.loaded = True
+        return len(bots)
+
+    def get(self, bot_id: str) -> Optional[Dict]:
+        """Buscar bot no registro (sem acessar o banco)"""
+        return self._bots.get(bot_id)
+
+    def set_bot(self, bot: Bot) -> Dict:
+        """Registrar/atualizar bot a partir do modelo, incrementando a versão"""
+        previous = self._bots.get(bot.bot_id)
+        entry = {
+            'token': bot.token,
+            'webhook_secret': bot.webhook_secret,
+            'is_active': bool(bot.is_active) if bot.is_active is not None else True,
+            'version': previous['version'] + 1 if previous else 1
+        }
+        self._bots[bot.bot_id] = entry
+        self._missing.pop(bot.bot_id, None)
+        return entry
+
+    def remove(self, bot_id: str) -> None:
+        """Remover bot do registro"""
+        self._bots.pop(bot_id, None)
+
+    async def resolve(self, db, bot_id: str) -> Optional[Dict]:
+        """Buscar bot no registro; se faltar, consultar o banco uma única vez"""
+        entry = self._bots.get(bot_id)
+        if entry:
+            return entry
+
+        # Bots inexistentes ficam em cache negativo para não martelar o banco
+        missed_at = self._missing.get(bot_id)
+        if missed_at and time.time() - missed_at < settings.BOT_REGISTRY_MISS_TTL:
+            return None
+
+        bot = await BotCRUD.get_bot_by_id(db, bot_id)
+        if not bot:
+            if len(self._missing) >= settings.BOT_REGISTRY_MISS_MAX:
+                self._missing.clear()
+            self._missing[bot_id] = time.time()
+            return None
+
+        return self.set_bot(bot)
+
+bot_registry = BotRegistry()
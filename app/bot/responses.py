@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional, Tuple
+
+# Limite de legenda do Telegram (caracteres UTF-16 depois do parse das entidades)
+CAPTION_LIMIT = 1024
+
+class ResponseBuilder:
+    """Montagem das respostas do bot (compartilhada entre webhook e worker)"""
+    
+    @staticmethod
+    def plans_keyboard(plans: List) -> Optional[Dict]:
+        """Montar teclado inline com os botões dos planos"""
+        if not plans:
+            return None
+        
+        keyboard = []
+        for i, plan in enumerate(plans):
+            if isinstance(plan, dict):
+                plan_text = f"💎 {plan.get('name', 'Plano')} - R$ {plan.get('value', '0')} ({plan.get('days', '30')} dias)"
+            else:
+                plan_text = str(plan)
+            
+            keyboard.append([{
+                'text': plan_text,
+                'callback_data': f'buy_plan_{i}'
+            }])
+        
+        return {'inline_keyboard': keyboard}
+    
+    @staticmethod
+    def start_messages(config: Dict) -> List[Tuple[str, Optional[Dict]]]:
+        """Mensagens do /start em ordem: (texto, reply_markup)"""
+        reply_markup = ResponseBuilder.plans_keyboard(config.get('plans', []))
+        message_1 = config.get('message_1')
+        message_2 = config.get('message_2')
+        
+        # Tem as duas mensagens: mensagem 1 normal, mensagem 2 com botões dos planos
+        if message_1 and message_2:
+            return [(message_1, None), (message_2, reply_markup)]
+        
+        # Só uma das mensagens: envia com botões dos planos
+        if message_1 or message_2:
+            return [(message_1 or message_2, reply_markup)]
+        
+        # Sem texto mas com planos: envia só os botões
+        if reply_markup:
+            return [("📋 *Escolha seu plano:*", reply_markup)]
+        
+        # Sem texto nem planos: só a mídia
+        return []
+    
+    @staticmethod
+    def start_plan(config: Dict) -> List[Dict]:
+        """Menor sequência de chamadas do /start: passos {'media', 'text', 'reply_markup'}
+        
+        Com mídia configurada, a primeira mensagem vai como legenda da
+        foto/vídeo (com os botões, se estiverem nela) quando cabe no limite de
+        legenda; o resto sai como sendMessage. É calculado quando a configuração
+        é montada (`BotManager.config_of`, ao salvar) e fica no cache junto com
+        ela em `start_plan`.
+        """
+        if 'start_plan' in config:
+            return config['start_plan']
+        
+        steps = [
+            {'media': False, 'text': text, 'reply_markup': reply_markup}
+            for text, reply_markup in ResponseBuilder.start_messages(config)
+        ]
+        if not config.get('media_url') and not config.get('media_file_id'):
+            return steps
+        
+        # Texto bruto conta pelo menos o que o Telegram conta depois do Markdown
+        if steps and len(steps[0]['text'].encode('utf-16-le')) // 2 <= CAPTION_LIMIT:
+            steps[0]['media'] = True
+            return steps
+        
+        return [{'media': True, 'text': None, 'reply_markup': None}] + steps
+    
+    @staticmethod
+    def message_payload(chat_id, text: str, reply_markup: Dict = None) -> Dict:
+        """Parâmetros de sendMessage (mesmo formato do TelegramAPI.send_message)"""
+        payload = {'chat_id': chat_id, 'text': text, 'parse_mode': 'Markdown'}
+        if reply_markup:
+            payload['reply_markup'] = reply_markup
+        return payload
+    
+    @staticmethod
+    def media_payload(chat_id, media_type: str, media: str, caption: str = None, reply_markup: Dict = None) -> Dict:
+        """Parâmetros de sendPhoto/sendVideo, com legenda e botões opcionais"""
+        field = 'video' if media_type == 'video' else 'photo'
+        payload = {'chat_id': chat_id, field: media}
+        if caption:
+            payload['caption'] = caption
+            payload['parse_mode'] = 'Markdown'
+        if reply_markup:
+            payload['reply_markup'] = reply_markup
+        return payload
+    
+    @staticmethod
+    def webhook_actions(info: Dict, config: Dict) -> Optional[List[Tuple[str, Dict]]]:
+        """Resposta do update como chamadas da Bot API em ordem: (método, parâmetros)
+        
+        None quando a resposta precisa do cliente completo (primeiro envio da
+        mídia faz upload e guarda o file_id); lista vazia quando não há o que responder.
+        """
+        chat_id = info.get('chat_id')
+        
+        if info['type'] == 'message' and info.get('text') == '/start':
+            actions = []
+            for step in ResponseBuilder.start_plan(config):
+                if not step['media']:
+                    actions.append(('sendMessage', ResponseBuilder.message_payload(chat_id, step['text'], step['reply_markup'])))
+                    continue
+                
+                if not config.get('media_file_id'):
+                    return None
+                
+                method = 'sendVideo' if config.get('media_type') == 'video' else 'sendPhoto'
+                actions.append((method, ResponseBuilder.media_payload(
+                    chat_id, config.get('media_type'), config['media_file_id'], step['text'], step['reply_markup']
+                )))
+            return actions
+        
+        if info['type'] == 'callback_query' and (info.get('callback_data') or '').startswith('buy_plan_'):
+            try:
+                plan_index = int(info['callback_data'].replace('buy_plan_', ''))
+            except ValueError:
+                return []
+            message = ResponseBuilder.plan_selected_text(config.get('plans', []), plan_index)
+            if not message:
+                return []
+            return [
+                ('answerCallbackQuery', {
+                    'callback_query_id': info.get('callback_id'),
+                    'text': "Plano selecionado!",
+                    'show_alert': False
+                }),
+                ('sendMessage', ResponseBuilder.message_payload(chat_id, message))
+            ]
+        
+        return []
+    
+    @staticmethod
+    def plan_selected_text(plans: List, plan_index: int) -> Optional[str]:
+        """Texto de confirmação do plano escolhido"""
+        if plan_index < 0 or plan_index >= len(plans):
+            return None
+        
+        plan = plans[plan_index]
+        if isinstance(plan, dict):
+            message = "✅ *Plano Selecionado:*\n\n"
+            message += f"📦 *Nome:* {plan.get('name')}\n"
+            message += f"💰 *Valor:* R$ {plan.get('value')}\n"
+            message += f"📅 *Duração:* {plan.get('days')} dias\n\n"
+            message += "_Para continuar, entre em contato com o suporte._"
+            return message
+        
+        return f"✅ Você selecionou: {plan}"
@@ -0,0 +1,123 @@
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from collections import deque
+from app.utils.metrics import metrics
+from app.config import settings
+import asyncio
+
+Step = Callable[[], Awaitable]
+
+class ChatSendFailed(Exception):
+    """Sequência interrompida: `sent` passos saíram antes da falha"""
+    
+    def __init__(self, sent: int, error: str):
+        self.sent = sent
+        self.error = error
+        super().__init__(error)
+
+class ChatSender:
+    """Sequências de envio por chat executadas em ordem, fora da lane do worker
+    
+    O processador monta a resposta (mídia, mensagens) como uma lista de
+    passos e entrega aqui. Cada chat tem uma fila e uma task que executa as
+    sequências na ordem de chegada, um passo por vez, então a ordem dentro do
+    chat é garantida. O ritmo vem dos buckets do `OutboundScheduler` (sem
+    sleep fixo), e a lane fica livre para o próximo update assim que a
+    sequência é entregue. Acima de `max_pending` sequências, `submit` espera
+    (backpressure para as lanes).
+    
+    `submit` devolve um future que termina com a sequência: o worker só
+    confirma o item na fila depois dele, e uma falha (erro, 429 acima do teto
+    do make_request, desligamento) vira `ChatSendFailed` para a retentativa.
+    """
+    
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self.queues: Dict[str, Deque[Tuple[List[Step], asyncio.Future]]] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.pending = 0
+        self._room = asyncio.Event()
+        self._room.set()
+    
+    async def submit(self, key: str, steps: List[Step]) -> Optional[asyncio.Future]:
+        """Enfileirar a sequência do chat `key` (bot_id:chat_id); o future dá o número de passos enviados"""
+        if not steps:
+            return None
+        
+        while self.pending >= self.max_pending:
+            self._room.clear()
+            await self._room.wait()
+        
+        done = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(key, deque()).append((steps, done))
+        self.pending += 1
+        if key not in self.tasks:
+            self.tasks[key] = asyncio.create_task(self._drain(key))
+        metrics.gauge('chat_send_pending', self.pending)
+        return done
+    
+    @staticmethod
+    def _fail(done: asyncio.Future, sent: int, error: str):
+        if not done.done():
+            done.set_exception(ChatSendFailed(sent, error))
+            # Quem não espera o resultado (resposta no webhook) não gera aviso de exceção perdida
+            done.exception()
+    
+    async def _drain(self, key: str):
+        queue = self.queues[key]
+        try:
+            while queue:
+                await self._run(key, *queue[0])
+                queue.popleft()
+                self.pending -= 1
+                self._room.set()
+        finally:
+            # Cancelado no desligamento: o que sobrou volta para o worker como falha
+            if queue:
+                metrics.increment('chat_send_dropped', len(queue))
+                for _, done in queue:
+                    self._fail(done, 0, 'envio interrompido no desligamento')
+                self.pending -= len(queue)
+                self._room.set()
+            self.queues.pop(key, None)
+            self.tasks.pop(key, None)
+    
+    async def _run(self, key: str, steps: List[Step], done: asyncio.Future):
+        """Executar os passos em ordem; uma falha interrompe o resto da sequência
+        
+        Passo que retorna None ou False também é falha: os métodos do
+        TelegramAPI registram o erro e retornam None em vez de levantar.
+        """
+        sent = 0
+        try:
+            for step in steps:
+                result = await step()
+                if result is None or result is False:
+                    raise Exception("envio recusado pela API do Telegram")
+                sent += 1
+        except asyncio.CancelledError:
+            self._fail(done, sent, 'envio interrompido no desligamento')
+            raise
+        except Exception as e:
+            print(f"❌ Erro no envio para {key} (passo {sent + 1}/{len(steps)}): {str(e)}")
+            metrics.increment('chat_send_failed')
+            self._fail(done, sent, str(e))
+            return
+        
+        metrics.increment('chat_send_sequences')
+        if not done.done():
+            done.set_result(sent)
+    
+    async def close(self, timeout: float):
+        """Aguardar as sequências pendentes por até `timeout` segundos (desligamento)"""
+        if not self.tasks:
+            return
+        
+        print(f"⏳ Aguardando envios pendentes de {len(self.tasks)} chats (até {timeout:.0f}s)")
+        done, pending = await asyncio.wait(list(self.tasks.values()), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            print(f"⚠️ Envios de {len(pending)} chats interrompidos no desligamento")
+
+chat_sender = ChatSender(max_pending=settings.CHAT_SEND_MAX_PENDING)
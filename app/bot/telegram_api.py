@@ -1,14 +1,134 @@
 import aiohttp
 import asyncio
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from app.config import settings
+from app.utils.metrics import metrics
 import hashlib
 import secrets
+import time
+
+class TelegramRetryAfter(Exception):
+    """429 do Telegram (flood control): só pode enviar de novo após `retry_after` segundos"""
+    
+    def __init__(self, retry_after: float, description: str = ''):
+        super().__init__(f"Telegram API Error: {description or 'Too Many Requests'} (retry after {retry_after:g}s)")
+        self.retry_after = retry_after
+        self.description = description
+
+class OutboundScheduler:
+    """Limites de envio do Telegram com buckets hierárquicos: bot → chat → grupo
+    
+    Cada envio precisa de ficha em todos os buckets do caminho (bot, chat e,
+    em grupos, o limite por minuto). As fichas são reservadas na hora (GCRA:
+    cada bucket guarda o instante teórico da próxima ficha) e o envio só
+    espera até o horário reservado: primeiro a vez no chat/grupo, depois a do
+    bot. Assim um chat atrasado não ocupa a vazão do bot no futuro, chats
+    diferentes saem no ritmo máximo do bot sem fila única e a ordem dentro do
+    chat é a ordem de chegada. Um 429 segura o bucket do bot até o
+    `retry_after`. Os buckets são do processo: com partições, todos os envios
+    de um bot saem do mesmo processo.
+    """
+    
+    def __init__(self, bot_rate: float, chat_rate: float, chat_burst: int, group_per_minute: float):
+        self.limits = {
+            'bot': (1 / bot_rate, max(int(bot_rate), 1)),
+            'chat': (1 / chat_rate, max(chat_burst, 1)),
+            'group': (60 / group_per_minute, max(chat_burst, 1))
+        }
+        self.tat: Dict[Tuple[str, str], float] = {}
+        self.held_until: Dict[str, float] = {}
+        self._prune_at = 10000
+    
+    def chat_buckets(self, bot_key: str, chat_id) -> list:
+        chat = f"{bot_key}:{chat_id}"
+        buckets = [('chat', chat)]
+        # Grupos e canais têm chat_id negativo
+        if str(chat_id).startswith('-'):
+            buckets.append(('group', chat))
+        return buckets
+    
+    def reserve(self, buckets: list, not_before: float = 0.0) -> float:
+        """Reservar a próxima ficha em todos os `buckets`; retorna quantos segundos esperar"""
+        now = time.monotonic()
+        start = max(now, not_before)
+        for kind, key in buckets:
+            interval, burst = self.limits[kind]
+            tat = self.tat.get((kind, key), now)
+            start = max(start, tat - (burst - 1) * interval)
+        
+        for kind, key in buckets:
+            interval, _ = self.limits[kind]
+            self.tat[(kind, key)] = max(self.tat.get((kind, key), now), start) + interval
+        
+        if len(self.tat) > self._prune_at:
+            self._prune(now)
+        return start - now
+    
+    def _prune(self, now: float):
+        """Descartar buckets cheios (instante teórico no passado equivale a bucket novo)"""
+        self.tat = {key: tat for key, tat in self.tat.items() if tat > now}
+        self.held_until = {key: until for key, until in self.held_until.items() if until > now}
+        self._prune_at = max(10000, len(self.tat) * 2)
+    
+    async def acquire(self, bot_key: str, chat_id):
+        """Esperar a vez do envio (429 longo demais sobe para a retentativa do worker)"""
+        held = self.held_until.get(bot_key, 0.0) - time.monotonic()
+        if held > settings.TELEGRAM_MAX_RETRY_AFTER:
+            raise TelegramRetryAfter(held)
+        
+        waited = 0.0
+        delay = self.reserve(self.chat_buckets(bot_key, chat_id))
+        if delay > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        
+        # Vez do bot só quando o chat já pode receber
+        delay = self.reserve([('bot', bot_key)], self.held_until.get(bot_key, 0.0))
+        if delay > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        
+        if waited:
+            metrics.observe('telegram_throttle_wait_ms', waited * 1000)
+    
+    async def wait_hold(self, bot_key: str):
+        """Chamada sem chat (ex.: answerCallbackQuery): só respeita o 429 do bot"""
+        held = self.held_until.get(bot_key, 0.0) - time.monotonic()
+        if held > settings.TELEGRAM_MAX_RETRY_AFTER:
+            raise TelegramRetryAfter(held)
+        if held > 0:
+            await asyncio.sleep(held)
+            metrics.observe('telegram_throttle_wait_ms', held * 1000)
+    
+    def try_acquire(self, bot_key: str, chat_id) -> bool:
+        """Reservar só se chat e bot têm ficha agora (envio fora do make_request, ex.: resposta do webhook)"""
+        now = time.monotonic()
+        if self.held_until.get(bot_key, 0.0) > now:
+            return False
+        
+        buckets = self.chat_buckets(bot_key, chat_id) + [('bot', bot_key)]
+        for kind, key in buckets:
+            interval, burst = self.limits[kind]
+            if self.tat.get((kind, key), now) - (burst - 1) * interval > now:
+                return False
+        
+        self.reserve(buckets)
+        return True
+    
+    def hold(self, bot_key: str, seconds: float):
+        """429: nenhum envio do bot antes de `seconds`"""
+        self.held_until[bot_key] = max(self.held_until.get(bot_key, 0.0), time.monotonic() + seconds)
 
 class TelegramAPI:
     def __init__(self):
         self.base_url = settings.TELEGRAM_API_URL
         self.session: Optional[aiohttp.ClientSession] = None
+        self.scheduler = OutboundScheduler(
+            bot_rate=settings.TELEGRAM_BOT_RATE,
+            chat_rate=settings.TELEGRAM_CHAT_RATE,
+            chat_burst=settings.TELEGRAM_CHAT_BURST,
+            group_per_minute=settings.TELEGRAM_GROUP_PER_MINUTE
+        )
     
     async def get_session(self) -> aiohttp.ClientSession:
         """Obter ou criar sessão HTTP"""
@@ -25,7 +145,35 @@ class TelegramAPI:
         return self.session
     
     async def make_request(self, token: str, method: str, data: Dict[str, Any] = None) -> Dict:
-        """Fazer requisição à API do Telegram"""
+        """Fazer requisição à API do Telegram
+        
+        Envios para um chat passam pelo `OutboundScheduler`. Em um 429 o bot
+        fica segurado pelo `retry_after` e a requisição é refeita (até
+        TELEGRAM_MAX_RETRIES vezes); esgotado, sobe `TelegramRetryAfter`.
+        Chamadas sem chat também esperam o bot ser liberado.
+        """
+        chat_id = (data or {}).get('chat_id')
+        bot_key = token.split(':', 1)[0]
+        
+        attempt = 0
+        while True:
+            if chat_id is not None:
+                await self.scheduler.acquire(bot_key, chat_id)
+            else:
+                await self.scheduler.wait_hold(bot_key)
+            
+            try:
+                return await self._post(token, method, data)
+            except TelegramRetryAfter as e:
+                self.scheduler.hold(bot_key, e.retry_after)
+                metrics.increment('telegram_retry_after')
+                attempt += 1
+                if attempt > settings.TELEGRAM_MAX_RETRIES or e.retry_after > settings.TELEGRAM_MAX_RETRY_AFTER:
+                    raise
+                print(f"⏳ Limite do Telegram para o bot {bot_key} em {method}: nova tentativa em {e.retry_after:g}s")
+    
+    async def _post(self, token: str, method: str, data: Dict[str, Any] = None) -> Dict:
+        """Uma chamada HTTP à API (429 vira TelegramRetryAfter)"""
         url = f"{self.base_url}/bot{token}/{method}"
         session = await self.get_session()
         
@@ -33,8 +181,13 @@ class TelegramAPI:
             async with session.post(url, json=data) as response:
                 result = await response.json()
                 if not result.get('ok'):
+                    retry_after = (result.get('parameters') or {}).get('retry_after')
+                    if result.get('error_code') == 429 or retry_after:
+                        raise TelegramRetryAfter(float(retry_after or 1), result.get('description', ''))
                     raise Exception(f"Telegram API Error: {result.get('description')}")
                 return result.get('result', {})
+        except TelegramRetryAfter:
+            raise
         except asyncio.TimeoutError:
             raise Exception("Timeout ao conectar com Telegram API")
         except Exception as e:
@@ -74,6 +227,14 @@ class TelegramAPI:
         except:
             return False
     
+    async def get_chat(self, token: str, chat_id: str) -> Optional[Dict]:
+        """Dados do chat (None quando o bot não tem acesso a ele); leitura, fora dos limites de envio"""
+        try:
+            return await self._post(token, 'getChat', {'chat_id': chat_id})
+        except Exception as e:
+            print(f"⚠️ Chat {chat_id} inacessível: {str(e)}")
+            return None
+    
     async def send_message(self, token: str, chat_id: str, text: str, 
                         reply_markup: Dict = None) -> Optional[Dict]:
         """Enviar mensagem"""
@@ -89,28 +250,44 @@ class TelegramAPI:
         try:
             result = await self.make_request(token, 'sendMessage', data)
             return result
+        except TelegramRetryAfter:
+            raise
         except Exception as e:
             print(f"❌ Erro ao enviar mensagem: {str(e)}")
             return None
     
-    async def send_photo(self, token: str, chat_id: str, photo_url: str) -> Optional[Dict]:
+    @staticmethod
+    def _with_caption(data: Dict, caption: str = None, reply_markup: Dict = None) -> Dict:
+        """Legenda (Markdown, como nas mensagens) e botões numa chamada de mídia"""
+        if caption:
+            data['caption'] = caption
+            data['parse_mode'] = 'Markdown'
+        if reply_markup:
+            data['reply_markup'] = reply_markup
+        return data
+    
+    async def send_photo(self, token: str, chat_id: str, photo_url: str,
+                         caption: str = None, reply_markup: Dict = None) -> Optional[Dict]:
         """Enviar foto"""
-        data = {
+        data = self._with_caption({
             'chat_id': chat_id,
             'photo': photo_url
-        }
+        }, caption, reply_markup)
         
         try:
             return await self.make_request(token, 'sendPhoto', data)
+        except TelegramRetryAfter:
+            raise
         except:
             return None
     
-    async def send_video(self, token: str, chat_id: str, video_url: str) -> Optional[Dict]:
+    async def send_video(self, token: str, chat_id: str, video_url: str,
+                         caption: str = None, reply_markup: Dict = None) -> Optional[Dict]:
         """Enviar vídeo"""
-        data = {
+        data = self._with_caption({
             'chat_id': chat_id,
             'video': video_url
-        }
+        }, caption, reply_markup)
         
         print(f"🎥 Enviando vídeo: {video_url}")  # Debug
         
@@ -118,17 +295,20 @@ class TelegramAPI:
             result = await self.make_request(token, 'sendVideo', data)
             print(f"📹 Resposta do Telegram: {result}")  # Debug
             return result
+        except TelegramRetryAfter:
+            raise
         except Exception as e:
             print(f"❌ Erro ao enviar vídeo: {str(e)}")  # Debug
             return None
         
-    async def send_media_and_get_file_id(self, token: str, chat_id: str, media_url: str, media_type: str = 'photo') -> Optional[str]:
+    async def send_media_and_get_file_id(self, token: str, chat_id: str, media_url: str, media_type: str = 'photo',
+                                         caption: str = None, reply_markup: Dict = None) -> Optional[str]:
         """Enviar mídia e retornar file_id"""
         try:
             print(f"📤 Tentando enviar {media_type}: {media_url}")
             
             if media_type == 'video':
-                result = await self.send_video(token, chat_id, media_url)
+                result = await self.send_video(token, chat_id, media_url, caption, reply_markup)
                 print(f"📹 Resultado do vídeo: {result}")
                 
                 if result:
@@ -139,7 +319,7 @@ class TelegramAPI:
                     else:
                         print(f"⚠️ Resposta não contém 'video': {result}")
             else:
-                result = await self.send_photo(token, chat_id, media_url)
+                result = await self.send_photo(token, chat_id, media_url, caption, reply_markup)
                 print(f"📸 Resultado da foto: {result}")
                 
                 if result:
@@ -152,23 +332,28 @@ class TelegramAPI:
             
             print(f"❌ Não foi possível obter file_id")
             return None
-            
+        
+        except TelegramRetryAfter:
+            raise
         except Exception as e:
             print(f"❌ Erro ao obter file_id: {str(e)}")
             import traceback
             traceback.print_exc()
             return None
 
-    async def send_media_by_file_id(self, token: str, chat_id: str, file_id: str, media_type: str = 'photo') -> bool:
+    async def send_media_by_file_id(self, token: str, chat_id: str, file_id: str, media_type: str = 'photo',
+                                    caption: str = None, reply_markup: Dict = None) -> bool:
         """Enviar mídia usando file_id (muito mais rápido)"""
         try:
             if media_type == 'video':
-                data = {'chat_id': chat_id, 'video': file_id}
+                data = self._with_caption({'chat_id': chat_id, 'video': file_id}, caption, reply_markup)
                 await self.make_request(token, 'sendVideo', data)
             else:
-                data = {'chat_id': chat_id, 'photo': file_id}
+                data = self._with_caption({'chat_id': chat_id, 'photo': file_id}, caption, reply_markup)
                 await self.make_request(token, 'sendPhoto', data)
             return True
+        except TelegramRetryAfter:
+            raise
         except:
             return False
     
@@ -184,6 +369,8 @@ class TelegramAPI:
         try:
             await self.make_request(token, 'answerCallbackQuery', data)
             return True
+        except TelegramRetryAfter:
+            raise
         except:
             return False
     
@@ -1,42 +1,42 @@
 from typing import Dict, Optional
 from app.redis.client import redis_client
+from app.redis.envelope import UpdateEnvelope, classify_update, queue_for
 from app.database.crud import BotCRUD, InteractionCRUD
 from app.bot.manager import BotManager
 import json
 import time
+import hmac
 
 class WebhookHandler:
     @staticmethod
-    async def process_webhook(bot_id: str, update: Dict) -> Dict:
-        """Processar webhook do Telegram"""
+    async def process_webhook(bot_id: str, body: bytes) -> Dict:
+        """Processar webhook do Telegram (corpo bruto, sem parse)"""
         start_time = time.time()
         
-        print(f"📥 Adicionando update à fila para bot {bot_id}")
+        # Envelope com header fixo + corpo original; o parse fica com o worker
+        payload = UpdateEnvelope.encode(bot_id, body, received_at=start_time)
         
-        # Adicionar à fila para processamento assíncrono
-        queue_data = {
-            'bot_id': bot_id,
-            'update': update,
-            'timestamp': time.time()
-        }
-        
-        # IMPORTANTE: Adicionar à fila
-        await redis_client.add_to_queue('telegram_updates', queue_data)
-        print(f"✅ Update adicionado à fila!")
+        # IMPORTANTE: Adicionar à fila da classe (callbacks > comandos > demais) na partição do bot
+        queue_name = queue_for(classify_update(body), bot_id)
+        queue_length = await redis_client.add_to_queue(queue_name, payload)
         
         # Responder rapidamente (< 10ms)
         processing_time = (time.time() - start_time) * 1000
         
         return {
             'status': 'queued',
+            'queue': queue_name,
+            'queue_length': queue_length,
             'processing_time_ms': processing_time
         }
     
     @staticmethod
     async def validate_secret_token(headers: Dict, bot_secret: str) -> bool:
-        """Validar secret token do webhook"""
+        """Validar secret token do webhook (comparação em tempo constante)"""
         telegram_secret = headers.get('X-Telegram-Bot-Api-Secret-Token')
-        return telegram_secret == bot_secret
+        if not telegram_secret or not bot_secret:
+            return False
+        return hmac.compare_digest(telegram_secret.encode(), bot_secret.encode())
     
     @staticmethod
     async def extract_update_info(update: Dict) -> Dict:
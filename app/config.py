@@ -8,10 +8,23 @@ class Settings:
     DATABASE_URL = 'sqlite+aiosqlite:///telegram_bots.db'
     DATABASE_SYNC_URL = 'sqlite:///telegram_bots.db'
     
-    # Redis desabilitado para teste local  
-    REDIS_URL = None
+    # Redis desabilitado para teste local (defina REDIS_URL para usar Redis Streams na fila)
+    REDIS_URL = os.getenv('REDIS_URL')
     CACHE_TTL = 300
     
+    # Backend da fila de updates: 'redis' (Streams), 'sqlite' (durável, sem Redis) ou 'memory'
+    QUEUE_BACKEND = os.getenv('QUEUE_BACKEND', 'redis' if REDIS_URL else 'memory')
+    QUEUE_SQLITE_PATH = os.getenv('QUEUE_SQLITE_PATH', 'queue.db')
+    
+    # Fila de updates no Redis Streams
+    QUEUE_CONSUMER_GROUP = os.getenv('QUEUE_CONSUMER_GROUP', 'workers')
+    QUEUE_STREAM_MAXLEN = int(os.getenv('QUEUE_STREAM_MAXLEN', '1000000'))
+    QUEUE_RECLAIM_IDLE_MS = int(os.getenv('QUEUE_RECLAIM_IDLE_MS', '60000'))  # também é o visibility timeout do SQLite
+    QUEUE_RECLAIM_INTERVAL = int(os.getenv('QUEUE_RECLAIM_INTERVAL', '15'))
+    
+    # Partições das filas por bot_id (jump consistent hash); web e workers precisam usar o mesmo valor
+    QUEUE_PARTITIONS = int(os.getenv('QUEUE_PARTITIONS', '1'))
+    
     # Server
     SERVER_URL = os.getenv('SERVER_URL', 'http://localhost:8000')
     SECRET_KEY = 'super-secret-key-123456'
@@ -21,13 +34,109 @@ class Settings:
     TELEGRAM_API_URL = 'https://api.telegram.org'
     WEBHOOK_PATH = '/webhook'
     
+    # Modo do webhook: 'inline' (processa na requisição) ou 'queue' (enfileira para o worker)
+    WEBHOOK_MODE = os.getenv('WEBHOOK_MODE', 'inline')
+    # Orçamento do ack no modo fila: acima dele só conta como fila lenta (o 200 sai depois do push gravado)
+    WEBHOOK_ACK_BUDGET_MS = int(os.getenv('WEBHOOK_ACK_BUDGET_MS', '50'))
+    # Modo inline: primeira ação (answerCallbackQuery ou mensagem única) vai no corpo da resposta do webhook
+    WEBHOOK_REPLY_IN_RESPONSE = os.getenv('WEBHOOK_REPLY_IN_RESPONSE', 'false').lower() == 'true'
+    
+    # Serializador do envelope da fila: 'raw', 'msgpack' ou 'orjson'
+    QUEUE_SERIALIZER = os.getenv('QUEUE_SERIALIZER', 'raw')
+    
+    # Worker dentro do processo web (necessário com a fila em memória)
+    WORKER_EMBEDDED = os.getenv('WORKER_EMBEDDED', 'true' if QUEUE_BACKEND == 'memory' else 'false').lower() == 'true'
+    
+    # Cache de config dos bots é por processo: com worker separado a invalidação do painel
+    # não chega nele, então a config salva (mensagens, planos, mídia, file_id) vale após o TTL
+    BOT_CONFIG_CACHE_TTL = int(os.getenv('BOT_CONFIG_CACHE_TTL', '300' if WORKER_EMBEDDED else '5'))
+    
+    # Lanes do worker: updates do mesmo (bot, chat) em ordem, chats diferentes em paralelo
+    WORKER_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', '32'))
+    WORKER_LANE_DEPTH = int(os.getenv('WORKER_LANE_DEPTH', '16'))
+    WORKER_METRICS_INTERVAL = int(os.getenv('WORKER_METRICS_INTERVAL', '10'))
+    WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', '0'))  # 0 = sem endpoint HTTP no worker avulso
+    
+    # Autoscaling das lanes pelo atraso da fila: WORKER_CONCURRENCY é o ponto de partida
+    WORKER_AUTOSCALE = os.getenv('WORKER_AUTOSCALE', 'true').lower() == 'true'
+    WORKER_MIN_CONCURRENCY = int(os.getenv('WORKER_MIN_CONCURRENCY', '8'))
+    WORKER_MAX_CONCURRENCY = int(os.getenv('WORKER_MAX_CONCURRENCY', '256'))
+    WORKER_TARGET_LAG_MS = float(os.getenv('WORKER_TARGET_LAG_MS', '500'))
+    WORKER_AUTOSCALE_INTERVAL = float(os.getenv('WORKER_AUTOSCALE_INTERVAL', '1'))
+    WORKER_SCALE_DOWN_DELAY = float(os.getenv('WORKER_SCALE_DOWN_DELAY', '30'))
+    
+    # Supervisor: processos de worker (0 = um por núcleo, limitado a QUEUE_PARTITIONS)
+    WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', '0'))
+    
+    # Desligamento: prazo para os updates em execução terminarem antes de voltarem para a fila
+    WORKER_DRAIN_TIMEOUT = float(os.getenv('WORKER_DRAIN_TIMEOUT', '20'))
+    
+    # Escalonamento justo entre bots: janela em memória, limite por bot e pesos ('bot_id:peso,...')
+    WORKER_PREFETCH = int(os.getenv('WORKER_PREFETCH', '1000'))
+    WORKER_BOT_PREFETCH = int(os.getenv('WORKER_BOT_PREFETCH', '50'))
+    WORKER_BOT_WEIGHTS = os.getenv('WORKER_BOT_WEIGHTS', '')
+    
+    # Prioridade entre classes (callbacks > comandos > demais): a cada N entregas preteridas a classe baixa passa
+    WORKER_STARVATION_LIMIT = int(os.getenv('WORKER_STARVATION_LIMIT', '10'))
+    
+    # Retentativas com backoff exponencial (com jitter) antes da fila de mortos
+    RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '5'))
+    RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '1'))
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '30'))
+    
+    # Write-behind das interações: grava a cada N ms ou N linhas (perda máxima em um crash)
+    INTERACTION_FLUSH_MS = int(os.getenv('INTERACTION_FLUSH_MS', '200'))
+    INTERACTION_BATCH_SIZE = int(os.getenv('INTERACTION_BATCH_SIZE', '500'))
+    INTERACTION_MAX_PENDING = int(os.getenv('INTERACTION_MAX_PENDING', '20000'))
+    
+    # Contadores dos bots (total_messages, messages_today) somados em memória e gravados a cada N ms
+    STATS_FLUSH_MS = int(os.getenv('STATS_FLUSH_MS', '2000'))
+    
+    # Rollup diário em bot_statistics: intervalo, interações por lote e espera antes de consumir uma interação
+    ROLLUP_INTERVAL = float(os.getenv('ROLLUP_INTERVAL', '60'))
+    ROLLUP_BATCH_SIZE = int(os.getenv('ROLLUP_BATCH_SIZE', '20000'))
+    ROLLUP_SETTLE_SECONDS = float(os.getenv('ROLLUP_SETTLE_SECONDS', '30'))
+    
+    # Controle de admissão no webhook (modo fila): acima da marca alta cada bot tem cota
+    # (updates/s e rajada) até a fila voltar à marca baixa; acima do máximo tudo recebe 503
+    QUEUE_HIGH_WATERMARK = int(os.getenv('QUEUE_HIGH_WATERMARK', '50000'))
+    QUEUE_LOW_WATERMARK = int(os.getenv('QUEUE_LOW_WATERMARK', '25000'))
+    QUEUE_MAX_DEPTH = int(os.getenv('QUEUE_MAX_DEPTH', '200000'))
+    ADMISSION_BOT_RATE = float(os.getenv('ADMISSION_BOT_RATE', '5'))
+    ADMISSION_BOT_BURST = float(os.getenv('ADMISSION_BOT_BURST', '20'))
+    ADMISSION_SAMPLE_INTERVAL = float(os.getenv('ADMISSION_SAMPLE_INTERVAL', '1'))
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '5'))
+    
     # Rate Limiting
     RATE_LIMIT_PER_BOT = 30
     
+    # Envio ao Telegram: mensagens/s por bot, por chat (com rajada curta) e por minuto em grupos;
+    # 429 espera o retry_after e tenta de novo até N vezes (acima do teto vai para a retentativa do worker)
+    TELEGRAM_BOT_RATE = float(os.getenv('TELEGRAM_BOT_RATE', '30'))
+    TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+    TELEGRAM_CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+    TELEGRAM_GROUP_PER_MINUTE = float(os.getenv('TELEGRAM_GROUP_PER_MINUTE', '20'))
+    TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))
+    TELEGRAM_MAX_RETRY_AFTER = float(os.getenv('TELEGRAM_MAX_RETRY_AFTER', '30'))
+    
+    # Sequências de resposta entregues ao envio por chat (acima disso as lanes esperam)
+    CHAT_SEND_MAX_PENDING = int(os.getenv('CHAT_SEND_MAX_PENDING', '10000'))
+    
+    # Chat onde a mídia nova é enviada ao salvar a config para obter o file_id (vazio = sem pré-aquecimento).
+    # Um bot só envia para quem já iniciou conversa com ele (ou grupo/canal onde está): bots que não
+    # alcançam esse chat pulam o pré-aquecimento e obtêm o file_id no primeiro /start
+    MEDIA_WARMUP_CHAT_ID = os.getenv('MEDIA_WARMUP_CHAT_ID', '')
+    # file_ids de mídia recém-obtidos guardados em memória para configs lidas antes da gravação
+    MEDIA_FILE_ID_MEMO_SIZE = int(os.getenv('MEDIA_FILE_ID_MEMO_SIZE', '1000'))
+    
     # Pool Settings
     DB_POOL_SIZE = 5
     DB_MAX_OVERFLOW = 10
     REDIS_MAX_CONNECTIONS = 50
     HTTP_POOL_SIZE = 100
 
+    # Registro de bots em memória
+    BOT_REGISTRY_MISS_TTL = 30  # segundos de cache negativo para bot_id desconhecido
+    BOT_REGISTRY_MISS_MAX = 10000
+
 settings = Settings()
\ No newline at end of file
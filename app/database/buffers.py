@@ -0,0 +1,240 @@
+from typing import Dict, List, Tuple
+from datetime import datetime
+from app.database.connection import AsyncSessionLocal
+from app.database.crud import BotCRUD, BotUserCRUD, InteractionCRUD
+from app.utils.metrics import metrics
+from app.config import settings
+import asyncio
+
+class InteractionBuffer:
+    """Write-behind das interações: um INSERT em lote + um COMMIT por flush
+    
+    Grava a cada `flush_ms` ou quando junta `batch_size` linhas, o que vier
+    primeiro; em um crash perde-se no máximo esse intervalo/lote. Com o banco
+    fora do ar as linhas ficam em memória até `max_pending`, e a partir daí
+    `add` espera o próximo flush (backpressure em vez de crescer sem limite).
+    """
+    
+    def __init__(self, flush_ms: int, batch_size: int, max_pending: int):
+        self.flush_interval = flush_ms / 1000
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.rows: List[Dict] = []
+        self.inserted = 0
+        self.commits = 0
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+        self._closing = False
+        self._task = None
+    
+    async def add(self, row: Dict) -> None:
+        """Enfileirar linha; o horário é o do evento, não o do flush"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        
+        while len(self.rows) >= self.max_pending:
+            self._room.clear()
+            self._wake.set()
+            await self._room.wait()
+        
+        row.setdefault('created_at', datetime.utcnow())
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self._wake.set()
+    
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Erro ao gravar interações: {str(e)}")
+                await asyncio.sleep(1)
+    
+    async def flush(self) -> int:
+        """Gravar o que está pendente em lotes de até `batch_size`"""
+        written = 0
+        async with self._lock:
+            while self.rows:
+                batch = self.rows[:self.batch_size]
+                async with AsyncSessionLocal() as db:
+                    # Usuários novos e interações no mesmo commit: a retentativa não conta duas vezes
+                    added = await BotUserCRUD.add_users(db, batch)
+                    await InteractionCRUD.create_interactions(db, batch)
+                
+                # Só sai da memória depois do commit; na falha tenta de novo no próximo ciclo
+                del self.rows[:len(batch)]
+                written += len(batch)
+                self.inserted += len(batch)
+                self.commits += 1
+                metrics.increment('interaction_rows_inserted', len(batch))
+                metrics.increment('interaction_commits')
+                metrics.observe('interaction_batch_size', len(batch))
+                if added:
+                    metrics.increment('bot_users_added', sum(added.values()))
+                self._room.set()
+        
+        metrics.gauge('interaction_buffer_pending', len(self.rows))
+        return written
+    
+    async def close(self):
+        """Parar o timer e gravar o restante (desligamento)"""
+        # Sem cancel: um flush em andamento termina o commit antes de sair
+        if self._task:
+            self._closing = True
+            self._wake.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._closing = False
+        
+        try:
+            written = await self.flush()
+            if written:
+                print(f"💾 {written} interações gravadas no desligamento")
+        except Exception as e:
+            print(f"❌ {len(self.rows)} interações não gravadas no desligamento: {str(e)}")
+
+class StatsAggregator:
+    """Contadores por bot somados em memória e aplicados em `bots` periodicamente
+    
+    Em vez de um UPDATE + COMMIT por mensagem (lock na linha do bot a cada
+    update), acumula os deltas e grava todos os bots tocados no intervalo em
+    um UPDATE executemany. O painel vê os números com até `flush_ms` de atraso.
+    
+    Também junta tempos de resposta e erros por (bot, dia) para o rollup
+    diário (`StatisticsRollup`), que os retira com `take_daily`.
+    """
+    
+    def __init__(self, flush_ms: int):
+        self.flush_interval = flush_ms / 1000
+        self.deltas: Dict[str, Dict] = {}
+        self.daily: Dict[Tuple[str, datetime], Dict] = {}
+        self.merged = 0
+        self.commits = 0
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task = None
+    
+    def increment(self, bot_id: str, messages: int = 1):
+        """Contar mensagens do bot (total e do dia) e registrar a atividade"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        
+        delta = self.deltas.get(bot_id)
+        if delta is None:
+            delta = self.deltas[bot_id] = {'total_messages': 0, 'messages_today': 0, 'last_activity': None}
+        delta['total_messages'] += messages
+        delta['messages_today'] += messages
+        delta['last_activity'] = datetime.utcnow()
+    
+    def observe(self, bot_id: str, elapsed_ms: float, ok: bool):
+        """Registrar o tempo de uma resposta (ou o erro) no dia corrente"""
+        day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        entry = self.daily.get((bot_id, day))
+        if entry is None:
+            entry = self.daily[(bot_id, day)] = {'responses': 0, 'response_ms': 0.0, 'errors': 0}
+        if ok:
+            entry['responses'] += 1
+            entry['response_ms'] += elapsed_ms
+        else:
+            entry['errors'] += 1
+    
+    def take_daily(self) -> Dict[Tuple[str, datetime], Dict]:
+        """Retirar os tempos acumulados (devolver com `restore_daily` se a gravação falhar)"""
+        daily, self.daily = self.daily, {}
+        return daily
+    
+    def restore_daily(self, daily: Dict[Tuple[str, datetime], Dict]):
+        for key, entry in daily.items():
+            current = self.daily.setdefault(key, {'responses': 0, 'response_ms': 0.0, 'errors': 0})
+            for field, value in entry.items():
+                current[field] += value
+    
+    def _restore(self, pending: Dict[str, Dict]):
+        """Devolver deltas de um flush que falhou, somando aos que chegaram depois"""
+        for bot_id, delta in pending.items():
+            current = self.deltas.get(bot_id)
+            if current is None:
+                self.deltas[bot_id] = delta
+                continue
+            current['total_messages'] += delta['total_messages']
+            current['messages_today'] += delta['messages_today']
+            current['last_activity'] = max(current['last_activity'], delta['last_activity'])
+    
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Erro ao gravar estatísticas dos bots: {str(e)}")
+                await asyncio.sleep(1)
+    
+    async def flush(self) -> int:
+        """Aplicar os deltas pendentes; retorna quantos bots foram atualizados"""
+        async with self._lock:
+            if not self.deltas:
+                return 0
+            
+            pending, self.deltas = self.deltas, {}
+            day_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            # Ordem fixa de bot_id: dois processos gravando ao mesmo tempo não se travam
+            rows = [
+                {
+                    'b_bot_id': bot_id,
+                    'd_total_messages': pending[bot_id]['total_messages'],
+                    'd_messages_today': pending[bot_id]['messages_today'],
+                    'b_last_activity': pending[bot_id]['last_activity'],
+                    'b_day_start': day_start
+                }
+                for bot_id in sorted(pending)
+            ]
+            
+            try:
+                async with AsyncSessionLocal() as db:
+                    await BotCRUD.apply_stats(db, rows)
+            except Exception:
+                self._restore(pending)
+                raise
+            
+            self.merged += len(rows)
+            self.commits += 1
+            metrics.increment('bot_stats_merged', len(rows))
+            metrics.increment('bot_stats_commits')
+            metrics.gauge('bot_stats_pending', len(self.deltas))
+            return len(rows)
+    
+    async def close(self):
+        """Parar o timer e gravar os deltas restantes (desligamento)"""
+        if self._task:
+            self._closing = True
+            self._wake.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._closing = False
+        
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"❌ Estatísticas de {len(self.deltas)} bots não gravadas no desligamento: {str(e)}")
+
+interaction_buffer = InteractionBuffer(
+    flush_ms=settings.INTERACTION_FLUSH_MS,
+    batch_size=settings.INTERACTION_BATCH_SIZE,
+    max_pending=settings.INTERACTION_MAX_PENDING
+)
+
+stats_aggregator = StatsAggregator(flush_ms=settings.STATS_FLUSH_MS)
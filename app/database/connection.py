@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from app.config import settings
 
 # Engine assíncrono
@@ -47,10 +47,42 @@ async def get_db():
         finally:
             await session.close()
 
+def upgrade_schema():
+    """Atualizar tabelas que já existiam (create_all só cria as que faltam); pode rodar sempre"""
+    with sync_engine.begin() as conn:
+        columns = {column['name'] for column in inspect(conn).get_columns('bot_statistics')}
+        if 'responses' not in columns:
+            conn.execute(text("ALTER TABLE bot_statistics ADD COLUMN responses INTEGER DEFAULT 0"))
+            print("🔧 bot_statistics.responses adicionada")
+        
+        indexes = {index['name'] for index in inspect(conn).get_indexes('bot_statistics')}
+        if 'idx_bot_statistics_day' not in indexes:
+            # Linhas repetidas do mesmo bot e dia: contadores somados na mais antiga, o resto sai
+            first = (
+                "SELECT MIN(id) FROM bot_statistics WHERE bot_id IS NOT NULL AND date IS NOT NULL "
+                "GROUP BY bot_id, date"
+            )
+            same_day = "FROM bot_statistics s WHERE s.bot_id = bot_statistics.bot_id AND s.date = bot_statistics.date"
+            conn.execute(text(
+                "UPDATE bot_statistics SET "
+                f"messages_sent = (SELECT SUM(COALESCE(s.messages_sent, 0)) {same_day}), "
+                f"new_users = (SELECT SUM(COALESCE(s.new_users, 0)) {same_day}), "
+                f"errors = (SELECT SUM(COALESCE(s.errors, 0)) {same_day}) "
+                f"WHERE id IN ({first} HAVING COUNT(*) > 1)"
+            ))
+            removed = conn.execute(text(
+                f"DELETE FROM bot_statistics WHERE bot_id IS NOT NULL AND date IS NOT NULL AND id NOT IN ({first})"
+            )).rowcount
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_bot_statistics_day ON bot_statistics (bot_id, date)"
+            ))
+            print(f"🔧 Índice único de bot_statistics criado ({removed} linhas repetidas juntadas)")
+
 def init_db():
     """Criar tabelas no banco"""
     from app.database.models import Base
     Base.metadata.create_all(bind=sync_engine)
+    upgrade_schema()
     print("✅ Tabelas criadas com sucesso!")
 
 if __name__ == "__main__":
@@ -1,9 +1,10 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, and_
+from sqlalchemy import select, update, delete, insert, and_, bindparam, case
 from sqlalchemy.sql import func
-from typing import List, Optional
-from datetime import datetime
-from app.database.models import Bot, UserInteraction, BotStatistics, User
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from app.database.models import Bot, BotUser, UserInteraction, BotStatistics, User
 
 class BotCRUD:
     @staticmethod
@@ -43,6 +44,48 @@ class BotCRUD:
         result = await db.execute(query)
         return result.scalars().all()
     
+    @staticmethod
+    async def list_dashboard(
+        db: AsyncSession,
+        user_id: int,
+        limit: Optional[int] = None,
+        after: Optional[int] = None
+    ) -> List[Dict]:
+        """Linhas do painel em uma query: colunas do bot + rollup de hoje
+        
+        Só as colunas exibidas (sem mensagens/planos) e os contadores já
+        mantidos pelo worker, com LEFT JOIN na linha de hoje de
+        bot_statistics. Paginação keyset por id decrescente (mais novo
+        primeiro): `after` é o id da última linha da página anterior.
+        """
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        query = (
+            select(
+                Bot.id,
+                Bot.bot_id,
+                Bot.username,
+                Bot.is_active,
+                Bot.webhook_active,
+                Bot.total_users,
+                Bot.total_messages,
+                Bot.messages_today,
+                Bot.last_activity,
+                Bot.created_at,
+                BotStatistics.errors.label('errors_today'),
+                BotStatistics.avg_response_time
+            )
+            .outerjoin(BotStatistics, and_(BotStatistics.bot_id == Bot.bot_id, BotStatistics.date == today))
+            .where(Bot.user_id == user_id)
+            .order_by(Bot.id.desc())
+        )
+        if after is not None:
+            query = query.where(Bot.id < after)
+        if limit:
+            query = query.limit(limit)
+        
+        result = await db.execute(query)
+        return [dict(row) for row in result.mappings()]
+    
     @staticmethod
     async def get_all_bots(db: AsyncSession, active_only: bool = False) -> List[Bot]:
         """Listar todos os bots (para admin)"""
@@ -80,15 +123,26 @@ class BotCRUD:
         return result.rowcount > 0
     
     @staticmethod
-    async def increment_stats(db: AsyncSession, bot_id: str, field: str = 'total_messages'):
-        """Incrementar estatísticas do bot"""
+    async def apply_stats(db: AsyncSession, deltas: List[Dict]):
+        """Somar contadores acumulados de vários bots em um UPDATE executemany + um commit
+        
+        Cada item: b_bot_id, d_total_messages, d_messages_today, b_last_activity
+        e b_day_start (meia-noite UTC de hoje). Bot sem atividade desde antes
+        de b_day_start recomeça messages_today do delta em vez de somar.
+        """
+        bots = Bot.__table__
         await db.execute(
-            update(Bot)
-            .where(Bot.bot_id == bot_id)
+            bots.update()
+            .where(bots.c.bot_id == bindparam('b_bot_id'))
             .values({
-                field: Bot.__table__.c[field] + 1,
-                'last_activity': datetime.utcnow()
-            })
+                'total_messages': func.coalesce(bots.c.total_messages, 0) + bindparam('d_total_messages'),
+                'messages_today': case(
+                    (bots.c.last_activity < bindparam('b_day_start'), bindparam('d_messages_today')),
+                    else_=func.coalesce(bots.c.messages_today, 0) + bindparam('d_messages_today')
+                ),
+                'last_activity': bindparam('b_last_activity')
+            }),
+            deltas
         )
         await db.commit()
     
@@ -109,6 +163,15 @@ class InteractionCRUD:
         await db.commit()
         return interaction
     
+    @staticmethod
+    async def create_interactions(db: AsyncSession, rows: List[dict]) -> int:
+        """Registrar várias interações em um único INSERT (executemany) e um COMMIT"""
+        if not rows:
+            return 0
+        await db.execute(insert(UserInteraction), rows)
+        await db.commit()
+        return len(rows)
+    
     @staticmethod
     async def get_bot_interactions(db: AsyncSession, bot_id: str, limit: int = 100):
         """Buscar interações de um bot"""
@@ -119,15 +182,58 @@ class InteractionCRUD:
             .limit(limit)
         )
         return result.scalars().all()
-    
+
+class BotUserCRUD:
     @staticmethod
-    async def count_unique_users(db: AsyncSession, bot_id: str) -> int:
-        """Contar usuários únicos"""
+    async def add_users(db: AsyncSession, pairs: List[dict]) -> Dict[str, int]:
+        """Registrar usuários novos de cada bot e somar em bots.total_users (sem commit)
+        
+        INSERT ... ON CONFLICT DO NOTHING em lote: só os pares (bot_id, user_id)
+        ainda não vistos voltam no RETURNING e contam como usuário novo.
+        """
+        unique = {}
+        for pair in pairs:
+            if pair.get('user_id') and (pair['bot_id'], pair['user_id']) not in unique:
+                unique[(pair['bot_id'], pair['user_id'])] = {
+                    'bot_id': pair['bot_id'],
+                    'user_id': pair['user_id'],
+                    'first_seen': pair.get('created_at') or datetime.utcnow()
+                }
+        if not unique:
+            return {}
+        
+        dialect = postgresql if db.get_bind().dialect.name == 'postgresql' else sqlite
         result = await db.execute(
-            select(func.count(func.distinct(UserInteraction.user_id)))
-            .where(UserInteraction.bot_id == bot_id)
+            dialect.insert(BotUser)
+            .on_conflict_do_nothing(index_elements=['bot_id', 'user_id'])
+            .returning(BotUser.bot_id),
+            list(unique.values())
         )
-        return result.scalar() or 0
+        added: Dict[str, int] = {}
+        for bot_id in result.scalars():
+            added[bot_id] = added.get(bot_id, 0) + 1
+        
+        if added:
+            bots = Bot.__table__
+            await db.execute(
+                bots.update()
+                .where(bots.c.bot_id == bindparam('b_bot_id'))
+                .values(total_users=func.coalesce(bots.c.total_users, 0) + bindparam('d_users')),
+                [{'b_bot_id': bot_id, 'd_users': added[bot_id]} for bot_id in sorted(added)]
+            )
+        return added
+
+class StatisticsCRUD:
+    @staticmethod
+    async def get_daily(db: AsyncSession, bot_id: str, days: int = 30) -> List[BotStatistics]:
+        """Linhas diárias do rollup dos últimos `days` dias (mais antiga primeiro)"""
+        since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+        result = await db.execute(
+            select(BotStatistics)
+            .where(BotStatistics.bot_id == bot_id, BotStatistics.date >= since)
+            .order_by(BotStatistics.date)
+        )
+        return result.scalars().all()
 
 class UserCRUD:
     @staticmethod
@@ -82,6 +82,19 @@ class UserInteraction(Base):
         Index('idx_user_interactions', 'user_id', 'created_at'),
     )
 
+class BotUser(Base):
+    __tablename__ = 'bot_users'
+    
+    # Um registro por usuário distinto de cada bot (gravado no primeiro contato)
+    id = Column(Integer, primary_key=True)
+    bot_id = Column(String(50), nullable=False)
+    user_id = Column(String(50), nullable=False)
+    first_seen = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('idx_bot_user', 'bot_id', 'user_id', unique=True),
+    )
+
 class BotStatistics(Base):
     __tablename__ = 'bot_statistics'
     
@@ -92,4 +105,17 @@ class BotStatistics(Base):
     new_users = Column(Integer, default=0)
     errors = Column(Integer, default=0)
     avg_response_time = Column(Float)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    responses = Column(Integer, default=0)  # Amostras da média (permite somar lotes novos)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('idx_bot_statistics_day', 'bot_id', 'date', unique=True),
+    )
+
+class RollupCursor(Base):
+    __tablename__ = 'rollup_cursors'
+    
+    # Até onde um job incremental já consumiu (ex.: último id de user_interactions)
+    name = Column(String(50), primary_key=True)
+    position = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
@@ -0,0 +1,245 @@
+from typing import Dict, Tuple
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, update, insert, func, and_, exists, bindparam
+from sqlalchemy.orm import aliased
+from app.database.connection import AsyncSessionLocal
+from app.database.models import Bot, BotStatistics, RollupCursor, UserInteraction
+from app.database.buffers import stats_aggregator
+from app.utils.metrics import metrics
+from app.config import settings
+import asyncio
+
+INTERACTIONS_CURSOR = 'bot_statistics:interactions'
+
+def day_of(value) -> datetime:
+    """Meia-noite do dia (date() volta str no SQLite e date/datetime no PostgreSQL)"""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return datetime(value.year, value.month, value.day)
+
+def today() -> datetime:
+    return day_of(datetime.utcnow())
+
+class StatisticsRollup:
+    """Rollup diário incremental em `bot_statistics` (uma linha por bot e dia)
+    
+    A cada ciclo consome as interações novas a partir do cursor gravado em
+    `rollup_cursors` (messages_sent e new_users), soma os tempos de resposta
+    e erros juntados pelo `stats_aggregator` e zera `messages_today` dos bots
+    sem atividade hoje. O cursor é travado no início da transação: com vários
+    processos de worker só um consome a janela por vez, e cursor + linhas do
+    dia são gravados no mesmo commit. Interações mais novas que
+    `settle_seconds` esperam o próximo ciclo (lotes ainda em commit).
+    """
+    
+    def __init__(self, interval: float, batch_size: int, settle_seconds: float):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.settle_seconds = settle_seconds
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Encerrar o ciclo e gravar os tempos ainda em memória"""
+        if self._task:
+            self._closing = True
+            self._wake.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._closing = False
+        
+        try:
+            await self.run_once()
+        except Exception as e:
+            print(f"❌ Erro no rollup de estatísticas no desligamento: {str(e)}")
+    
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            
+            try:
+                # Histórico atrasado (primeira execução): lotes seguidos até alcançar
+                while await self.run_once() >= self.batch_size and not self._closing:
+                    pass
+            except Exception as e:
+                print(f"❌ Erro no rollup de estatísticas: {str(e)}")
+    
+    async def run_once(self) -> int:
+        """Um passo do rollup; retorna quantas interações foram consumidas"""
+        daily = stats_aggregator.take_daily()
+        try:
+            async with AsyncSessionLocal() as db:
+                consumed = await self._rollup(db, daily)
+        except Exception:
+            stats_aggregator.restore_daily(daily)
+            raise
+        
+        if consumed:
+            metrics.increment('rollup_interactions', consumed)
+        return consumed
+    
+    async def _rollup(self, db, daily: Dict[Tuple[str, datetime], Dict]) -> int:
+        # Trava a linha do cursor até o commit (UPDATE sem mudança)
+        locked = await db.execute(
+            update(RollupCursor)
+            .where(RollupCursor.name == INTERACTIONS_CURSOR)
+            .values(position=RollupCursor.position)
+        )
+        if not locked.rowcount:
+            db.add(RollupCursor(name=INTERACTIONS_CURSOR, position=0))
+            await db.flush()
+        position = (await db.execute(
+            select(RollupCursor.position).where(RollupCursor.name == INTERACTIONS_CURSOR)
+        )).scalar()
+        
+        # Próxima janela: até batch_size ids já assentados depois do cursor
+        settled = datetime.utcnow() - timedelta(seconds=self.settle_seconds)
+        window_ids = (
+            select(UserInteraction.id)
+            .where(UserInteraction.id > position, UserInteraction.created_at <= settled)
+            .order_by(UserInteraction.id)
+            .limit(self.batch_size)
+            .subquery()
+        )
+        upto = (await db.execute(select(func.max(window_ids.c.id)))).scalar()
+        
+        entries: Dict[Tuple[str, datetime], Dict] = {}
+        
+        def entry(bot_id: str, day: datetime) -> Dict:
+            return entries.setdefault((bot_id, day), {
+                'messages': 0, 'new_users': 0, 'errors': 0, 'responses': 0, 'response_ms': 0.0
+            })
+        
+        consumed = 0
+        if upto is not None:
+            window = and_(UserInteraction.id > position, UserInteraction.id <= upto)
+            
+            day = func.date(UserInteraction.created_at)
+            rows = await db.execute(
+                select(UserInteraction.bot_id, day, func.count())
+                .where(window)
+                .group_by(UserInteraction.bot_id, day)
+            )
+            for bot_id, value, count in rows:
+                entry(bot_id, day_of(value))['messages'] += count
+                consumed += count
+            
+            # Usuário novo: nenhuma interação com o bot antes da janela
+            firsts = (
+                select(
+                    UserInteraction.bot_id,
+                    UserInteraction.user_id,
+                    func.min(UserInteraction.created_at).label('first_at')
+                )
+                .where(window)
+                .group_by(UserInteraction.bot_id, UserInteraction.user_id)
+                .subquery()
+            )
+            earlier = aliased(UserInteraction)
+            first_day = func.date(firsts.c.first_at)
+            rows = await db.execute(
+                select(firsts.c.bot_id, first_day, func.count())
+                .where(~exists().where(
+                    earlier.bot_id == firsts.c.bot_id,
+                    earlier.user_id == firsts.c.user_id,
+                    earlier.id <= position
+                ))
+                .group_by(firsts.c.bot_id, first_day)
+            )
+            for bot_id, value, count in rows:
+                entry(bot_id, day_of(value))['new_users'] += count
+        
+        for (bot_id, day), timing in daily.items():
+            current = entry(bot_id, day)
+            current['errors'] += timing['errors']
+            current['responses'] += timing['responses']
+            current['response_ms'] += timing['response_ms']
+        
+        if entries:
+            await self._merge(db, entries)
+        
+        if upto is not None:
+            await db.execute(
+                update(RollupCursor)
+                .where(RollupCursor.name == INTERACTIONS_CURSOR)
+                .values(position=upto)
+            )
+        
+        # Virada do dia: bots ativos recomeçam no próximo flush do stats_aggregator
+        await db.execute(
+            update(Bot.__table__)
+            .where(Bot.last_activity < today(), Bot.messages_today != 0)
+            .values(messages_today=0)
+        )
+        
+        await db.commit()
+        return consumed
+    
+    async def _merge(self, db, entries: Dict[Tuple[str, datetime], Dict]):
+        """Somar as entradas às linhas existentes (a trava do cursor evita corrida) ou criá-las"""
+        stats = BotStatistics.__table__
+        result = await db.execute(
+            select(stats).where(
+                stats.c.bot_id.in_({bot_id for bot_id, _ in entries}),
+                stats.c.date.in_({day for _, day in entries})
+            )
+        )
+        existing = {(row.bot_id, day_of(row.date)): row for row in result}
+        
+        updates, inserts = [], []
+        for (bot_id, day), values in entries.items():
+            row = existing.get((bot_id, day))
+            old_responses = (row.responses or 0) if row else 0
+            old_avg = (row.avg_response_time or 0.0) if row else 0.0
+            responses = old_responses + values['responses']
+            avg = (old_avg * old_responses + values['response_ms']) / responses if responses else None
+            
+            if row is None:
+                inserts.append({
+                    'bot_id': bot_id,
+                    'date': day,
+                    'messages_sent': values['messages'],
+                    'new_users': values['new_users'],
+                    'errors': values['errors'],
+                    'avg_response_time': avg,
+                    'responses': responses
+                })
+            else:
+                updates.append({
+                    'b_id': row.id,
+                    'b_messages_sent': (row.messages_sent or 0) + values['messages'],
+                    'b_new_users': (row.new_users or 0) + values['new_users'],
+                    'b_errors': (row.errors or 0) + values['errors'],
+                    'b_avg_response_time': avg,
+                    'b_responses': responses
+                })
+        
+        if updates:
+            await db.execute(
+                stats.update()
+                .where(stats.c.id == bindparam('b_id'))
+                .values({
+                    'messages_sent': bindparam('b_messages_sent'),
+                    'new_users': bindparam('b_new_users'),
+                    'errors': bindparam('b_errors'),
+                    'avg_response_time': bindparam('b_avg_response_time'),
+                    'responses': bindparam('b_responses')
+                }),
+                updates
+            )
+        if inserts:
+            await db.execute(insert(stats), inserts)
+
+statistics_rollup = StatisticsRollup(
+    interval=settings.ROLLUP_INTERVAL,
+    batch_size=settings.ROLLUP_BATCH_SIZE,
+    settle_seconds=settings.ROLLUP_SETTLE_SECONDS
+)
@@ -8,7 +8,11 @@ import uvicorn
 # Importar rotas
 from app.routes import api, webhooks, pages, auth
 from app.bot.telegram_api import telegram_api
+from app.bot.sender import chat_sender
+from app.bot.media import media_uploads
 from app.redis.client import redis_client
+from app.bot.registry import bot_registry
+from app.config import settings
 
 # Lifespan para gerenciar conexões
 @asynccontextmanager
@@ -28,11 +32,35 @@ async def lifespan(app: FastAPI):
     await redis_client.connect()
     print("✅ Redis conectado")
     
+    # Carregar registro de bots em memória (uma única query)
+    from app.database.connection import AsyncSessionLocal
+    try:
+        async with AsyncSessionLocal() as db:
+            total = await bot_registry.warm(db)
+        print(f"✅ Registro de bots carregado ({total} bots)")
+    except Exception as e:
+        print(f"⚠️ Aviso no registro de bots: {str(e)}")
+    
+    # Worker embutido para o modo fila com fila em memória
+    worker = None
+    if settings.WEBHOOK_MODE == 'queue' and settings.WORKER_EMBEDDED:
+        from worker.main import Worker
+        worker = Worker()
+        await worker.start()
+        print("✅ Worker embutido iniciado")
+    
     yield
     
     # Shutdown
     print("🔄 Encerrando sistema...")
+    if worker:
+        await worker.stop()
+    # Envios deixados pela resposta no webhook
+    await chat_sender.close(5)
+    # Pré-aquecimentos de mídia disparados ao salvar configs
+    await media_uploads.close(5)
     await telegram_api.close()
+    await redis_client.close()
     print("✅ Sistema encerrado")
 
 # Criar app
@@ -1,5 +1,6 @@
 from typing import Optional, Any
 from app.redis.client import redis_client
+from app.config import settings
 import hashlib
 import json
 
@@ -18,10 +19,10 @@ class CacheManager:
         return await redis_client.get_cache(key)
     
     @staticmethod
-    async def set_bot_config(bot_id: str, config: dict, ttl: int = 300) -> bool:
+    async def set_bot_config(bot_id: str, config: dict, ttl: int = None) -> bool:
         """Salvar configuração do bot no cache"""
         key = f"bot:config:{bot_id}"
-        return await redis_client.set_cache(key, config, ttl)
+        return await redis_client.set_cache(key, config, ttl or settings.BOT_CONFIG_CACHE_TTL)
     
     @staticmethod
     async def invalidate_bot_config(bot_id: str) -> int:
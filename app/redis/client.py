@@ -1,12 +1,17 @@
 import json
-from typing import Optional, Any
+import os
+import socket
+import time
+from typing import Optional, Any, Dict, List
 from app.config import settings
+from app.redis.queues import MemoryQueue, StreamsQueue, SQLiteQueue
 
 class RedisClient:
-    """Versão simplificada do Redis para teste local"""
+    """Fila de updates (Redis Streams ou memória) e cache simulado para teste local"""
     _instance = None
     _cache = {}
-    _queue = {}
+    _expires = {}
+    _backend = None
     
     def __new__(cls):
         if cls._instance is None:
@@ -14,34 +19,102 @@ class RedisClient:
         return cls._instance
     
     async def connect(self):
-        """Simular conexão"""
+        """Inicializar backend da fila"""
+        self._get_queue()
         return self
     
+    async def close(self):
+        """Fechar conexões do backend da fila"""
+        if self._backend is not None:
+            await self._backend.close()
+    
     async def get_client(self):
         """Obter cliente"""
         return self
     
-    async def add_to_queue(self, queue_name: str, data: dict) -> int:
-        """Adicionar item à fila simulada"""
-        if queue_name not in self._queue:
-            self._queue[queue_name] = []
-        self._queue[queue_name].append(json.dumps(data))
-        return len(self._queue[queue_name])
-    
-    async def get_from_queue(self, queue_name: str, timeout: int = 1) -> Optional[dict]:
-        """Pegar item da fila simulada"""
-        if queue_name in self._queue and self._queue[queue_name]:
-            data = self._queue[queue_name].pop(0)
-            return json.loads(data)
-        return None
+    def _get_queue(self):
+        """Backend da fila conforme QUEUE_BACKEND ('redis', 'sqlite' ou 'memory')"""
+        if self._backend is None:
+            if settings.QUEUE_BACKEND == 'sqlite':
+                RedisClient._backend = SQLiteQueue(
+                    settings.QUEUE_SQLITE_PATH,
+                    visibility_timeout=settings.QUEUE_RECLAIM_IDLE_MS / 1000
+                )
+            elif settings.QUEUE_BACKEND == 'redis':
+                RedisClient._backend = StreamsQueue(
+                    settings.REDIS_URL,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    group=settings.QUEUE_CONSUMER_GROUP,
+                    consumer=f"{socket.gethostname()}-{os.getpid()}",
+                    maxlen=settings.QUEUE_STREAM_MAXLEN
+                )
+            else:
+                RedisClient._backend = MemoryQueue()
+        return self._backend
+    
+    async def add_to_queue(self, queue_name: str, payload: bytes) -> int:
+        """Adicionar item à fila (payload já serializado); retorna o tamanho da fila"""
+        return await self._get_queue().push(queue_name, payload)
+    
+    async def add_many_to_queue(self, queue_name: str, payloads: List[bytes]) -> int:
+        """Adicionar vários itens em um único round-trip"""
+        return await self._get_queue().push_many(queue_name, payloads)
+    
+    async def get_from_queue(self, queue_name: str, timeout: float = 1) -> Optional[Dict]:
+        """Pegar item da fila ({'id', 'payload'}), aguardando até `timeout` segundos"""
+        return await self._get_queue().pop(queue_name, timeout)
+    
+    async def ack_from_queue(self, queue_name: str, message_id) -> None:
+        """Confirmar processamento do item"""
+        await self._get_queue().ack(queue_name, message_id)
+    
+    async def ack_many_from_queue(self, queue_name: str, message_ids: List) -> None:
+        """Confirmar vários itens de uma vez"""
+        await self._get_queue().ack_many(queue_name, message_ids)
+    
+    async def reclaim_from_queue(self, queue_name: str, min_idle_ms: int) -> int:
+        """Recuperar itens parados há mais de `min_idle_ms` (consumidor morto)"""
+        return await self._get_queue().reclaim(queue_name, min_idle_ms)
+    
+    async def renew_queue_leases(self, older_than: float) -> int:
+        """Estender a reserva dos itens retirados há mais de `older_than` segundos e ainda sem ack"""
+        return await self._get_queue().renew(older_than)
+    
+    async def get_queue_length(self, queue_name: str) -> int:
+        """Tamanho atual da fila"""
+        return await self._get_queue().length(queue_name)
+    
+    async def list_queues(self, prefix: str) -> List[str]:
+        """Nomes das filas com itens que começam com `prefix`"""
+        return await self._get_queue().list_queues(prefix)
+    
+    async def peek_queue(self, queue_name: str, limit: int = 50, after=None) -> List[Dict]:
+        """Ler itens ({'id', 'payload'}) sem consumir, a partir do id `after`"""
+        return await self._get_queue().peek(queue_name, limit, after)
+    
+    async def remove_from_queue(self, queue_name: str, message_ids: List) -> int:
+        """Remover itens específicos da fila"""
+        return await self._get_queue().remove(queue_name, message_ids)
+    
+    async def release_to_queue(self, queue_name: str, items: List[Dict]) -> None:
+        """Devolver itens retirados e não processados ({'id', 'payload'}) sem esperar o reclaim"""
+        await self._get_queue().release(queue_name, items)
     
     async def set_cache(self, key: str, value: Any, ttl: int = None) -> bool:
-        """Salvar no cache simulado"""
+        """Salvar no cache simulado (expira em `ttl` segundos)"""
         self._cache[key] = json.dumps(value)
+        if ttl:
+            self._expires[key] = time.monotonic() + ttl
+        else:
+            self._expires.pop(key, None)
         return True
     
     async def get_cache(self, key: str) -> Optional[Any]:
         """Buscar do cache simulado"""
+        # Cache é por processo: o TTL limita por quanto tempo outro processo vê valor antigo
+        if self._expires.get(key, float('inf')) <= time.monotonic():
+            self._cache.pop(key, None)
+            self._expires.pop(key, None)
         if key in self._cache:
             return json.loads(self._cache[key])
         return None
@@ -56,6 +129,7 @@ class RedisClient:
                 count += 1
         for key in keys_to_delete:
             del self._cache[key]
+            self._expires.pop(key, None)
         return count
     
     async def increment_rate_limit(self, key: str, window: int = 1) -> int:
@@ -0,0 +1,90 @@
+from typing import Dict, List, Optional
+from app.redis.client import redis_client
+from app.redis.envelope import UpdateEnvelope, PRIORITY_BACKGROUND, DEAD_LETTER_QUEUE, queue_for
+import time
+
+class DeadLetterQueue:
+    """Updates que esgotaram as retentativas: inspeção e reenvio em lote"""
+    
+    @staticmethod
+    async def add(payload: bytes, attempts: int, error: str, queue_name: str) -> None:
+        """Guardar update com o motivo da última falha e a fila de origem"""
+        dead = UpdateEnvelope.reencode(
+            payload,
+            attempts=attempts,
+            error=(error or '')[:500],
+            failed_at=time.time(),
+            queue=queue_name
+        )
+        await redis_client.add_to_queue(DEAD_LETTER_QUEUE, dead)
+    
+    @staticmethod
+    async def inspect(limit: int = 50, after=None, bot_id: Optional[str] = None) -> Dict:
+        """Listar itens sem consumir (paginação por `after` = último id visto)"""
+        items = []
+        cursor = after
+        while len(items) < limit:
+            page = await redis_client.peek_queue(DEAD_LETTER_QUEUE, limit, cursor)
+            if not page:
+                break
+            
+            for entry in page:
+                cursor = entry['id']
+                header = UpdateEnvelope.decode(entry['payload'])
+                if bot_id and header.get('bot_id') != bot_id:
+                    continue
+                
+                body = header.pop('body')
+                header['id'] = entry['id']
+                header['update'] = UpdateEnvelope.parse_update(body)
+                items.append(header)
+                if len(items) >= limit:
+                    break
+            
+            if len(page) < limit:
+                break
+        
+        return {
+            'total': await redis_client.get_queue_length(DEAD_LETTER_QUEUE),
+            'items': items,
+            'next': cursor if len(items) >= limit else None
+        }
+    
+    @staticmethod
+    async def replay(limit: int = 1000, bot_id: Optional[str] = None, ids: Optional[List] = None) -> int:
+        """Devolver à fila de origem com as tentativas zeradas"""
+        wanted = set(str(message_id) for message_id in ids) if ids else None
+        replayed = 0
+        cursor = None
+        
+        while replayed < limit:
+            page = await redis_client.peek_queue(DEAD_LETTER_QUEUE, min(500, limit - replayed), cursor)
+            if not page:
+                break
+            
+            by_queue: Dict[str, List[bytes]] = {}
+            done = []
+            for entry in page:
+                cursor = entry['id']
+                if wanted is not None and str(entry['id']) not in wanted:
+                    continue
+                
+                header = UpdateEnvelope.decode(entry['payload'])
+                if bot_id and header.get('bot_id') != bot_id:
+                    continue
+                
+                queue_name = header.get('queue') or queue_for(PRIORITY_BACKGROUND, header['bot_id'])
+                payload = UpdateEnvelope.reencode(
+                    entry['payload'], attempts=None, error=None, failed_at=None, queue=None
+                )
+                by_queue.setdefault(queue_name, []).append(payload)
+                done.append(entry['id'])
+            
+            # Enfileirar antes de remover: na falha o item continua na fila de mortos
+            for queue_name, payloads in by_queue.items():
+                await redis_client.add_many_to_queue(queue_name, payloads)
+            if done:
+                await redis_client.remove_from_queue(DEAD_LETTER_QUEUE, done)
+            replayed += len(done)
+        
+        return replayed
@@ -0,0 +1,176 @@
+from typing import Dict, Iterable, List, Tuple
+from app.config import settings
+import json
+import struct
+import time
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+def _json_dumps(data) -> bytes:
+    if orjson:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+def _json_loads(data):
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class RawSerializer:
+    """Header JSON pequeno com tamanho prefixado + corpo original intacto"""
+    tag = b'R'
+    
+    def dumps(self, header: Dict, body: bytes) -> bytes:
+        head = _json_dumps(header)
+        return struct.pack('>H', len(head)) + head + body
+    
+    def loads(self, payload: bytes) -> Tuple[Dict, bytes]:
+        (size,) = struct.unpack_from('>H', payload)
+        return _json_loads(payload[2:2 + size]), payload[2 + size:]
+
+class MsgpackSerializer:
+    """Envelope em msgpack (corpo como bytes)"""
+    tag = b'M'
+    
+    def dumps(self, header: Dict, body: bytes) -> bytes:
+        return msgpack.packb([header, body], use_bin_type=True)
+    
+    def loads(self, payload: bytes) -> Tuple[Dict, bytes]:
+        header, body = msgpack.unpackb(payload, raw=False)
+        return header, body
+
+class OrjsonSerializer:
+    """Envelope em JSON via orjson (corpo como string, sem parse do update)"""
+    tag = b'J'
+    
+    def dumps(self, header: Dict, body: bytes) -> bytes:
+        return orjson.dumps({'h': header, 'b': body.decode('utf-8')})
+    
+    def loads(self, payload: bytes) -> Tuple[Dict, bytes]:
+        data = orjson.loads(payload)
+        return data['h'], data['b'].encode('utf-8')
+
+SERIALIZERS = {
+    'raw': RawSerializer(),
+    'msgpack': MsgpackSerializer(),
+    'orjson': OrjsonSerializer()
+}
+
+# Decodificação pelo byte de formato (web e worker podem usar formatos diferentes)
+_BY_TAG = {serializer.tag: serializer for serializer in SERIALIZERS.values()}
+
+# Classes de prioridade (menor = mais urgente) e a fila de cada uma
+PRIORITY_CALLBACK = 0
+PRIORITY_COMMAND = 1
+PRIORITY_BACKGROUND = 2
+
+UPDATE_QUEUES = (
+    'telegram_updates:callbacks',
+    'telegram_updates:commands',
+    'telegram_updates'
+)
+
+# Updates que esgotaram as retentativas
+DEAD_LETTER_QUEUE = 'telegram_updates:dead'
+
+def partition_of(bot_id: str, partitions: int = None) -> int:
+    """Partição do bot por jump consistent hash (mudar o total move só ~1/n dos bots)"""
+    partitions = partitions or settings.QUEUE_PARTITIONS
+    key = zlib.crc32(str(bot_id).encode())
+    bucket, jump = -1, 0
+    while jump < partitions:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+def partition_queue(priority: int, partition: int) -> str:
+    """Fila da classe na partição (sem sufixo quando há uma partição só)"""
+    if settings.QUEUE_PARTITIONS <= 1:
+        return UPDATE_QUEUES[priority]
+    return f"{UPDATE_QUEUES[priority]}:p{partition}"
+
+def queue_for(priority: int, bot_id: str) -> str:
+    """Fila onde entram os updates da classe para o bot"""
+    if settings.QUEUE_PARTITIONS <= 1:
+        return UPDATE_QUEUES[priority]
+    return partition_queue(priority, partition_of(bot_id))
+
+def update_queues(partitions: Iterable[int] = None) -> List[str]:
+    """Todas as filas de updates das partições (padrão: todas)"""
+    if partitions is None:
+        partitions = range(max(settings.QUEUE_PARTITIONS, 1))
+    return [partition_queue(priority, partition) for partition in partitions for priority in range(len(UPDATE_QUEUES))]
+
+def classify_update(body: bytes) -> int:
+    """Classe do update pelo corpo bruto (busca de bytes, sem parse do JSON)"""
+    if b'"callback_query"' in body:
+        return PRIORITY_CALLBACK
+    if b'"text":"/' in body or b'"text": "/' in body:
+        return PRIORITY_COMMAND
+    return PRIORITY_BACKGROUND
+
+def get_serializer(name: str):
+    """Escolher serializador, voltando para 'raw' se a lib não estiver instalada"""
+    if name == 'msgpack' and not msgpack:
+        print("⚠️ msgpack não instalado, usando serializador 'raw'")
+        name = 'raw'
+    elif name == 'orjson' and not orjson:
+        print("⚠️ orjson não instalado, usando serializador 'raw'")
+        name = 'raw'
+    return SERIALIZERS.get(name, SERIALIZERS['raw'])
+
+class UpdateEnvelope:
+    """Envelope da fila: header fixo (bot_id, received_at) + corpo bruto do webhook"""
+    serializer = get_serializer(settings.QUEUE_SERIALIZER)
+    
+    @staticmethod
+    def encode(bot_id: str, body: bytes, received_at: float = None, **extra) -> bytes:
+        """Montar envelope sem decodificar o corpo"""
+        header = {'bot_id': bot_id, 'received_at': received_at or time.time()}
+        header.update(extra)
+        serializer = UpdateEnvelope.serializer
+        return serializer.tag + serializer.dumps(header, body)
+    
+    @staticmethod
+    def decode(payload: bytes) -> Dict:
+        """Abrir envelope: campos do header + 'body' (bytes)"""
+        serializer = _BY_TAG.get(payload[:1])
+        if not serializer:
+            raise ValueError("Formato de envelope desconhecido")
+        
+        header, body = serializer.loads(payload[1:])
+        header['body'] = body
+        return header
+    
+    @staticmethod
+    def reencode(payload: bytes, **changes) -> bytes:
+        """Trocar campos do header mantendo o corpo (None remove o campo)"""
+        header = UpdateEnvelope.decode(payload)
+        body = header.pop('body')
+        for key, value in changes.items():
+            if value is None:
+                header.pop(key, None)
+            else:
+                header[key] = value
+        serializer = UpdateEnvelope.serializer
+        return serializer.tag + serializer.dumps(header, body)
+    
+    @staticmethod
+    def parse_update(body: bytes) -> Dict:
+        """Decodificar o update do Telegram (uma única vez, no worker)"""
+        return _json_loads(body)
+    
+    @staticmethod
+    def dump_update(update: Dict) -> bytes:
+        """Serializar update já decodificado (trabalho adiado pelo worker)"""
+        return _json_dumps(update)
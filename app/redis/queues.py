@@ -0,0 +1,666 @@
+from typing import Dict, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import itertools
+import sqlite3
+import time
+
+class MemoryQueue:
+    """Fila local em memória (deque + get bloqueante)"""
+    
+    def __init__(self):
+        self._queue: Dict[str, deque] = {}
+        self._waiters: Dict[str, deque] = {}
+        self._ids = itertools.count(1)
+    
+    async def push(self, queue_name: str, payload: bytes) -> int:
+        """Adicionar item ao fim da fila"""
+        if queue_name not in self._queue:
+            self._queue[queue_name] = deque()
+        self._queue[queue_name].append({'id': str(next(self._ids)), 'payload': payload})
+        self._wake(queue_name)
+        return len(self._queue[queue_name])
+    
+    async def push_many(self, queue_name: str, payloads: List[bytes]) -> int:
+        """Adicionar vários itens de uma vez"""
+        for payload in payloads:
+            await self.push(queue_name, payload)
+        return len(self._queue.get(queue_name, ()))
+    
+    async def pop(self, queue_name: str, timeout: float = 1) -> Optional[Dict]:
+        """Pegar item da fila, aguardando até `timeout` segundos"""
+        if queue_name not in self._queue:
+            self._queue[queue_name] = deque()
+        queue = self._queue[queue_name]
+        
+        if queue:
+            return queue.popleft()
+        if not timeout or timeout <= 0:
+            return None
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        
+        # Outro consumidor pode pegar o item antes de este waiter acordar
+        while not queue:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            
+            waiter = loop.create_future()
+            self._waiters.setdefault(queue_name, deque()).append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                break
+            except asyncio.CancelledError:
+                # Repassar o aviso se este waiter já tinha sido acordado
+                if waiter.done() and not waiter.cancelled():
+                    self._wake(queue_name)
+                raise
+        
+        return queue.popleft() if queue else None
+    
+    async def ack(self, queue_name: str, message_id: str) -> None:
+        """Sem confirmação na fila em memória (item sai no pop)"""
+        return None
+    
+    async def ack_many(self, queue_name: str, message_ids: List) -> None:
+        """Sem confirmação na fila em memória"""
+        return None
+    
+    async def reclaim(self, queue_name: str, min_idle_ms: int) -> int:
+        """Nada a recuperar na fila em memória"""
+        return 0
+    
+    async def renew(self, older_than: float) -> int:
+        """Sem reserva a renovar na fila em memória"""
+        return 0
+    
+    async def length(self, queue_name: str) -> int:
+        """Tamanho atual da fila"""
+        return len(self._queue.get(queue_name, ()))
+    
+    async def list_queues(self, prefix: str) -> List[str]:
+        """Filas não vazias cujo nome começa com `prefix`"""
+        return [name for name, queue in self._queue.items() if queue and name.startswith(prefix)]
+    
+    async def peek(self, queue_name: str, limit: int, after=None) -> List[Dict]:
+        """Ler itens sem consumir (ids maiores que `after`, como nos outros backends)"""
+        items = list(self._queue.get(queue_name, ()))
+        if after is not None:
+            # O item do cursor pode já ter saído da fila (replay remove a página lida)
+            items = [item for item in items if int(item['id']) > int(after)]
+        return items[:limit]
+    
+    async def remove(self, queue_name: str, message_ids: List) -> int:
+        """Remover itens específicos sem consumir a fila"""
+        queue = self._queue.get(queue_name)
+        if not queue:
+            return 0
+        targets = set(message_ids)
+        kept = [item for item in queue if item['id'] not in targets]
+        removed = len(queue) - len(kept)
+        # Mesmo deque: um pop() aguardando guarda a referência e veria só o antigo
+        queue.clear()
+        queue.extend(kept)
+        return removed
+    
+    async def release(self, queue_name: str, items: List[Dict]) -> None:
+        """Devolver itens retirados e não processados para a frente da fila, na ordem original"""
+        if not items:
+            return
+        queue = self._queue.setdefault(queue_name, deque())
+        queue.extendleft(sorted(items, key=lambda item: int(item['id']), reverse=True))
+        for _ in items:
+            self._wake(queue_name)
+    
+    async def close(self):
+        """Nada a fechar na fila em memória"""
+        return None
+    
+    def _wake(self, queue_name: str):
+        """Acordar um consumidor aguardando na fila"""
+        waiters = self._waiters.get(queue_name)
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+class StreamsQueue:
+    """Fila em Redis Streams com consumer group, ack explícito e reclaim"""
+    
+    FIELD = b'd'
+    
+    def __init__(self, url: str, max_connections: int, group: str, consumer: str, maxlen: int = None, prefetch: int = 32):
+        import redis.asyncio as aioredis
+        
+        self.pool = aioredis.ConnectionPool.from_url(url, max_connections=max_connections)
+        self.client = aioredis.Redis(connection_pool=self.pool)
+        self.group = group
+        self.consumer = consumer
+        self.maxlen = maxlen
+        self.prefetch = prefetch
+        self._groups = set()
+        self._buffer: Dict[str, deque] = {}
+        self._reclaim_cursor: Dict[str, str] = {}
+        # Entregues a este consumidor e ainda sem ack: stream -> id -> última renovação
+        self._held: Dict[str, Dict[str, float]] = {}
+    
+    @staticmethod
+    def _text(message_id) -> str:
+        return message_id.decode() if isinstance(message_id, bytes) else str(message_id)
+    
+    def _hold(self, stream: str, message_ids: List):
+        held = self._held.setdefault(stream, {})
+        now = time.monotonic()
+        for message_id in message_ids:
+            held[self._text(message_id)] = now
+    
+    def _drop(self, stream: str, message_ids: List):
+        held = self._held.get(stream)
+        if held:
+            for message_id in message_ids:
+                held.pop(self._text(message_id), None)
+    
+    async def _ensure_group(self, stream: str):
+        """Criar o consumer group (e o stream) uma única vez"""
+        if stream in self._groups:
+            return
+        
+        from redis.exceptions import ResponseError
+        try:
+            await self.client.xgroup_create(stream, self.group, id='0', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._groups.add(stream)
+    
+    async def push(self, stream: str, payload: bytes) -> int:
+        """XADD + XLEN em um único round-trip"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.xadd(stream, {self.FIELD: payload}, maxlen=self.maxlen, approximate=True)
+        pipe.xlen(stream)
+        _, length = await pipe.execute()
+        return length
+    
+    async def push_many(self, stream: str, payloads: List[bytes]) -> int:
+        """XADD em pipeline para enfileiramento em lote"""
+        if not payloads:
+            return await self.length(stream)
+        
+        pipe = self.client.pipeline(transaction=False)
+        for payload in payloads:
+            pipe.xadd(stream, {self.FIELD: payload}, maxlen=self.maxlen, approximate=True)
+        pipe.xlen(stream)
+        results = await pipe.execute()
+        return results[-1]
+    
+    async def pop(self, stream: str, timeout: float = 1) -> Optional[Dict]:
+        """Ler próxima entrada do group (buffer local primeiro: recuperadas e pré-lidas)"""
+        buffer = self._buffer.setdefault(stream, deque())
+        if buffer:
+            return buffer.popleft()
+        
+        await self._ensure_group(stream)
+        block = int(timeout * 1000) if timeout and timeout > 0 else None
+        result = await self.client.xreadgroup(
+            self.group, self.consumer, {stream: '>'}, count=self.prefetch, block=block
+        )
+        if not result:
+            return None
+        
+        # Um round-trip traz até `prefetch` entradas; as extras ficam pendentes no group
+        _, entries = result[0]
+        for message_id, fields in entries:
+            buffer.append({'id': message_id, 'payload': fields[self.FIELD]})
+        self._hold(stream, [message_id for message_id, _ in entries])
+        return buffer.popleft() if buffer else None
+    
+    async def ack(self, stream: str, message_id) -> None:
+        """XACK + XDEL: o stream guarda apenas o backlog pendente"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.xack(stream, self.group, message_id)
+        pipe.xdel(stream, message_id)
+        await pipe.execute()
+        self._drop(stream, [message_id])
+    
+    async def ack_many(self, stream: str, message_ids: List) -> None:
+        """XACK + XDEL de vários ids em um round-trip"""
+        if not message_ids:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        pipe.xack(stream, self.group, *message_ids)
+        pipe.xdel(stream, *message_ids)
+        await pipe.execute()
+        self._drop(stream, message_ids)
+    
+    async def reclaim(self, stream: str, min_idle_ms: int, count: int = 100) -> int:
+        """Assumir entradas paradas de consumidores mortos (XAUTOCLAIM)"""
+        await self._ensure_group(stream)
+        
+        # Um lote por chamada; o cursor continua de onde parou na próxima
+        result = await self.client.xautoclaim(
+            stream, self.group, self.consumer,
+            min_idle_time=min_idle_ms,
+            start_id=self._reclaim_cursor.get(stream, '0-0'),
+            count=count
+        )
+        self._reclaim_cursor[stream] = result[0]
+        
+        buffer = self._buffer.setdefault(stream, deque())
+        for message_id, fields in result[1]:
+            # Entradas removidas do stream voltam sem campos
+            if fields and self.FIELD in fields:
+                buffer.append({'id': message_id, 'payload': fields[self.FIELD]})
+                self._hold(stream, [message_id])
+        
+        return len(result[1])
+    
+    async def renew(self, older_than: float) -> int:
+        """Zerar o idle das entradas ainda seguradas (XCLAIM JUSTID para este consumidor)
+        
+        Itens esperando na janela do escalonador, nas lanes ou em retentativa
+        continuam pendentes no group; sem isso o próprio reclaim os assumiria
+        de novo depois de QUEUE_RECLAIM_IDLE_MS e o update seria processado duas vezes.
+        """
+        renewed = 0
+        now = time.monotonic()
+        for stream, held in self._held.items():
+            due = [message_id for message_id, at in held.items() if now - at >= older_than]
+            for start in range(0, len(due), 500):
+                ids = due[start:start + 500]
+                await self.client.xclaim(stream, self.group, self.consumer, 0, ids, justid=True)
+                for message_id in ids:
+                    if message_id in held:
+                        held[message_id] = now
+                renewed += len(ids)
+        return renewed
+    
+    async def length(self, stream: str) -> int:
+        """Backlog do stream (pendentes + não lidos)"""
+        return await self.client.xlen(stream)
+    
+    async def list_queues(self, prefix: str) -> List[str]:
+        """Streams cujo nome começa com `prefix` (SCAN, sem bloquear o Redis)"""
+        names = []
+        async for key in self.client.scan_iter(match=f"{prefix}*", _type='stream'):
+            names.append(key.decode() if isinstance(key, bytes) else key)
+        return names
+    
+    async def peek(self, stream: str, limit: int, after=None) -> List[Dict]:
+        """XRANGE sem passar pelo consumer group"""
+        entries = await self.client.xrange(stream, min=f"({after}" if after else '-', max='+', count=limit)
+        return [
+            {'id': message_id.decode() if isinstance(message_id, bytes) else message_id, 'payload': fields[self.FIELD]}
+            for message_id, fields in entries
+        ]
+    
+    async def remove(self, stream: str, message_ids: List) -> int:
+        """XACK + XDEL de entradas específicas (lidas ou não pelo group)"""
+        if not message_ids:
+            return 0
+        await self._ensure_group(stream)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.xack(stream, self.group, *message_ids)
+        pipe.xdel(stream, *message_ids)
+        _, removed = await pipe.execute()
+        self._drop(stream, message_ids)
+        return removed
+    
+    @staticmethod
+    def _id_key(message_id):
+        text = message_id.decode() if isinstance(message_id, bytes) else str(message_id)
+        ms, _, seq = text.partition('-')
+        return int(ms), int(seq or 0)
+    
+    async def release(self, stream: str, items: List[Dict]) -> None:
+        """Devolver entradas lidas e não processadas (XADD de novo + XACK/XDEL, atômico)
+        
+        O group não tem "nack": sem isso a entrada só voltaria pelo reclaim
+        depois de QUEUE_RECLAIM_IDLE_MS. A entrada reaparece no fim do stream.
+        """
+        if not items:
+            return
+        ordered = sorted(items, key=lambda item: self._id_key(item['id']))
+        ids = [item['id'] for item in ordered]
+        pipe = self.client.pipeline(transaction=True)
+        for item in ordered:
+            pipe.xadd(stream, {self.FIELD: item['payload']}, maxlen=self.maxlen, approximate=True)
+        pipe.xack(stream, self.group, *ids)
+        pipe.xdel(stream, *ids)
+        await pipe.execute()
+        self._drop(stream, ids)
+    
+    async def close(self):
+        """Devolver entradas pré-lidas e fechar pool de conexões"""
+        for stream, buffer in self._buffer.items():
+            if buffer:
+                try:
+                    await self.release(stream, list(buffer))
+                    buffer.clear()
+                except Exception as e:
+                    # Continuam pendentes no group e voltam pelo reclaim
+                    print(f"❌ Erro ao devolver entradas pré-lidas: {str(e)}")
+        await self.pool.disconnect()
+
+
+class SQLiteQueue:
+    """Fila durável em SQLite (WAL) com group commit, visibility timeout e ack"""
+    
+    def __init__(self, path: str, visibility_timeout: float, poll_interval: float = 0.1, prefetch: int = 32):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.prefetch = prefetch
+        self.commits = 0
+        
+        # Uma única thread acessa a conexão: operações serializadas sem lock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-queue')
+        self._conn = None
+        self._pending_push: List = []
+        self._pending_ack: List = []
+        self._flushing = False
+        self._buffers: Dict[str, deque] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        # Reservados por este processo e ainda sem ack: id -> última renovação
+        self._held: Dict[int, float] = {}
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS queue_items ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " queue TEXT NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " visible_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_queue_visible ON queue_items (queue, visible_at, id)"
+        )
+        return conn
+    
+    async def _run(self, fn, *args):
+        """Executar operação na thread da conexão"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+    
+    def _commit_batch(self, pushes: List, acks: List) -> Dict[str, int]:
+        """Gravar inserts e acks pendentes em uma única transação (um fsync)"""
+        if self._conn is None:
+            self._conn = self._connect()
+        
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            if pushes:
+                self._conn.executemany(
+                    "INSERT INTO queue_items (queue, payload, visible_at) VALUES (?, ?, ?)",
+                    [(queue_name, payload, now) for queue_name, payload in pushes]
+                )
+            if acks:
+                self._conn.executemany("DELETE FROM queue_items WHERE id = ?", [(i,) for i in acks])
+            
+            # Tamanho de cada fila tocada, uma contagem por lote
+            lengths = {queue_name: self._count(queue_name) for queue_name in {q for q, _ in pushes}}
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self.commits += 1
+        return lengths
+    
+    async def _flush(self):
+        """Group commit: quem chega durante um commit entra no próximo"""
+        self._flushing = True
+        try:
+            while self._pending_push or self._pending_ack:
+                pushes, self._pending_push = self._pending_push, []
+                acks, self._pending_ack = self._pending_ack, []
+                try:
+                    lengths = await self._run(self._commit_batch, [(q, p) for q, p, _ in pushes], acks)
+                except Exception as e:
+                    for _, _, future in pushes:
+                        if not future.done():
+                            future.set_exception(e)
+                    # Acks voltam para o próximo commit (o item segue reservado e renovado até lá)
+                    self._pending_ack[:0] = acks
+                    print(f"❌ Erro no commit da fila SQLite ({len(acks)} acks adiados): {str(e)}")
+                    if not self._pending_push:
+                        break
+                    continue
+                
+                for message_id in acks:
+                    self._held.pop(message_id, None)
+                for queue_name, _, future in pushes:
+                    if not future.done():
+                        future.set_result(lengths[queue_name])
+                    if queue_name in self._events:
+                        self._events[queue_name].set()
+        finally:
+            self._flushing = False
+    
+    def _schedule_flush(self):
+        if not self._flushing:
+            asyncio.get_running_loop().create_task(self._flush())
+    
+    async def push(self, queue_name: str, payload: bytes) -> int:
+        """Enfileirar; retorna depois do commit em disco"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending_push.append((queue_name, payload, future))
+        self._schedule_flush()
+        return await future
+    
+    async def push_many(self, queue_name: str, payloads: List[bytes]) -> int:
+        """Enfileirar vários itens no mesmo commit"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for payload in payloads:
+            future = loop.create_future()
+            self._pending_push.append((queue_name, payload, future))
+            futures.append(future)
+        self._schedule_flush()
+        lengths = await asyncio.gather(*futures)
+        return lengths[-1] if lengths else await self.length(queue_name)
+    
+    def _claim(self, queue_name: str, limit: int) -> List[Dict]:
+        """Reservar itens visíveis, escondendo-os pelo visibility timeout"""
+        if self._conn is None:
+            self._conn = self._connect()
+        
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM queue_items WHERE queue = ? AND visible_at <= ? ORDER BY id LIMIT ?",
+                (queue_name, now, limit)
+            ).fetchall()
+            if rows:
+                self._conn.executemany(
+                    "UPDATE queue_items SET visible_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(now + self.visibility_timeout, row[0]) for row in rows]
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return [{'id': row[0], 'payload': row[1]} for row in rows]
+    
+    async def pop(self, queue_name: str, timeout: float = 1) -> Optional[Dict]:
+        """Pegar item visível, aguardando até `timeout` segundos"""
+        buffer = self._buffers.setdefault(queue_name, deque())
+        event = self._events.setdefault(queue_name, asyncio.Event())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or 0)
+        
+        while True:
+            if buffer:
+                return buffer.popleft()
+            
+            event.clear()
+            claimed = await self._run(self._claim, queue_name, self.prefetch)
+            now = time.monotonic()
+            for item in claimed:
+                self._held[item['id']] = now
+            buffer.extend(claimed)
+            if buffer:
+                return buffer.popleft()
+            
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            
+            # Acorda com push local ou no próximo poll (produtores em outros processos)
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+    
+    async def ack(self, queue_name: str, message_id) -> None:
+        """Remover item processado (agrupado no próximo commit; segue reservado até gravar)"""
+        self._pending_ack.append(message_id)
+        self._schedule_flush()
+    
+    async def ack_many(self, queue_name: str, message_ids: List) -> None:
+        """Remover vários itens no próximo commit"""
+        self._pending_ack.extend(message_ids)
+        self._schedule_flush()
+    
+    async def reclaim(self, queue_name: str, min_idle_ms: int) -> int:
+        """Itens sem ack voltam sozinhos quando o visibility timeout expira"""
+        return 0
+    
+    def _extend(self, message_ids: List):
+        if self._conn is None:
+            self._conn = self._connect()
+        visible_at = time.time() + self.visibility_timeout
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "UPDATE queue_items SET visible_at = ? WHERE id = ?", [(visible_at, i) for i in message_ids]
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+    
+    async def renew(self, older_than: float) -> int:
+        """Adiar o visible_at dos itens ainda segurados (janela, lanes, retentativas)
+        
+        Sem isso um item parado na memória do worker além do visibility
+        timeout volta a ficar visível e é reservado e processado de novo.
+        """
+        # Acks de um commit que falhou: nova tentativa mesmo sem outro push ou ack
+        if self._pending_ack:
+            self._schedule_flush()
+        
+        now = time.monotonic()
+        due = [message_id for message_id, at in self._held.items() if now - at >= older_than]
+        if not due:
+            return 0
+        await self._run(self._extend, due)
+        for message_id in due:
+            if message_id in self._held:
+                self._held[message_id] = now
+        return len(due)
+    
+    def _count(self, queue_name: str) -> int:
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM queue_items WHERE queue = ?", (queue_name,)
+        ).fetchone()[0]
+    
+    async def length(self, queue_name: str) -> int:
+        """Itens na fila (visíveis + em processamento)"""
+        return await self._run(self._count, queue_name)
+    
+    def _list(self, prefix: str) -> List[str]:
+        if self._conn is None:
+            self._conn = self._connect()
+        rows = self._conn.execute(
+            "SELECT DISTINCT queue FROM queue_items WHERE substr(queue, 1, ?) = ?",
+            (len(prefix), prefix)
+        ).fetchall()
+        return [row[0] for row in rows]
+    
+    async def list_queues(self, prefix: str) -> List[str]:
+        """Filas com itens cujo nome começa com `prefix`"""
+        return await self._run(self._list, prefix)
+    
+    def _peek(self, queue_name: str, limit: int, after) -> List[Dict]:
+        if self._conn is None:
+            self._conn = self._connect()
+        rows = self._conn.execute(
+            "SELECT id, payload FROM queue_items WHERE queue = ? AND id > ? ORDER BY id LIMIT ?",
+            (queue_name, int(after or 0), limit)
+        ).fetchall()
+        return [{'id': row[0], 'payload': row[1]} for row in rows]
+    
+    async def peek(self, queue_name: str, limit: int, after=None) -> List[Dict]:
+        """Ler itens sem reservar (visíveis ou não)"""
+        return await self._run(self._peek, queue_name, limit, after)
+    
+    def _remove(self, queue_name: str, message_ids: List) -> int:
+        if self._conn is None:
+            self._conn = self._connect()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = 0
+            for message_id in message_ids:
+                removed += self._conn.execute(
+                    "DELETE FROM queue_items WHERE queue = ? AND id = ?", (queue_name, int(message_id))
+                ).rowcount
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return removed
+    
+    async def remove(self, queue_name: str, message_ids: List) -> int:
+        """Remover itens específicos em uma transação"""
+        removed = await self._run(self._remove, queue_name, message_ids)
+        for message_id in message_ids:
+            self._held.pop(int(message_id), None)
+        return removed
+    
+    def _release(self, message_ids: List):
+        if self._conn is None:
+            self._conn = self._connect()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "UPDATE queue_items SET visible_at = 0 WHERE id = ?", [(int(i),) for i in message_ids]
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+    
+    async def release(self, queue_name: str, items: List[Dict]) -> None:
+        """Tornar visíveis já os itens reservados e não processados (mantêm o id e a ordem)"""
+        if items:
+            await self._run(self._release, [item['id'] for item in items])
+            for item in items:
+                self._held.pop(item['id'], None)
+    
+    async def close(self):
+        """Gravar pendências, devolver itens pré-reservados e fechar a conexão"""
+        while self._flushing:
+            await asyncio.sleep(0.01)
+        buffered = [item for buffer in self._buffers.values() for item in buffer]
+        if buffered:
+            await self._run(self._release, [item['id'] for item in buffered])
+            self._buffers.clear()
+        if self._pending_push or self._pending_ack:
+            await self._flush()
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
@@ -4,9 +4,12 @@ from pydantic import BaseModel
 from typing import List, Optional, Union, Dict, Any
 from app.database.connection import get_db
 from app.bot.manager import BotManager
-from app.database.crud import BotCRUD, InteractionCRUD
+from app.database.crud import BotCRUD, InteractionCRUD, StatisticsCRUD
 from app.auth import get_current_user_optional
 from app.config import settings
+from app.utils.metrics import metrics
+from app.utils.admission import admission
+from app.redis.dead_letters import DeadLetterQueue
 import os
 import shutil
 import uuid
@@ -28,6 +31,11 @@ class BotConfig(BaseModel):
     message_2: Optional[str] = None
     plans: Optional[Any] = []
 
+class DeadLetterReplay(BaseModel):
+    limit: int = 1000
+    bot_id: Optional[str] = None
+    ids: Optional[List[Union[str, int]]] = None
+
 class BotResponse(BaseModel):
     id: str
     username: str
@@ -67,32 +75,38 @@ async def create_bot(
 @router.get("/bots")
 async def list_bots(
     request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[int] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Listar bots do usuário logado"""
+    """Listar bots do usuário logado (todos, ou páginas de `limit` seguindo `next_cursor`)"""
     user = await get_current_user_optional(request, db)
     if not user:
         raise HTTPException(status_code=401, detail="Não autorizado")
     
-    # Buscar apenas bots do usuário
-    bots = await BotCRUD.get_user_bots(db, user.id)
+    # Uma query para a página inteira, estatísticas incluídas
+    limit = min(max(limit, 1), 500) if limit else None
+    rows = await BotCRUD.list_dashboard(db, user.id, limit=limit, after=cursor)
     
-    # Formatar resposta
     bots_list = []
-    for bot in bots:
-        unique_users = await InteractionCRUD.count_unique_users(db, bot.bot_id)
+    for row in rows:
         bots_list.append({
-            'id': bot.bot_id,
-            'username': bot.username,
-            'is_active': bot.is_active,
-            'webhook_active': bot.webhook_active,
-            'total_users': unique_users,
-            'total_messages': bot.total_messages,
-            'last_activity': str(bot.last_activity) if bot.last_activity else None,
-            'created_at': str(bot.created_at)
+            'id': row['bot_id'],
+            'username': row['username'],
+            'is_active': row['is_active'],
+            'webhook_active': row['webhook_active'],
+            'total_users': row['total_users'] or 0,
+            'total_messages': row['total_messages'] or 0,
+            'messages_today': row['messages_today'] or 0,
+            'errors_today': row['errors_today'] or 0,
+            'avg_response_time': row['avg_response_time'],
+            'last_activity': str(row['last_activity']) if row['last_activity'] else None,
+            'created_at': str(row['created_at'])
         })
     
-    return {'bots': bots_list}
+    # Página cheia: pode haver mais (a próxima pode vir vazia)
+    next_cursor = rows[-1]['id'] if limit and len(rows) == limit else None
+    return {'bots': bots_list, 'next_cursor': next_cursor}
 
 @router.get("/bots/{bot_id}")
 async def get_bot(
@@ -111,9 +125,6 @@ async def get_bot(
     if not bot:
         raise HTTPException(status_code=404, detail="Bot não encontrado")
     
-    # Buscar estatísticas
-    unique_users = await InteractionCRUD.count_unique_users(db, bot_id)
-    
     return {
         'id': bot.bot_id,
         'username': bot.username,
@@ -128,7 +139,7 @@ async def get_bot(
             'plans': bot.plans or []
         },
         'stats': {
-            'total_users': unique_users,
+            'total_users': bot.total_users or 0,
             'total_messages': bot.total_messages,
             'messages_today': bot.messages_today,
             'last_activity': str(bot.last_activity) if bot.last_activity else None
@@ -171,12 +182,8 @@ async def update_bot_config(
         config_dict['media_file_id'] = None
         config_dict['media_file_processed'] = False
     
-    # Atualizar com verificação de ownership
-    success = await BotCRUD.update_bot(db, bot_id, config_dict, user.id)
-    
-    # Limpar cache
-    from app.redis.cache import cache_manager
-    await cache_manager.invalidate_bot_config(bot_id)
+    # Atualizar com verificação de ownership (limpa cache e registro)
+    success = await BotManager.update_bot_config(db, bot_id, config_dict, user.id)
     
     return {'success': bool(success)}
 
@@ -203,6 +210,7 @@ async def delete_bot(
 async def get_bot_stats(
     bot_id: str,
     request: Request,
+    days: int = 30,
     db: AsyncSession = Depends(get_db)
 ):
     """Obter estatísticas do bot"""
@@ -217,12 +225,24 @@ async def get_bot_stats(
         raise HTTPException(status_code=404, detail="Bot não encontrado")
     
     interactions = await InteractionCRUD.get_bot_interactions(db, bot_id, limit=50)
-    unique_users = await InteractionCRUD.count_unique_users(db, bot_id)
+    
+    # Série diária vem do rollup: custo por dia, não por interação
+    daily = await StatisticsCRUD.get_daily(db, bot_id, min(max(days, 1), 365))
     
     return {
-        'total_users': unique_users,
+        'total_users': bot.total_users or 0,
         'total_messages': bot.total_messages,
         'messages_today': bot.messages_today,
+        'daily': [
+            {
+                'date': day.date.strftime('%Y-%m-%d'),
+                'messages_sent': day.messages_sent or 0,
+                'new_users': day.new_users or 0,
+                'errors': day.errors or 0,
+                'avg_response_time': day.avg_response_time
+            }
+            for day in daily
+        ],
         'recent_interactions': [
             {
                 'user_id': i.user_id,
@@ -293,6 +313,48 @@ async def health_check():
         'version': '1.0.0'
     }
 
+@router.get("/metrics")
+async def get_metrics(request: Request, db: AsyncSession = Depends(get_db)):
+    """Métricas do processo (latência do webhook, fila, descarte por bot) - só admin"""
+    await require_admin(request, db)
+    
+    snapshot = metrics.snapshot()
+    snapshot['admission'] = admission.stats()
+    return snapshot
+
+async def require_admin(request: Request, db: AsyncSession):
+    """Usuário logado com is_admin"""
+    user = await get_current_user_optional(request, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autorizado")
+    if not user.is_admin:
+        raise HTTPException(status_code=403, detail="Apenas administradores")
+    return user
+
+@router.get("/admin/dead-letters")
+async def list_dead_letters(
+    request: Request,
+    limit: int = 50,
+    after: Optional[str] = None,
+    bot_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Inspecionar updates que esgotaram as retentativas"""
+    await require_admin(request, db)
+    return await DeadLetterQueue.inspect(min(max(limit, 1), 500), after, bot_id)
+
+@router.post("/admin/dead-letters/replay")
+async def replay_dead_letters(
+    replay: DeadLetterReplay,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Reenviar em lote para a fila de origem (filtro opcional por bot ou ids)"""
+    user = await require_admin(request, db)
+    replayed = await DeadLetterQueue.replay(max(replay.limit, 1), replay.bot_id, replay.ids)
+    print(f"♻️ {user.email} reenviou {replayed} updates da fila de mortos")
+    return {'replayed': replayed}
+
 @router.get("/user/stats")
 async def get_user_stats(
     request: Request,
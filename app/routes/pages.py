@@ -26,6 +26,16 @@ async def get_current_user(request: Request, db: AsyncSession):
     )
     return result.scalar_one_or_none()
 
+def dashboard_rows(rows):
+    """Formatar linhas do painel para os templates"""
+    return [{
+        'id': row['bot_id'],
+        'username': row['username'] or 'Bot sem nome',
+        'is_active': row['is_active'],
+        'total_users': row['total_users'] or 0,
+        'total_messages': row['total_messages'] or 0
+    } for row in rows]
+
 @router.get("/", response_class=HTMLResponse)
 async def index(
     request: Request,
@@ -36,19 +46,8 @@ async def index(
     if not user:
         return RedirectResponse(url="/login", status_code=302)
     
-    # Buscar apenas bots do usuário
-    bots = await BotCRUD.get_user_bots(db, user.id)
-    
-    # Formatar para template
-    bots_list = []
-    for bot in bots:
-        bots_list.append({
-            'id': bot.bot_id,
-            'username': bot.username or 'Bot sem nome',
-            'is_active': bot.is_active,
-            'total_users': bot.total_users,
-            'total_messages': bot.total_messages
-        })
+    # Buscar apenas bots do usuário (mesma query única do /api/bots)
+    bots_list = dashboard_rows(await BotCRUD.list_dashboard(db, user.id))
     
     return templates.TemplateResponse(
         "index.html",
@@ -71,17 +70,7 @@ async def bots_page(
     if not user:
         return RedirectResponse(url="/login", status_code=302)
     
-    bots = await BotCRUD.get_user_bots(db, user.id)
-    
-    bots_list = []
-    for bot in bots:
-        bots_list.append({
-            'id': bot.bot_id,
-            'username': bot.username or 'Bot sem nome',
-            'is_active': bot.is_active,
-            'total_users': bot.total_users,
-            'total_messages': bot.total_messages
-        })
+    bots_list = dashboard_rows(await BotCRUD.list_dashboard(db, user.id))
     
     return templates.TemplateResponse(
         "pages/bots.html",
@@ -1,13 +1,19 @@
 from fastapi import APIRouter, Request, Response, Depends, HTTPException
-from app.redis.cache import cache_manager
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.connection import get_db
-from app.database.crud import BotCRUD
 from app.bot.webhook import WebhookHandler
 from app.bot.manager import BotManager
+from app.bot.responses import ResponseBuilder
 from app.bot.telegram_api import telegram_api
+from app.bot.sender import chat_sender
+from app.bot.registry import bot_registry
+from app.utils.metrics import metrics
+from app.utils.admission import admission
+from app.config import settings
+from functools import partial
+from typing import Dict, Optional
 import time
-import os
 import asyncio
 
 router = APIRouter(prefix="/webhook", tags=["webhooks"])
@@ -21,11 +27,32 @@ async def handle_webhook(
     """Endpoint para receber webhooks do Telegram"""
     start_time = time.time()
     
-    # Buscar bot
-    bot = await BotCRUD.get_bot_by_id(db, bot_id)
+    # Rejeitar sem o header do Telegram antes de qualquer consulta
+    if 'X-Telegram-Bot-Api-Secret-Token' not in request.headers:
+        raise HTTPException(status_code=401, detail="Não autorizado")
+    
+    # Buscar bot no registro em memória (sem ida ao banco)
+    bot = await bot_registry.resolve(db, bot_id)
     if not bot:
         raise HTTPException(status_code=404, detail="Bot não encontrado")
     
+    # Validar secret token antes de ler o corpo
+    if not await WebhookHandler.validate_secret_token(request.headers, bot['webhook_secret']):
+        raise HTTPException(status_code=401, detail="Não autorizado")
+    
+    # Bot desativado: confirmar recebimento sem processar
+    if not bot['is_active']:
+        return Response(status_code=200)
+    
+    # Modo fila: só validar, enfileirar e responder
+    if settings.WEBHOOK_MODE == 'queue':
+        # Fila acima da marca alta: recusar sem ler o corpo, o Telegram reenvia depois
+        rejection = admission.check(bot_id)
+        if rejection:
+            status_code, retry_after = rejection
+            return Response(status_code=status_code, headers={'Retry-After': str(retry_after)})
+        return await enqueue_update(bot_id, request, start_time)
+    
     # Processar update
     update = await request.json()
     print(f"📨 Webhook recebido para bot {bot_id}")
@@ -33,6 +60,14 @@ async def handle_webhook(
     # PROCESSAR DIRETO (SEM FILA) PARA TESTE LOCAL
     info = await WebhookHandler.extract_update_info(update)
     
+    # Primeira ação no corpo da resposta: uma ida ao Telegram a menos
+    if settings.WEBHOOK_REPLY_IN_RESPONSE:
+        reply = await reply_in_response(db, bot_id, info)
+        if reply is not None:
+            total_time = (time.time() - start_time) * 1000
+            print(f"⏱️ Tempo de processamento: {total_time:.2f}ms (resposta no webhook)")
+            return reply
+    
     # Se for comando /start
     if info['type'] == 'message' and info['text'] == '/start':
         print(f"🚀 Processando /start de {info['username']}")
@@ -45,117 +80,15 @@ async def handle_webhook(
             chat_id = info['chat_id']
             
             try:
-                # 1. Enviar mídia (se configurada)
-                if config.get('media_url') or config.get('media_file_id'):
-                    print(f"📸 Enviando mídia...")
-                    
-                    if config.get('media_file_id'):
-                        print(f"⚡ Usando file_id existente: {config['media_file_id'][:20]}...")
-                        success = await telegram_api.send_media_by_file_id(
-                            token, 
-                            chat_id, 
-                            config['media_file_id'],
-                            config.get('media_type', 'photo')
-                        )
-                        if success:
-                            print(f"✅ Mídia enviada via file_id (super rápido!)")
+                # Mídia (com a primeira mensagem de legenda quando cabe) e mensagens com os botões dos planos
+                for step in ResponseBuilder.start_plan(config):
+                    if step['media']:
+                        await BotManager.send_start_step(db, bot_id, chat_id, config, step)
                     else:
-                        print(f"📤 Primeira vez - obtendo file_id")
-                        file_id = await telegram_api.send_media_and_get_file_id(
-                            token,
-                            chat_id,
-                            config['media_url'],
-                            config.get('media_type', 'photo')
-                        )
-                        
-                        if file_id:
-                            print(f"✅ File_id obtido: {file_id[:20]}...")
-                            
-                            # Salvar file_id no banco
-                            await BotCRUD.update_bot(db, bot_id, {
-                                'media_file_id': file_id,
-                                'media_file_processed': True
-                            })
-                            
-                            # Invalidar cache
-                            await cache_manager.invalidate_bot_config(bot_id)
-                            print(f"🔄 Cache invalidado para bot {bot_id}")
-                            
-                            # Deletar arquivo local se existir
-                            if config.get('media_url'):
-                                try:
-                                    filename = config['media_url'].split('/')[-1].split('?')[0]
-                                    filepath = f"static/uploads/{filename}"
-                                    
-                                    if os.path.exists(filepath):
-                                        os.remove(filepath)
-                                        print(f"🗑️ Arquivo local deletado: {filename}")
-                                    else:
-                                        print(f"📁 Arquivo não encontrado localmente: {filename}")
-                                        
-                                except Exception as e:
-                                    print(f"⚠️ Não foi possível deletar arquivo: {e}")
-                        else:
-                            print(f"❌ Não foi possível obter file_id para a mídia")
-                
-                # 2. Preparar botões dos PLANOS (não mais "Ver Planos")
-                plans = config.get('plans', [])
-                reply_markup = None
-                
-                if plans and len(plans) > 0:
-                    keyboard = []
-                    
-                    for i, plan in enumerate(plans):
-                        if isinstance(plan, dict):
-                            plan_text = f"💎 {plan.get('name', 'Plano')} - R$ {plan.get('value', '0')} ({plan.get('days', '30')} dias)"
-                        else:
-                            plan_text = str(plan)
-                        
-                        keyboard.append([{
-                            'text': plan_text,
-                            'callback_data': f'buy_plan_{i}'
-                        }])
-                    
-                    reply_markup = {'inline_keyboard': keyboard}
-                
-                # 3. Enviar mensagens com lógica dos botões de planos
-                has_message_1 = config.get('message_1')
-                has_message_2 = config.get('message_2')
-                
-                if has_message_1 and has_message_2:
-                    # Tem as duas mensagens: envia mensagem 1 normal, mensagem 2 com botões dos planos
-                    await telegram_api.send_message(token, chat_id, config['message_1'])
-                    
-                    if reply_markup:
-                        await telegram_api.send_message(token, chat_id, config['message_2'], reply_markup)
-                    else:
-                        await telegram_api.send_message(token, chat_id, config['message_2'])
-                        
-                elif has_message_1:
-                    # Só tem mensagem 1: envia com botões dos planos
-                    if reply_markup:
-                        await telegram_api.send_message(token, chat_id, config['message_1'], reply_markup)
-                    else:
-                        await telegram_api.send_message(token, chat_id, config['message_1'])
-                        
-                elif has_message_2:
-                    # Só tem mensagem 2: envia com botões dos planos
-                    if reply_markup:
-                        await telegram_api.send_message(token, chat_id, config['message_2'], reply_markup)
-                    else:
-                        await telegram_api.send_message(token, chat_id, config['message_2'])
-                
-                elif reply_markup:
-                    # Não tem texto mas tem planos: envia só os botões
-                    await telegram_api.send_message(
-                        token, 
-                        chat_id, 
-                        "📋 *Escolha seu plano:*", 
-                        reply_markup
-                    )
+                        await telegram_api.send_message(token, chat_id, step['text'], step['reply_markup'])
                 
                 # Se não tem texto nem planos: só mostra a mídia
-                
+            
             except Exception as e:
                 print(f"❌ Erro ao enviar: {str(e)}")
                 import traceback
@@ -163,26 +96,15 @@ async def handle_webhook(
     
     # Se for callback de comprar plano
     elif info['type'] == 'callback_query' and info['callback_data'].startswith('buy_plan_'):
-        print(f"💰 Processando seleção de plano")
+        print("💰 Processando seleção de plano")
         config = await BotManager.get_bot_config(db, bot_id)
         
         if config:
             token = config['token']
             plan_index = int(info['callback_data'].replace('buy_plan_', ''))
-            plans = config.get('plans', [])
+            message = ResponseBuilder.plan_selected_text(config.get('plans', []), plan_index)
             
-            if plan_index < len(plans):
-                plan = plans[plan_index]
-                
-                if isinstance(plan, dict):
-                    message = "✅ *Plano Selecionado:*\n\n"
-                    message += f"📦 *Nome:* {plan.get('name')}\n"
-                    message += f"💰 *Valor:* R$ {plan.get('value')}\n"
-                    message += f"📅 *Duração:* {plan.get('days')} dias\n\n"
-                    message += "_Para continuar, entre em contato com o suporte._"
-                else:
-                    message = f"✅ Você selecionou: {plan}"
-                
+            if message:
                 await telegram_api.answer_callback_query(
                     token,
                     info.get('callback_id'),
@@ -196,4 +118,67 @@ async def handle_webhook(
     total_time = (time.time() - start_time) * 1000
     print(f"⏱️ Tempo de processamento: {total_time:.2f}ms")
     
-    return Response(status_code=200)
\ No newline at end of file
+    return Response(status_code=200)
+
+async def reply_in_response(db: AsyncSession, bot_id: str, info: Dict) -> Optional[Response]:
+    """Responder com a primeira ação da resposta no corpo do webhook e mandar o resto pelo cliente
+    
+    O Telegram executa uma chamada da Bot API devolvida na resposta do
+    webhook, mas não informa o resultado. Só entra aqui quando isso não muda
+    o que o usuário vê: callback (o answerCallbackQuery vai na resposta e a
+    mensagem de confirmação pelo cliente) ou resposta de uma única mensagem no
+    chat. Com várias mensagens a ordem entre a da resposta e as do cliente não
+    é garantida, e o primeiro envio da mídia precisa do file_id devolvido;
+    nesses casos (e sem ficha livre nos limites de envio) volta None e o
+    caminho normal responde.
+    """
+    config = await BotManager.get_bot_config(db, bot_id)
+    if not config:
+        return None
+    
+    actions = ResponseBuilder.webhook_actions(info, config)
+    if not actions:
+        return None
+    
+    method, payload = actions[0]
+    in_chat = sum(1 for _, data in actions if 'chat_id' in data)
+    if method != 'answerCallbackQuery' and in_chat > 1:
+        return None
+    
+    # A chamada da resposta conta nos mesmos buckets do make_request
+    token = config['token']
+    if 'chat_id' in payload and not telegram_api.scheduler.try_acquire(token.split(':', 1)[0], payload['chat_id']):
+        return None
+    
+    rest = [partial(telegram_api.make_request, token, name, data) for name, data in actions[1:]]
+    await chat_sender.submit(f"{bot_id}:{info['chat_id']}", rest)
+    
+    metrics.increment('webhook_reply_in_response')
+    return JSONResponse({'method': method, **payload})
+
+async def enqueue_update(bot_id: str, request: Request, start_time: float) -> Response:
+    """Enfileirar update para o worker e responder 200 só depois do push gravado
+    
+    Cancelar a espera não desfaz o push (o commit em grupo do SQLite e o XADD
+    seguem): um 503 no estouro do orçamento faria o Telegram reenviar um
+    update já enfileirado. O orçamento só marca a fila lenta.
+    """
+    body = await request.body()
+    budget = settings.WEBHOOK_ACK_BUDGET_MS / 1000
+    
+    enqueue = asyncio.ensure_future(WebhookHandler.process_webhook(bot_id, body))
+    try:
+        result = await asyncio.wait_for(asyncio.shield(enqueue), timeout=budget)
+    except asyncio.TimeoutError:
+        metrics.increment('webhook_enqueue_slow')
+        print(f"⚠️ Fila lenta: update do bot {bot_id} acima de {settings.WEBHOOK_ACK_BUDGET_MS}ms, aguardando a gravação")
+        result = await asyncio.shield(enqueue)
+    
+    admission.observe(result['queue'], result['queue_length'])
+    
+    elapsed_ms = (time.time() - start_time) * 1000
+    metrics.observe('webhook_ack_ms', elapsed_ms)
+    if elapsed_ms > settings.WEBHOOK_ACK_BUDGET_MS:
+        metrics.increment('webhook_ack_over_budget')
+    
+    return Response(status_code=200)
@@ -0,0 +1,118 @@
+from typing import Dict, Optional, Tuple
+from app.redis.client import redis_client
+from app.redis.envelope import update_queues
+from app.utils.metrics import metrics
+from app.config import settings
+import asyncio
+import math
+import time
+
+class AdmissionController:
+    """Controle de admissão do webhook pela profundidade da fila
+    
+    Acima da marca alta entra em modo de descarte e só sai abaixo da marca
+    baixa (histerese). Em descarte cada bot tem uma cota (token bucket); acima
+    do limite absoluto nada entra. Rejeições voltam como 429/503 e o Telegram
+    reenvia o update depois.
+    """
+    
+    def __init__(self):
+        self.depths: Dict[str, int] = {}
+        self.shedding = False
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        self.shed_by_bot: Dict[str, int] = {}
+        self._sampled_at = 0.0
+        self._refreshing = False
+    
+    @property
+    def depth(self) -> int:
+        return sum(self.depths.values())
+    
+    def observe(self, queue_name: str, length: int) -> None:
+        """Atualizar amostra com o tamanho devolvido pelo enqueue"""
+        self.depths[queue_name] = length
+        self._update_state()
+    
+    async def _refresh(self):
+        """Reler o tamanho das filas (capta a drenagem feita pelos workers)"""
+        try:
+            for queue_name in update_queues():
+                self.depths[queue_name] = await redis_client.get_queue_length(queue_name)
+            self._update_state()
+        except Exception as e:
+            print(f"❌ Erro ao amostrar fila: {str(e)}")
+        finally:
+            self._sampled_at = time.monotonic()
+            self._refreshing = False
+    
+    def _maybe_refresh(self):
+        # Amostragem em segundo plano: nenhuma requisição espera pela contagem
+        if self._refreshing or time.monotonic() - self._sampled_at < settings.ADMISSION_SAMPLE_INTERVAL:
+            return
+        self._refreshing = True
+        asyncio.get_running_loop().create_task(self._refresh())
+    
+    def _update_state(self):
+        depth = self.depth
+        if not self.shedding and depth >= settings.QUEUE_HIGH_WATERMARK:
+            self.shedding = True
+            print(f"🚧 Fila com {depth} itens: descarte por cota ativado")
+        elif self.shedding and depth <= settings.QUEUE_LOW_WATERMARK:
+            self.shedding = False
+            self.buckets.clear()
+            print(f"✅ Fila com {depth} itens: descarte desativado")
+        
+        metrics.gauge('ingest_queue_depth', depth)
+        metrics.gauge('admission_shedding', 1 if self.shedding else 0)
+    
+    def _take_token(self, bot_id: str) -> float:
+        """Consumir um token do bot; retorna 0 ou os segundos até o próximo"""
+        rate = settings.ADMISSION_BOT_RATE
+        burst = settings.ADMISSION_BOT_BURST
+        now = time.monotonic()
+        
+        tokens, updated_at = self.buckets.get(bot_id, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        if tokens >= 1:
+            self.buckets[bot_id] = (tokens - 1, now)
+            return 0.0
+        
+        self.buckets[bot_id] = (tokens, now)
+        return (1 - tokens) / rate if rate > 0 else float(settings.ADMISSION_RETRY_AFTER)
+    
+    def _shed(self, bot_id: str, reason: str):
+        metrics.increment(f'webhook_shed_{reason}')
+        if bot_id in self.shed_by_bot or len(self.shed_by_bot) < settings.BOT_REGISTRY_MISS_MAX:
+            self.shed_by_bot[bot_id] = self.shed_by_bot.get(bot_id, 0) + 1
+    
+    def check(self, bot_id: str) -> Optional[Tuple[int, int]]:
+        """None se o update pode entrar; senão (status, Retry-After em segundos)"""
+        self._maybe_refresh()
+        
+        if not self.shedding:
+            return None
+        
+        if self.depth >= settings.QUEUE_MAX_DEPTH:
+            self._shed(bot_id, 'overload')
+            return 503, settings.ADMISSION_RETRY_AFTER
+        
+        wait = self._take_token(bot_id)
+        if wait:
+            self._shed(bot_id, 'quota')
+            return 429, max(1, math.ceil(wait))
+        return None
+    
+    def stats(self) -> Dict:
+        """Estado atual e os bots com mais descartes"""
+        top = sorted(self.shed_by_bot.items(), key=lambda item: item[1], reverse=True)[:20]
+        return {
+            'queue_depth': self.depth,
+            'by_queue': dict(self.depths),
+            'shedding': self.shedding,
+            'high_watermark': settings.QUEUE_HIGH_WATERMARK,
+            'low_watermark': settings.QUEUE_LOW_WATERMARK,
+            'max_depth': settings.QUEUE_MAX_DEPTH,
+            'shed_by_bot': dict(top)
+        }
+
+admission = AdmissionController()
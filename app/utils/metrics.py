@@ -0,0 +1,60 @@
+from typing import Dict, Optional
+from collections import deque
+import time
+
+class Metrics:
+    """Métricas em memória do processo (contadores, gauges e tempos)"""
+    
+    def __init__(self, max_samples: int = 2048):
+        self.max_samples = max_samples
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self.samples: Dict[str, deque] = {}
+        self.started_at = time.time()
+    
+    def increment(self, name: str, value: int = 1) -> None:
+        """Incrementar contador"""
+        self.counters[name] = self.counters.get(name, 0) + value
+    
+    def gauge(self, name: str, value: float) -> None:
+        """Registrar valor instantâneo"""
+        self.gauges[name] = value
+    
+    def observe(self, name: str, value: float) -> None:
+        """Registrar amostra de tempo (janela das últimas N amostras)"""
+        if name not in self.samples:
+            self.samples[name] = deque(maxlen=self.max_samples)
+        self.samples[name].append(value)
+    
+    def percentile(self, name: str, pct: float) -> Optional[float]:
+        """Percentil das amostras recentes"""
+        values = sorted(self.samples.get(name, ()))
+        if not values:
+            return None
+        index = min(len(values) - 1, int(len(values) * pct / 100))
+        return values[index]
+    
+    def snapshot(self) -> Dict:
+        """Resumo de todas as métricas"""
+        timings = {}
+        for name, values in self.samples.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            timings[name] = {
+                'count': len(ordered),
+                'avg': sum(ordered) / len(ordered),
+                'p50': ordered[int(len(ordered) * 0.50)],
+                'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                'p99': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+                'max': ordered[-1]
+            }
+        
+        return {
+            'uptime_s': time.time() - self.started_at,
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'timings': timings
+        }
+
+metrics = Metrics()
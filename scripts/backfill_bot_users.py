@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Preencher bot_users a partir do histórico de interações e recalcular bots.total_users
+
+Pode rodar com o worker ligado e mais de uma vez: pares já registrados são
+ignorados e o total é recontado a partir de bot_users no mesmo commit.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from app.database.connection import sync_engine
+from app.database.models import Base, Bot, BotUser, UserInteraction
+
+def backfill():
+    """Copiar os pares (bot_id, user_id) distintos e atualizar os totais"""
+    print("🔄 Preenchendo bot_users a partir de user_interactions...")
+    Base.metadata.create_all(bind=sync_engine, tables=[BotUser.__table__])
+    dialect = postgresql if sync_engine.dialect.name == 'postgresql' else sqlite
+    
+    try:
+        with sync_engine.begin() as conn:
+            history = (
+                select(UserInteraction.bot_id, UserInteraction.user_id, func.min(UserInteraction.created_at))
+                .where(UserInteraction.user_id.isnot(None))
+                .group_by(UserInteraction.bot_id, UserInteraction.user_id)
+            )
+            inserted = conn.execute(
+                dialect.insert(BotUser)
+                .from_select(['bot_id', 'user_id', 'first_seen'], history)
+                .on_conflict_do_nothing(index_elements=['bot_id', 'user_id'])
+            ).rowcount
+            
+            users = (
+                select(func.count(BotUser.id))
+                .where(BotUser.bot_id == Bot.bot_id)
+                .scalar_subquery()
+            )
+            bots = conn.execute(Bot.__table__.update().values(total_users=users)).rowcount
+        
+        print(f"✅ {inserted} usuários adicionados, total_users recalculado em {bots} bots")
+    
+    except Exception as e:
+        print(f"❌ Erro no preenchimento: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark da listagem de bots do painel com 1, 100 e 1000 bots por usuário
+
+Compara o caminho antigo (bots completos + COUNT(DISTINCT) de usuários por
+bot), o carregamento dos bots completos sem a query por bot e a query única
+do painel (`BotCRUD.list_dashboard`), inteira e em página keyset. Usa um
+SQLite temporário (o banco do app não é tocado).
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+
+# Banco temporário antes de criar o engine
+_path = os.path.join(tempfile.mkdtemp(), 'bench_bot_listing.db')
+settings.DATABASE_URL = f'sqlite+aiosqlite:///{_path}'
+
+from sqlalchemy import select, func, insert
+from app.database.connection import AsyncSessionLocal, async_engine
+from app.database.models import Base, Bot, BotStatistics, User, UserInteraction
+from app.database.crud import BotCRUD
+
+SIZES = [int(n) for n in os.getenv('BENCH_SIZES', '1,100,1000').split(',')]
+INTERACTIONS_PER_BOT = int(os.getenv('BENCH_INTERACTIONS_PER_BOT', '50'))
+ITERATIONS = int(os.getenv('BENCH_ITERATIONS', '20'))
+PAGE = int(os.getenv('BENCH_PAGE', '50'))
+
+PLANS = [{'name': f'Plano {i}', 'price': 9.9 * (i + 1), 'duration': '30 dias'} for i in range(6)]
+
+async def seed(size: int) -> int:
+    """Usuário com `size` bots configurados, interações e rollup de hoje"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    async with AsyncSessionLocal() as db:
+        user = User(email=f'bench-{size}@teste.com', hashed_password='x')
+        db.add(user)
+        await db.flush()
+        
+        bots, interactions, stats = [], [], []
+        for index in range(size):
+            bot_id = f'{size}-{index}'
+            bots.append({
+                'user_id': user.id,
+                'token': f'{bot_id}:token',
+                'username': f'bot_{bot_id}',
+                'bot_id': bot_id,
+                'message_1': 'Bem-vindo! ' * 40,
+                'message_2': 'Escolha um plano abaixo: ' * 20,
+                'plans': PLANS,
+                'total_users': INTERACTIONS_PER_BOT // 2,
+                'total_messages': INTERACTIONS_PER_BOT
+            })
+            interactions.extend(
+                {'bot_id': bot_id, 'user_id': str(seq % (INTERACTIONS_PER_BOT // 2 or 1)), 'command': '/start'}
+                for seq in range(INTERACTIONS_PER_BOT)
+            )
+            stats.append({'bot_id': bot_id, 'date': today, 'messages_sent': INTERACTIONS_PER_BOT, 'errors': 0})
+        
+        await db.execute(insert(Bot), bots)
+        if interactions:
+            await db.execute(insert(UserInteraction), interactions)
+        await db.execute(insert(BotStatistics), stats)
+        await db.commit()
+        return user.id
+
+async def old_path(db, user_id: int) -> int:
+    """Bots completos e uma contagem de usuários distintos por bot (N+1)"""
+    bots = await BotCRUD.get_user_bots(db, user_id)
+    for bot in bots:
+        await db.execute(
+            select(func.count(func.distinct(UserInteraction.user_id)))
+            .where(UserInteraction.bot_id == bot.bot_id)
+        )
+    return len(bots)
+
+async def full_rows(db, user_id: int) -> int:
+    return len(await BotCRUD.get_user_bots(db, user_id))
+
+async def dashboard(db, user_id: int) -> int:
+    return len(await BotCRUD.list_dashboard(db, user_id))
+
+async def dashboard_page(db, user_id: int) -> int:
+    return len(await BotCRUD.list_dashboard(db, user_id, limit=PAGE))
+
+async def measure(path, user_id: int) -> float:
+    """Média em ms por listagem (sessão nova a cada chamada, como numa requisição)"""
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        async with AsyncSessionLocal() as db:
+            await path(db, user_id)
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+async def main():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    users = {size: await seed(size) for size in SIZES}
+    paths = [
+        ('N+1 (COUNT DISTINCT por bot)', old_path),
+        ('bots completos, sem N+1', full_rows),
+        ('query única do painel', dashboard),
+        (f'página keyset de {PAGE}', dashboard_page)
+    ]
+    
+    print(f"📊 Listagem do painel, {INTERACTIONS_PER_BOT} interações por bot, média de {ITERATIONS} chamadas (ms)\n")
+    print(f"   {'':<32}" + ''.join(f"{f'{size} bots':>12}" for size in SIZES))
+    for name, path in paths:
+        timings = [await measure(path, users[size]) for size in SIZES]
+        print(f"   {name:<32}" + ''.join(f"{timing:>12.2f}" for timing in timings))
+    
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
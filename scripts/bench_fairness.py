@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Benchmark de justiça entre bots: latência dos bots quietos enquanto um bot viraliza
+
+Um bot recebe uma rajada de /start (link viral) e outros bots seguem com
+tráfego normal. Compara a fila FIFO (janela de 1 item) com as sub-filas por
+bot em deficit round robin, e mede os callbacks do próprio bot viral, que
+passam na frente da rajada pela fila de prioridade.
+"""
+
+import sys
+import os
+import asyncio
+import json
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.redis.client import redis_client
+from app.redis.envelope import UpdateEnvelope, classify_update, queue_for
+from app.config import settings
+from worker.main import Worker
+
+FLOOD = int(os.getenv('BENCH_FLOOD', '5000'))
+QUIET_BOTS = int(os.getenv('BENCH_QUIET_BOTS', '20'))
+QUIET_INTERVAL = float(os.getenv('BENCH_QUIET_INTERVAL', '0.1'))
+DURATION = float(os.getenv('BENCH_DURATION', '4'))
+IO_MS = float(os.getenv('BENCH_IO_MS', '10'))
+
+class LatencyProcessor:
+    """Simula a chamada ao Telegram e mede a latência fim a fim (rajada x tráfego normal)"""
+    
+    def __init__(self):
+        self.latencies = {'quiet': [], 'viral': []}
+        self.processed = 0
+    
+    async def process_update(self, db, bot_id, update, defer_bookkeeping=False, progress=None, deliveries=None):
+        await asyncio.sleep(IO_MS / 1000)
+        key = 'quiet' if update.get('quiet') else 'viral'
+        self.latencies[key].append(time.time() - update['sent_at'])
+        self.processed += 1
+        return True
+
+def make_update(chat_id: int, quiet: bool, callback: bool) -> bytes:
+    message = {
+        'message_id': 1,
+        'from': {'id': chat_id, 'first_name': 'Teste'},
+        'chat': {'id': chat_id, 'type': 'private'},
+        'date': 1700000000,
+        'text': '/start'
+    }
+    update = {'update_id': chat_id, 'sent_at': time.time(), 'quiet': quiet}
+    if callback:
+        update['callback_query'] = {'id': '1', 'from': message['from'], 'message': message, 'data': 'view_plans'}
+    else:
+        update['message'] = message
+    return json.dumps(update, separators=(',', ':')).encode()
+
+async def send(bot_id: str, chat_id: int, quiet: bool = False, callback: bool = False):
+    body = make_update(chat_id, quiet, callback)
+    await redis_client.add_to_queue(queue_for(classify_update(body), bot_id), UpdateEnvelope.encode(bot_id, body))
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+async def run(prefetch: int, bot_prefetch: int, viral_callbacks: bool = False) -> dict:
+    settings.WORKER_PREFETCH = prefetch
+    settings.WORKER_BOT_PREFETCH = bot_prefetch
+    
+    worker = Worker()
+    worker.processor = LatencyProcessor()
+    await worker.start()
+    
+    # Rajada do bot viral de uma vez, depois tráfego constante
+    sent = FLOOD
+    for chat_id in range(FLOOD):
+        await send('viral', chat_id)
+    
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        for bot in range(QUIET_BOTS):
+            if viral_callbacks:
+                # Usuários do próprio bot viral clicando em botões
+                await send('viral', FLOOD + bot, quiet=True, callback=True)
+            else:
+                await send(f'quiet-{bot}', 1, quiet=True)
+            sent += 1
+        await asyncio.sleep(QUIET_INTERVAL)
+    
+    while worker.processor.processed < sent and time.perf_counter() - start < DURATION * 20:
+        await asyncio.sleep(0.05)
+    await worker.stop()
+    
+    latencies = worker.processor.latencies
+    return {
+        'quiet_p50': percentile(latencies['quiet'], 50),
+        'quiet_p99': percentile(latencies['quiet'], 99),
+        'viral_p99': percentile(latencies['viral'], 99),
+        'drained_s': time.perf_counter() - start
+    }
+
+async def main():
+    await redis_client.connect()
+    
+    print(
+        f"📊 {FLOOD} /start de um bot viral + {QUIET_BOTS} bots quietos "
+        f"({1 / QUIET_INTERVAL:.0f} updates/s cada), I/O de {IO_MS:.0f}ms, "
+        f"{settings.WORKER_CONCURRENCY} lanes, backend {settings.QUEUE_BACKEND}\n"
+    )
+    print(f"   {'':<34}{'quietos p50':>14}{'quietos p99':>14}{'viral p99':>14}{'drenado':>10}")
+    
+    prefetch, bot_prefetch = settings.WORKER_PREFETCH, settings.WORKER_BOT_PREFETCH
+    results = (
+        ('FIFO (janela de 1)', await run(prefetch=1, bot_prefetch=10 ** 9)),
+        ('sub-filas por bot (DRR)', await run(prefetch=prefetch, bot_prefetch=bot_prefetch)),
+        ('callbacks do bot viral (FIFO)', await run(prefetch=1, bot_prefetch=10 ** 9, viral_callbacks=True))
+    )
+    
+    for label, result in results:
+        print(
+            f"   {label:<34}{result['quiet_p50']:>11.0f} ms{result['quiet_p99']:>11.0f} ms"
+            f"{result['viral_p99']:>11.0f} ms{result['drained_s']:>9.1f}s"
+        )
+    
+    await redis_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
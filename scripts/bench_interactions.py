@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Benchmark de gravação das interações: INSERT + COMMIT por update vs write-behind em lote
+
+Usa um SQLite temporário (o banco do app não é tocado). Vários produtores
+concorrentes simulam as lanes do worker registrando interações.
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+
+# Banco temporário antes de criar o engine
+_path = os.path.join(tempfile.mkdtemp(), 'bench_interactions.db')
+settings.DATABASE_URL = f'sqlite+aiosqlite:///{_path}'
+
+from app.database.connection import AsyncSessionLocal, async_engine
+from app.database.models import Base
+from app.database.crud import InteractionCRUD
+from app.database.buffers import interaction_buffer
+
+ROWS = int(os.getenv('BENCH_ROWS', '2000'))
+PRODUCERS = int(os.getenv('BENCH_PRODUCERS', '32'))
+
+def make_row(seq: int) -> dict:
+    return {
+        'bot_id': f'bot-{seq % 20}',
+        'user_id': str(seq % 3000),
+        'username': 'teste',
+        'first_name': 'Teste',
+        'command': '/start',
+        'callback_data': None,
+        'message_text': '/start'
+    }
+
+async def produce(write):
+    """Distribuir ROWS linhas entre PRODUCERS tasks concorrentes"""
+    pending = iter(range(ROWS))
+    
+    async def producer():
+        for seq in pending:
+            await write(make_row(seq))
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[producer() for _ in range(PRODUCERS)])
+    return time.perf_counter() - start
+
+async def bench_per_row() -> dict:
+    async def write(row):
+        async with AsyncSessionLocal() as db:
+            await InteractionCRUD.create_interaction(db, row)
+    
+    elapsed = await produce(write)
+    return {'rate': ROWS / elapsed, 'commits': ROWS}
+
+async def bench_buffered() -> dict:
+    start = time.perf_counter()
+    await produce(interaction_buffer.add)
+    # Conta até a última linha estar no banco
+    await interaction_buffer.close()
+    elapsed = time.perf_counter() - start
+    return {'rate': interaction_buffer.inserted / elapsed, 'commits': interaction_buffer.commits}
+
+async def count_rows() -> int:
+    from sqlalchemy import select, func
+    from app.database.models import UserInteraction
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count(UserInteraction.id)))).scalar()
+
+async def main():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    print(
+        f"📊 {ROWS} interações de {PRODUCERS} produtores concorrentes, "
+        f"flush a cada {settings.INTERACTION_FLUSH_MS}ms ou {settings.INTERACTION_BATCH_SIZE} linhas\n"
+    )
+    
+    before = await bench_per_row()
+    after = await bench_buffered()
+    total = await count_rows()
+    
+    print(f"   {'':<32}{'linhas/s':>12}{'commits':>10}")
+    print(f"   {'INSERT + COMMIT por update':<32}{before['rate']:>12.0f}{before['commits']:>10}")
+    print(f"   {'write-behind em lote':<32}{after['rate']:>12.0f}{after['commits']:>10}")
+    print(f"\n   {total} linhas no banco (esperado {ROWS * 2})")
+    
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Benchmark de vazão fila + worker (fila antiga com list.pop(0) vs fila atual)
+
+Usa o backend configurado: defina REDIS_URL=redis://localhost:6379/0 para
+medir o Redis Streams em um redis-server local, ou QUEUE_BACKEND=sqlite para
+a fila durável em disco.
+"""
+
+import sys
+import os
+import asyncio
+import json
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.redis.client import redis_client
+from app.redis.envelope import UpdateEnvelope, PRIORITY_BACKGROUND, queue_for
+from app.config import settings
+from worker.main import Worker
+
+BACKLOG = int(os.getenv('BENCH_BACKLOG', '20000'))
+DURATION = float(os.getenv('BENCH_DURATION', '3'))
+PRODUCERS = int(os.getenv('BENCH_PRODUCERS', '200'))
+CHATS = int(os.getenv('BENCH_CHATS', '500'))
+IO_MS = float(os.getenv('BENCH_IO_MS', '10'))
+
+# Todos os updates do benchmark são do bot '1' (mesma partição)
+QUEUE = queue_for(PRIORITY_BACKGROUND, '1')
+
+SAMPLE_BODY = json.dumps({
+    'update_id': 1,
+    'message': {
+        'message_id': 42,
+        'from': {'id': 111, 'first_name': 'Teste', 'username': 'teste'},
+        'chat': {'id': 111, 'type': 'private'},
+        'date': 1700000000,
+        'text': '/start'
+    }
+}).encode()
+
+class CountingProcessor:
+    """Processador que só conta (mede o custo de fila + loop do worker)"""
+    
+    def __init__(self):
+        self.processed = 0
+    
+    async def process_update(self, db, bot_id, update, defer_bookkeeping=False, progress=None, deliveries=None):
+        self.processed += 1
+        return True
+
+class SlowProcessor:
+    """Simula a chamada ao Telegram e registra a ordem de chegada por chat"""
+    
+    def __init__(self):
+        self.processed = 0
+        self.seen = {}
+        self.out_of_order = 0
+    
+    async def process_update(self, db, bot_id, update, defer_bookkeeping=False, progress=None, deliveries=None):
+        chat_id = update['message']['chat']['id']
+        seq = update['update_id']
+        if seq < self.seen.get(chat_id, -1):
+            self.out_of_order += 1
+        self.seen[chat_id] = seq
+        await asyncio.sleep(IO_MS / 1000)
+        self.processed += 1
+        return True
+
+def chat_body(chat_id: int, seq: int) -> bytes:
+    return json.dumps({
+        'update_id': seq,
+        'message': {
+            'message_id': seq,
+            'from': {'id': chat_id, 'first_name': 'Teste'},
+            'chat': {'id': chat_id, 'type': 'private'},
+            'date': 1700000000,
+            'text': f'msg {seq}'
+        }
+    }).encode()
+
+class LegacyQueue:
+    """Fila antiga: lista com pop(0), json.dumps/json.loads e get sem bloqueio"""
+    
+    def __init__(self):
+        self._queue = []
+    
+    async def add_to_queue(self, data: dict):
+        self._queue.append(json.dumps(data))
+    
+    async def get_from_queue(self):
+        if self._queue:
+            return json.loads(self._queue.pop(0))
+        return None
+
+async def bench_legacy() -> float:
+    """Loop antigo: 3 tasks, pop(0) e asyncio.sleep(0.1) por item"""
+    queue = LegacyQueue()
+    processor = CountingProcessor()
+    update = json.loads(SAMPLE_BODY)
+    
+    for _ in range(BACKLOG):
+        await queue.add_to_queue({'bot_id': '1', 'update': update, 'timestamp': time.time()})
+    
+    running = True
+    
+    async def process_queue():
+        while running:
+            data = await queue.get_from_queue()
+            if data:
+                await processor.process_update(None, data['bot_id'], data['update'])
+            await asyncio.sleep(0.1)
+    
+    tasks = [asyncio.create_task(process_queue()) for _ in range(3)]
+    await asyncio.sleep(DURATION)
+    running = False
+    await asyncio.gather(*tasks)
+    return processor.processed / DURATION
+
+async def bench_enqueue() -> dict:
+    """Enfileiramento sequencial, concorrente (group commit) e em lote (pipeline)"""
+    payloads = [UpdateEnvelope.encode('1', SAMPLE_BODY) for _ in range(BACKLOG)]
+    
+    # Sequencial: um commit/round-trip por item (limitado para não demorar no SQLite)
+    sequential = payloads[:min(BACKLOG, 1000)]
+    start = time.perf_counter()
+    for payload in sequential:
+        await redis_client.add_to_queue(QUEUE, payload)
+    single = len(sequential) / (time.perf_counter() - start)
+    
+    # Concorrente: como o webhook sob carga, vários produtores ao mesmo tempo
+    pending = iter(payloads)
+    
+    async def producer():
+        for payload in pending:
+            await redis_client.add_to_queue(QUEUE, payload)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[producer() for _ in range(PRODUCERS)])
+    concurrent = BACKLOG / (time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    for i in range(0, BACKLOG, 500):
+        await redis_client.add_many_to_queue(QUEUE, payloads[i:i + 500])
+    batched = BACKLOG / (time.perf_counter() - start)
+    
+    return {
+        'single': single,
+        'concurrent': concurrent,
+        'batched': batched,
+        'total': len(sequential) + BACKLOG * 2
+    }
+
+async def bench_current(total: int) -> float:
+    """Worker atual sobre o RedisClient (get bloqueante + ack)"""
+    
+    worker = Worker()
+    worker.processor = CountingProcessor()
+    
+    start = time.perf_counter()
+    await worker.start()
+    # Drenar tudo (as lanes seguintes precisam da fila vazia)
+    while worker.processor.processed < total and time.perf_counter() - start < DURATION * 10:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    processed = worker.processor.processed
+    await worker.stop()
+    return processed / elapsed
+
+async def bench_lanes() -> dict:
+    """Muitos chats com I/O simulado: vazão e ordem por chat (lanes atuais)"""
+    total = CHATS * 4
+    payloads = [
+        UpdateEnvelope.encode('1', chat_body(chat_id, seq))
+        for seq in range(4) for chat_id in range(CHATS)
+    ]
+    await redis_client.add_many_to_queue(QUEUE, payloads)
+    
+    worker = Worker()
+    worker.processor = SlowProcessor()
+    
+    start = time.perf_counter()
+    await worker.start()
+    while worker.processor.processed < total and time.perf_counter() - start < DURATION * 10:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    await worker.stop()
+    
+    return {
+        'rate': worker.processor.processed / elapsed,
+        'out_of_order': worker.processor.out_of_order,
+        # Antes: 3 tasks, cada uma bloqueada no I/O de um update por vez
+        'legacy_rate': 3 / (IO_MS / 1000)
+    }
+
+async def bench_latency() -> float:
+    """Latência de entrega com fila vazia (consumidor bloqueado no get)"""
+    latencies = []
+    
+    async def consumer():
+        for _ in range(200):
+            item = await redis_client.get_from_queue('bench_latency', timeout=1)
+            latencies.append(time.perf_counter() - float(item['payload']))
+            await redis_client.ack_from_queue('bench_latency', item['id'])
+    
+    task = asyncio.create_task(consumer())
+    for _ in range(200):
+        await asyncio.sleep(0.001)
+        await redis_client.add_to_queue('bench_latency', str(time.perf_counter()).encode())
+    await task
+    
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1000
+
+async def main():
+    backend = settings.QUEUE_BACKEND
+    await redis_client.connect()
+    
+    print(f"📊 Backlog de {BACKLOG} updates, janela de {DURATION}s, backend {backend}\n")
+    print(f"   fila antiga (pop(0) + sleep 0.1)   {await bench_legacy():>10.0f} updates/s")
+    
+    enqueue = await bench_enqueue()
+    print(f"   enfileirar sequencial              {enqueue['single']:>10.0f} updates/s")
+    print(f"   enfileirar com {PRODUCERS} produtores      {enqueue['concurrent']:>10.0f} updates/s")
+    print(f"   enfileirar em lote                 {enqueue['batched']:>10.0f} updates/s")
+    
+    # Drenar tudo o que foi enfileirado acima
+    print(f"   fila atual (get bloqueante + ack)  {await bench_current(enqueue['total']):>10.0f} updates/s")
+    
+    lanes = await bench_lanes()
+    print(f"\n   {CHATS} chats, I/O de {IO_MS:.0f}ms por update, {settings.WORKER_CONCURRENCY} lanes")
+    print(f"   3 tasks fixas (teto teórico)       {lanes['legacy_rate']:>10.0f} updates/s")
+    print(f"   lanes por chat                     {lanes['rate']:>10.0f} updates/s")
+    print(f"   updates fora de ordem no chat      {lanes['out_of_order']:>10d}")
+    print(f"   latência de entrega p50            {await bench_latency():>10.3f} ms")
+    await redis_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
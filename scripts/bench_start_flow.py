@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Benchmark do /start: pausas fixas de 0.5s na lane vs sequência entregue ao envio por chat
+
+Enche a fila com /start de chats diferentes de vários bots (mídia por
+file_id + 2 mensagens) e mede quantos updates/s o worker confirma e quando
+a última mensagem chega ao Telegram. O Telegram é simulado por um servidor
+HTTP local com latência fixa; o banco é um SQLite temporário.
+"""
+
+import sys
+import os
+import asyncio
+import json
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+
+# Banco temporário, Telegram local e concorrência fixa antes de importar o app
+_path = os.path.join(tempfile.mkdtemp(), 'bench_start_flow.db')
+settings.DATABASE_URL = f'sqlite+aiosqlite:///{_path}'
+settings.TELEGRAM_API_URL = 'http://127.0.0.1:8799'
+settings.WORKER_AUTOSCALE = False
+settings.RATE_LIMIT_PER_BOT = 10 ** 9
+
+from aiohttp import web
+from sqlalchemy import insert
+from app.bot.manager import BotManager
+from app.bot.responses import ResponseBuilder
+from app.bot.sender import chat_sender
+from app.bot.telegram_api import telegram_api
+from app.database.connection import async_engine
+from app.database.models import Base, Bot
+from app.redis.client import redis_client
+from app.redis.envelope import UpdateEnvelope, classify_update, queue_for
+from worker.main import Worker
+from worker.processors import MessageProcessor
+
+UPDATES = int(os.getenv('BENCH_UPDATES', '600'))
+BOTS = int(os.getenv('BENCH_BOTS', '20'))
+TELEGRAM_MS = float(os.getenv('BENCH_TELEGRAM_MS', '30'))
+
+class LegacyProcessor(MessageProcessor):
+    """/start como era: envios na própria lane com 0.5s de pausa entre eles"""
+    
+    async def _handle_start_command(self, db, bot_id, chat_id, progress=None, deliveries=None):
+        config = await BotManager.get_bot_config(db, bot_id)
+        media_sent = await BotManager.send_start_media(db, bot_id, chat_id, config)
+        if media_sent:
+            await asyncio.sleep(0.5)
+        for i, (text, reply_markup) in enumerate(ResponseBuilder.start_messages(config)):
+            if i > 0:
+                await asyncio.sleep(0.5)
+            await telegram_api.send_message(config['token'], chat_id, text, reply_markup)
+
+def counting(processor_class):
+    """Processador que conta os updates concluídos (confirmados na fila logo depois)"""
+    class Counting(processor_class):
+        processed = 0
+        
+        async def process_update(self, *args, **kwargs):
+            ok = await super().process_update(*args, **kwargs)
+            Counting.processed += 1
+            return ok
+    return Counting
+
+class FakeTelegram:
+    """Responde como a API com TELEGRAM_MS de latência e guarda a ordem por chat"""
+    
+    def __init__(self):
+        self.sent = 0
+        self.last_at = 0.0
+        self.by_chat = {}
+    
+    async def handle(self, request):
+        data = await request.json()
+        await asyncio.sleep(TELEGRAM_MS / 1000)
+        self.sent += 1
+        self.last_at = time.perf_counter()
+        method = request.match_info['method']
+        self.by_chat.setdefault(str(data.get('chat_id')), []).append(method)
+        if method == 'sendPhoto':
+            return web.json_response({'ok': True, 'result': {'photo': [{'file_id': 'cached'}]}})
+        return web.json_response({'ok': True, 'result': {'message_id': self.sent}})
+
+async def seed():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Bot), [
+            {
+                'user_id': 1,
+                'token': f'{index}:token',
+                'bot_id': f'bot-{index}',
+                'media_file_id': 'cached',
+                'media_type': 'photo',
+                'message_1': 'Bem-vindo!',
+                'message_2': 'Escolha um plano abaixo:',
+                'plans': [{'name': 'Mensal', 'price': 29.9, 'duration': '30 dias'}]
+            }
+            for index in range(BOTS)
+        ])
+
+async def run(processor_class, telegram: FakeTelegram, offset: int, calls: list) -> dict:
+    worker = Worker()
+    worker.processor = counting(processor_class)()
+    await worker.start()
+    
+    for seq in range(UPDATES):
+        chat_id = offset + seq
+        body = json.dumps({
+            'update_id': chat_id,
+            'message': {
+                'message_id': 1,
+                'from': {'id': chat_id, 'first_name': 'Teste'},
+                'chat': {'id': chat_id, 'type': 'private'},
+                'date': 1700000000,
+                'text': '/start'
+            }
+        }).encode()
+        bot_id = f'bot-{seq % BOTS}'
+        await redis_client.add_to_queue(queue_for(classify_update(body), bot_id), UpdateEnvelope.encode(bot_id, body))
+    
+    start = time.perf_counter()
+    expected = telegram.sent + UPDATES * len(calls)
+    while worker.processor.processed < UPDATES:
+        await asyncio.sleep(0.01)
+    processed_at = time.perf_counter()
+    while telegram.sent < expected:
+        await asyncio.sleep(0.01)
+    await worker.stop()
+    
+    ordered = all(
+        methods == calls
+        for chat, methods in telegram.by_chat.items()
+        if int(chat) >= offset
+    )
+    return {
+        'rate': UPDATES / (processed_at - start),
+        'processed_s': processed_at - start,
+        'delivered_s': telegram.last_at - start,
+        'ordered': ordered
+    }
+
+async def main():
+    telegram = FakeTelegram()
+    app = web.Application()
+    app.router.add_post('/bot{token}/{method}', telegram.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 8799).start()
+    
+    await seed()
+    await redis_client.connect()
+    
+    print(
+        f"📊 {UPDATES} /start de {BOTS} bots (mídia + 2 mensagens), Telegram com {TELEGRAM_MS:.0f}ms, "
+        f"{settings.WORKER_CONCURRENCY} lanes\n"
+    )
+    print(f"   {'':<34}{'updates/s':>12}{'lanes livres':>14}{'entregue':>10}{'chamadas':>10}{'ordem':>8}")
+    for label, processor_class, offset, calls in (
+        ('pausas de 0.5s na lane', LegacyProcessor, 0, ['sendPhoto', 'sendMessage', 'sendMessage']),
+        # Plano do /start: mensagem 1 vai de legenda da foto
+        ('sequência por chat', MessageProcessor, 10 ** 6, ['sendPhoto', 'sendMessage'])
+    ):
+        result = await run(processor_class, telegram, offset, calls)
+        print(
+            f"   {label:<34}{result['rate']:>12.0f}{result['processed_s']:>13.1f}s"
+            f"{result['delivered_s']:>9.1f}s{len(calls):>10}{'ok' if result['ordered'] else 'ERRO':>8}"
+        )
+    
+    await chat_sender.close(5)
+    await telegram_api.close()
+    await redis_client.close()
+    await runner.cleanup()
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
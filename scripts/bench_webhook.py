@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Benchmark da rota de webhook: rejeição de requisições forjadas e latência do ack no modo fila"""
+
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Request, Depends, HTTPException
+from sqlalchemy import select, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.main import app, lifespan
+from app.bot.registry import bot_registry
+from app.database.connection import get_db, async_engine, AsyncSessionLocal
+from app.database.crud import BotCRUD
+from app.database.models import Bot
+from app.config import settings
+from app.utils.metrics import metrics
+
+TOTAL_REQUESTS = int(os.getenv('BENCH_REQUESTS', '2000'))
+CONCURRENCY = int(os.getenv('BENCH_CONCURRENCY', '50'))
+
+# Update típico de /start (~400 bytes)
+SAMPLE_UPDATE = {
+    'update_id': 123456789,
+    'message': {
+        'message_id': 42,
+        'from': {'id': 111, 'is_bot': False, 'first_name': 'Teste', 'username': 'teste', 'language_code': 'pt-br'},
+        'chat': {'id': 111, 'first_name': 'Teste', 'username': 'teste', 'type': 'private'},
+        'date': 1700000000,
+        'text': '/start',
+        'entities': [{'offset': 0, 'length': 6, 'type': 'bot_command'}]
+    }
+}
+
+# Rota antiga: consulta o banco e faz o parse do corpo antes de qualquer validação
+legacy_app = FastAPI()
+
+@legacy_app.post("/webhook/{bot_id}")
+async def legacy_webhook(bot_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    bot = await BotCRUD.get_bot_by_id(db, bot_id)
+    if not bot:
+        raise HTTPException(status_code=404, detail="Bot não encontrado")
+    await request.json()
+    raise HTTPException(status_code=401, detail="Não autorizado")
+
+async def run(target_app, bot_id: str, headers: dict) -> dict:
+    """Disparar requisições forjadas e medir taxa e queries"""
+    queries = {'count': 0}
+
+    def count_query(*args):
+        queries['count'] += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_query)
+    transport = httpx.ASGITransport(app=target_app)
+    statuses = {}
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def one():
+            async with semaphore:
+                response = await client.post(f'/webhook/{bot_id}', json=SAMPLE_UPDATE, headers=headers)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(TOTAL_REQUESTS)])
+        elapsed = time.perf_counter() - start
+
+    event.remove(async_engine.sync_engine, "before_cursor_execute", count_query)
+    return {
+        'rps': TOTAL_REQUESTS / elapsed,
+        'queries': queries['count'],
+        'statuses': statuses
+    }
+
+async def run_ack_latency(bot_id: str, headers: dict, concurrency: int) -> dict:
+    """Medir latência do ack (validar + enfileirar) no modo fila"""
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    metrics.samples.pop('webhook_ack_ms', None)
+    metrics.counters.pop('webhook_ack_over_budget', None)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                await client.post(f'/webhook/{bot_id}', json=SAMPLE_UPDATE, headers=headers)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        await asyncio.gather(*[one() for _ in range(TOTAL_REQUESTS)])
+
+    latencies.sort()
+    return {
+        'client_p50': latencies[len(latencies) // 2],
+        'client_p99': latencies[int(len(latencies) * 0.99)],
+        'server': metrics.snapshot()['timings'].get('webhook_ack_ms', {}),
+        'over_budget': metrics.counters.get('webhook_ack_over_budget', 0)
+    }
+
+def report(name: str, result: dict):
+    print(f"   {name:<28} {result['rps']:>9.0f} req/s   {result['queries']:>6} queries   {result['statuses']}")
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Bot.bot_id).limit(1))
+        bot_id = result.scalar()
+
+    if not bot_id:
+        print("❌ Nenhum bot cadastrado no banco para o benchmark")
+        sys.exit(1)
+
+    forged = {'X-Telegram-Bot-Api-Secret-Token': 'forjado'}
+
+    # Modo fila sem worker embutido: mede só o caminho HTTP → fila
+    settings.WEBHOOK_MODE = 'queue'
+    settings.WORKER_EMBEDDED = False
+    
+    print(f"📊 {TOTAL_REQUESTS} requisições forjadas, concorrência {CONCURRENCY}\n")
+
+    async with lifespan(app):
+        report("rota antiga (DB + parse)", await run(legacy_app, bot_id, forged))
+        report("secret inválido", await run(app, bot_id, forged))
+        report("sem header", await run(app, bot_id, {}))
+        report("bot inexistente", await run(app, '0', forged))
+
+        valid = {'X-Telegram-Bot-Api-Secret-Token': bot_registry.get(bot_id)['webhook_secret']}
+        print(f"\n⏱️ Ack no modo fila (orçamento {settings.WEBHOOK_ACK_BUDGET_MS}ms)")
+
+        for concurrency in (1, CONCURRENCY):
+            result = await run_ack_latency(bot_id, valid, concurrency)
+            server = result['server']
+
+            print(f"   concorrência {concurrency}")
+            print(f"      cliente  p50 {result['client_p50']:.2f}ms   p99 {result['client_p99']:.2f}ms")
+            if server:
+                print(f"      servidor p50 {server['p50']:.2f}ms   p99 {server['p99']:.2f}ms   max {server['max']:.2f}ms")
+            print(f"      acima do orçamento: {result['over_budget']}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
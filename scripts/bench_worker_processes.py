@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Benchmark de vazão do worker por número de processos (supervisor com partições)
+
+Enche a fila com updates de vários bots e mede updates/s até esvaziar com 1,
+2, 4... processos. O processamento simula o custo de CPU do worker (parse,
+montagem do teclado e overhead do ORM) sem chamar o Telegram. Usa SQLite por
+padrão; defina REDIS_URL=redis://localhost:6379/0 para medir o Redis Streams.
+"""
+
+import sys
+import os
+import asyncio
+import json
+import multiprocessing
+import signal
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configuração antes de importar o app: fila compartilhada e partições suficientes
+os.environ.setdefault('QUEUE_BACKEND', 'redis' if os.getenv('REDIS_URL') else 'sqlite')
+os.environ.setdefault('QUEUE_SQLITE_PATH', os.path.join(tempfile.mkdtemp(), 'bench_queue.db'))
+os.environ.setdefault('QUEUE_PARTITIONS', '16')
+
+from app.redis.client import redis_client
+from app.redis.envelope import UpdateEnvelope, PRIORITY_COMMAND, queue_for
+from app.bot.responses import ResponseBuilder
+from app.config import settings
+from worker.supervisor import Supervisor
+
+BACKLOG = int(os.getenv('BENCH_BACKLOG', '20000'))
+BOTS = int(os.getenv('BENCH_BOTS', '200'))
+CPU_MS = float(os.getenv('BENCH_CPU_MS', '1'))
+PROCESSES = [int(n) for n in os.getenv('BENCH_PROCESSES', '1,2,4,8').split(',')]
+
+CONFIG = {
+    'message_1': 'Bem-vindo!',
+    'message_2': 'Escolha um plano abaixo:',
+    'plans': [{'name': f'Plano {i}', 'price': 9.9 * (i + 1), 'duration': '30 dias'} for i in range(6)]
+}
+
+class CpuProcessor:
+    """Custo de CPU de um /start: parse já feito pelo worker, teclado, JSON de saída e ORM simulado"""
+    
+    def __init__(self, counter):
+        self.counter = counter
+    
+    async def process_update(self, db, bot_id, update, defer_bookkeeping=False, progress=None, deliveries=None):
+        for text, reply_markup in ResponseBuilder.start_messages(CONFIG):
+            json.dumps({'chat_id': update['message']['chat']['id'], 'text': text, 'reply_markup': reply_markup})
+        
+        deadline = time.perf_counter() + CPU_MS / 1000
+        while time.perf_counter() < deadline:
+            pass
+        
+        with self.counter.get_lock():
+            self.counter.value += 1
+        return True
+
+def bench_worker(index, partitions, counter, ready, go):
+    """Filho do supervisor: Worker com processador de CPU, liberado junto com os outros"""
+    from worker.main import Worker
+    
+    async def run():
+        await redis_client.connect()
+        worker = Worker(partitions)
+        worker.processor = CpuProcessor(counter)
+        
+        # SIGTERM do supervisor: mesma parada gradual do Worker.run
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, worker.request_stop)
+        
+        with ready.get_lock():
+            ready.value += 1
+        await loop.run_in_executor(None, go.wait)
+        
+        await worker.start()
+        await asyncio.gather(*worker.tasks)
+        await worker.stop()
+        await redis_client.close()
+    
+    asyncio.run(run())
+
+def fill():
+    """Encher a fila em um processo à parte (o supervisor não abre o backend)"""
+    async def run():
+        await redis_client.connect()
+        payloads = {}
+        for seq in range(BACKLOG):
+            bot_id = f'bot-{seq % BOTS}'
+            body = json.dumps({
+                'update_id': seq,
+                'message': {
+                    'message_id': seq,
+                    'from': {'id': seq % 5000, 'first_name': 'Teste'},
+                    'chat': {'id': seq % 5000, 'type': 'private'},
+                    'date': 1700000000,
+                    'text': '/start'
+                }
+            }).encode()
+            payloads.setdefault(queue_for(PRIORITY_COMMAND, bot_id), []).append(UpdateEnvelope.encode(bot_id, body))
+        for queue_name, items in payloads.items():
+            await redis_client.add_many_to_queue(queue_name, items)
+        await redis_client.close()
+    asyncio.run(run())
+
+def bench(processes: int) -> float:
+    """Updates/s para esvaziar o backlog com `processes` processos"""
+    context = multiprocessing.get_context('fork')
+    filler = context.Process(target=fill)
+    filler.start()
+    filler.join()
+    
+    counter = context.Value('i', 0)
+    ready = context.Value('i', 0)
+    go = context.Event()
+    
+    supervisor = Supervisor(processes, target=bench_worker, args=(counter, ready, go))
+    supervisor.start()
+    while ready.value < len(supervisor.assignments):
+        time.sleep(0.01)
+    
+    start = time.perf_counter()
+    go.set()
+    while counter.value < BACKLOG and time.perf_counter() - start < 300:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    
+    supervisor.stop()
+    return counter.value / elapsed
+
+def main():
+    print(
+        f"📊 {BACKLOG} updates de {BOTS} bots, {CPU_MS:g}ms de CPU por update, "
+        f"{settings.QUEUE_PARTITIONS} partições, backend {settings.QUEUE_BACKEND}, {os.cpu_count()} núcleos\n"
+    )
+    
+    baseline = None
+    for processes in PROCESSES:
+        rate = bench(processes)
+        baseline = baseline or rate
+        print(f"   {processes:>2} processo(s): {rate:>8.0f} updates/s  ({rate / baseline:.1f}x)")
+
+if __name__ == "__main__":
+    main()
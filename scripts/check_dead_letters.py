@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Verificação do replay da fila de mortos com mais de uma página
+
+O replay lê páginas de até 500 itens e remove cada página antes de ler a
+próxima a partir do último id. Enche a fila de mortos do backend em memória
+com 1200 updates e confere que `replay(limit=1000)` devolve 1000 e deixa
+200. Sai com código 1 se sobrar item ou faltar update na fila de origem.
+"""
+
+import sys
+import os
+import asyncio
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+
+settings.QUEUE_BACKEND = 'memory'
+
+from app.redis.client import redis_client
+from app.redis.dead_letters import DeadLetterQueue, DEAD_LETTER_QUEUE
+from app.redis.envelope import UpdateEnvelope, PRIORITY_BACKGROUND, queue_for
+
+UPDATES = 1200
+
+async def main():
+    await redis_client.connect()
+    
+    bot_id = 'bot-1'
+    source = queue_for(PRIORITY_BACKGROUND, bot_id)
+    for update_id in range(UPDATES):
+        body = json.dumps({'update_id': update_id}).encode()
+        await DeadLetterQueue.add(UpdateEnvelope.encode(bot_id, body), 5, 'erro', source)
+    
+    ok = True
+    for limit, expected in ((1000, 1000), (1000, UPDATES - 1000)):
+        replayed = await DeadLetterQueue.replay(limit=limit)
+        left = await redis_client.get_queue_length(DEAD_LETTER_QUEUE)
+        passed = replayed == expected
+        print(f"   {'✅' if passed else '❌'} replay(limit={limit}): {replayed} devolvidos, {left} na fila de mortos")
+        ok = ok and passed
+    
+    requeued = await redis_client.get_queue_length(source)
+    print(f"   {'✅' if requeued == UPDATES else '❌'} {requeued} de {UPDATES} na fila de origem")
+    ok = ok and requeued == UPDATES
+    
+    await redis_client.close()
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Verificação do 429 em chamadas sem chat (answerCallbackQuery)
+
+Sem chat_id a chamada não passa pelos buckets do `OutboundScheduler`; em um
+429 ela ainda precisa esperar o `retry_after` antes da nova tentativa. O
+Telegram é simulado por um servidor HTTP local que responde 429 às primeiras
+chamadas. Sai com código 1 se alguma tentativa vier antes da hora.
+"""
+
+import sys
+import os
+import asyncio
+import time
+from typing import Tuple
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+
+settings.TELEGRAM_API_URL = 'http://127.0.0.1:8798'
+settings.TELEGRAM_MAX_RETRIES = 2
+
+from aiohttp import web
+from app.bot.telegram_api import telegram_api, TelegramRetryAfter
+
+RETRY_AFTER = 1
+
+class FloodTelegram:
+    """429 nas primeiras `floods` chamadas, depois ok; guarda o horário de cada chamada"""
+    
+    def __init__(self, floods: int):
+        self.floods = floods
+        self.calls = []
+    
+    async def handle(self, request):
+        self.calls.append(time.monotonic())
+        if len(self.calls) <= self.floods:
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': 'Too Many Requests',
+                'parameters': {'retry_after': RETRY_AFTER}
+            })
+        return web.json_response({'ok': True, 'result': True})
+
+async def answer(telegram: FloodTelegram, token: str) -> Tuple[bool, bool]:
+    """answerCallbackQuery com `telegram.floods` 429 antes: (respeitou o retry_after, respondida)"""
+    try:
+        await telegram_api.make_request(token, 'answerCallbackQuery', {'callback_query_id': '1', 'text': 'ok'})
+        answered = True
+    except TelegramRetryAfter:
+        answered = False
+    
+    gaps = [later - earlier for earlier, later in zip(telegram.calls, telegram.calls[1:])]
+    print(f"   {len(telegram.calls)} chamadas, intervalos: {', '.join(f'{gap:.2f}s' for gap in gaps) or '-'}")
+    return all(gap >= RETRY_AFTER * 0.95 for gap in gaps), answered
+
+async def main():
+    ok = True
+    for label, floods, expect_answered in (
+        ('um 429 e depois ok', 1, True),
+        ('429 acima de TELEGRAM_MAX_RETRIES', settings.TELEGRAM_MAX_RETRIES + 1, False)
+    ):
+        telegram = FloodTelegram(floods)
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', telegram.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 8798).start()
+        
+        print(f"🔍 {label}")
+        # Um token por caso: o 429 de um não segura o outro
+        waited, answered = await answer(telegram, f"{floods}:token")
+        passed = waited and answered == expect_answered
+        print(f"   {'✅' if passed else '❌'} {'esperou o retry_after' if waited else 'tentou antes do retry_after'}")
+        ok = ok and passed
+        await runner.cleanup()
+    
+    await telegram_api.close()
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
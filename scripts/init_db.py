@@ -5,7 +5,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database.connection import sync_engine
+from app.database.connection import sync_engine, upgrade_schema
 from app.database.models import Base
 
 def init_database():
@@ -14,6 +14,7 @@ def init_database():
     
     try:
         Base.metadata.create_all(bind=sync_engine)
+        upgrade_schema()
         print("✅ Tabelas criadas com sucesso!")
         
         # Listar tabelas criadas
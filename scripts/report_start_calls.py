@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Relatório de chamadas à Bot API por /start: envio antigo vs plano do /start
+
+O envio antigo fazia uma chamada para a mídia e uma por mensagem; o plano
+(`ResponseBuilder.start_plan`) junta a primeira mensagem à mídia como legenda
+quando cabe. Mostra a redução por bot e o total ponderado pelos /start
+registrados em user_interactions. Só lê o banco.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from app.database.connection import sync_engine
+from app.database.models import Bot, UserInteraction
+from app.bot.manager import BotManager
+from app.bot.responses import ResponseBuilder
+
+def report():
+    """Contar chamadas por /start de cada bot e o total economizado"""
+    try:
+        with Session(sync_engine) as db:
+            bots = db.execute(select(Bot).order_by(Bot.id)).scalars().all()
+            starts = dict(db.execute(
+                select(UserInteraction.bot_id, func.count())
+                .where(UserInteraction.command == '/start')
+                .group_by(UserInteraction.bot_id)
+            ).all())
+    
+    except Exception as e:
+        print(f"❌ Erro ao ler o banco: {str(e)}")
+        sys.exit(1)
+    
+    if not bots:
+        print("⚠️ Nenhum bot cadastrado")
+        return
+    
+    print(f"📊 Chamadas à Bot API por /start ({len(bots)} bots)\n")
+    print(f"   {'bot':<16}{'antes':>8}{'plano':>8}{'/start':>10}{'economia':>10}")
+    
+    before_total, after_total, saved_total, start_total = 0, 0, 0, 0
+    for bot in bots:
+        config = BotManager.config_of(bot)
+        has_media = bool(config.get('media_url') or config.get('media_file_id'))
+        before = int(has_media) + len(ResponseBuilder.start_messages(config))
+        after = len(config['start_plan'])
+        count = starts.get(bot.bot_id, 0)
+        
+        before_total += before
+        after_total += after
+        saved_total += (before - after) * count
+        start_total += count
+        print(f"   {bot.bot_id:<16}{before:>8}{after:>8}{count:>10}{(before - after) * count:>10}")
+    
+    print(f"\n   Média por bot: {before_total / len(bots):.2f} → {after_total / len(bots):.2f} chamadas por /start")
+    if start_total:
+        print(
+            f"   Histórico: {saved_total} chamadas a menos em {start_total} /start "
+            f"({saved_total / start_total:.2f} por /start)"
+        )
+
+if __name__ == "__main__":
+    report()
@@ -0,0 +1,104 @@
+from typing import Awaitable, Callable, Dict, Optional
+from worker.dispatcher import Dispatcher
+from app.utils.metrics import metrics
+import asyncio
+import time
+
+class Autoscaler:
+    """Ajusta a concorrência das lanes pelo atraso da fila (enfileirado → início do processamento)
+    
+    Sobe rápido (dobra) quando o atraso passa do alvo com as lanes ativas
+    ocupadas; desce devagar (10% por ciclo) só depois de `scale_down_delay`
+    segundos sem pressão. Exporta `worker_scale_pressure` = concorrência
+    desejada / máxima: um HPA com alvo médio 1.0 nessa métrica calcula as
+    réplicas de processo pelo mesmo sinal.
+    """
+    
+    def __init__(self, dispatcher: Dispatcher, depth: Callable[[], Awaitable[int]], minimum: int, maximum: int,
+                 target_lag_ms: float, interval: float = 1, scale_down_delay: float = 30):
+        self.dispatcher = dispatcher
+        self.depth = depth
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.target_lag_ms = target_lag_ms
+        self.interval = interval
+        self.scale_down_delay = scale_down_delay
+        self.desired = dispatcher.concurrency
+        self._lag_sum = 0.0
+        self._lag_count = 0
+        self._calm_since: Optional[float] = None
+        self._task = None
+    
+    def observe_lag(self, lag_ms: float):
+        """Atraso de um update ao começar a ser processado"""
+        self._lag_sum += lag_ms
+        self._lag_count += 1
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            # Ocupação amostrada ao longo do ciclo, não só no instante da decisão
+            saturation = 0.0
+            for _ in range(10):
+                await asyncio.sleep(self.interval / 10)
+                saturation += self.dispatcher.permits.active / max(self.dispatcher.concurrency, 1) / 10
+            
+            try:
+                depth = await self.depth()
+            except Exception as e:
+                print(f"❌ Erro ao medir a fila: {str(e)}")
+                continue
+            self.tick(depth, saturation)
+    
+    def tick(self, depth: int, saturation: float) -> Dict:
+        """Decidir a concorrência do próximo ciclo"""
+        lag = self._lag_sum / self._lag_count if self._lag_count else None
+        self._lag_sum, self._lag_count = 0.0, 0
+        current = self.dispatcher.concurrency
+        now = time.monotonic()
+        
+        # Sem updates concluídos no ciclo mas com fila: lanes presas em chamadas lentas
+        behind = lag > self.target_lag_ms if lag is not None else depth > 0
+        if behind and saturation >= 0.8:
+            self.desired = current * 2
+            self._calm_since = None
+        elif (lag is None or lag < self.target_lag_ms / 2) and saturation < 0.5:
+            if self._calm_since is None:
+                self._calm_since = now
+            self.desired = current
+            if now - self._calm_since >= self.scale_down_delay:
+                self.desired = current - max(1, current // 10)
+        else:
+            self.desired = current
+            self._calm_since = None
+        
+        concurrency = max(self.minimum, min(self.desired, self.maximum))
+        if concurrency != current:
+            self.dispatcher.set_concurrency(concurrency)
+            lag_text = f"{lag:.0f}ms" if lag is not None else "sem amostras"
+            print(f"📈 Concorrência {current} → {concurrency} (atraso {lag_text}, fila {depth}, ocupação {saturation * 100:.0f}%)")
+        
+        snapshot = {
+            'lag_ms': lag,
+            'depth': depth,
+            'saturation': saturation,
+            'concurrency': concurrency,
+            'desired': self.desired,
+            'pressure': max(self.desired, self.minimum) / self.maximum
+        }
+        if lag is not None or not depth:
+            # Fila vazia e nada processado: sem atraso (não manter o último valor)
+            metrics.gauge('worker_queue_lag_ms', lag or 0.0)
+        metrics.gauge('worker_queue_depth', depth)
+        metrics.gauge('worker_concurrency', concurrency)
+        metrics.gauge('worker_concurrency_desired', self.desired)
+        metrics.gauge('worker_scale_pressure', snapshot['pressure'])
+        return snapshot
@@ -0,0 +1,192 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from collections import deque
+from app.utils.metrics import metrics
+import asyncio
+import time
+import zlib
+
+def chat_id_of(update: Dict) -> Optional[str]:
+    """Chat do update (mensagem ou callback), sem montar o info completo"""
+    if 'message' in update:
+        return str(update['message'].get('chat', {}).get('id'))
+    if 'callback_query' in update:
+        message = update['callback_query'].get('message') or {}
+        chat = message.get('chat') or update['callback_query'].get('from', {})
+        return str(chat.get('id'))
+    return None
+
+class Limiter:
+    """Semáforo cujo limite pode mudar com o worker rodando"""
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: deque = deque()
+    
+    async def acquire(self):
+        while self.active >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Passar a vez se este waiter já tinha sido acordado
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+        self.active += 1
+    
+    def release(self):
+        self.active -= 1
+        self._wake()
+    
+    def set_limit(self, limit: int):
+        self.limit = limit
+        self._wake()
+    
+    def _wake(self):
+        free = self.limit - self.active
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+class Dispatcher:
+    """Distribui trabalho em N lanes por (bot_id, chat_id): ordem dentro do chat, chats em paralelo
+    
+    O número de lanes é fixo (o chat fica sempre na mesma lane); quantas rodam
+    ao mesmo tempo é `concurrency`, ajustável em execução pelo autoscaler.
+    """
+    
+    def __init__(self, handler: Callable[[Dict], Awaitable[None]], lanes: int, lane_depth: int,
+                 max_inflight: int = None, concurrency: int = None):
+        self.handler = handler
+        self.queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=lane_depth) for _ in range(lanes)]
+        self.concurrency = min(concurrency or lanes, lanes)
+        self.permits = Limiter(self.concurrency)
+        # Poucos itens além das lanes ativas: a escolha do próximo item fica com o escalonador
+        self.max_inflight = max_inflight
+        self.slots = Limiter(max_inflight or self.concurrency * 2)
+        self.busy = [False] * lanes
+        self.current: List[Optional[Dict]] = [None] * lanes
+        self.busy_time = [0.0] * lanes
+        self.tasks: List[asyncio.Task] = []
+        self._sampled_at = time.monotonic()
+    
+    def lane_for(self, bot_id: str, chat_id: Optional[str]) -> int:
+        """Lane fixa do chat (hash estável entre execuções)"""
+        key = f"{bot_id}:{chat_id}".encode()
+        return zlib.crc32(key) % len(self.queues)
+    
+    async def dispatch(self, work: Dict) -> None:
+        """Colocar trabalho na lane do chat (aguarda se a lane estiver cheia)"""
+        lane = self.lane_for(work['bot_id'], work.get('chat_id'))
+        await self.slots.acquire()
+        await self.queues[lane].put(work)
+    
+    def set_concurrency(self, concurrency: int):
+        """Mudar quantas lanes executam ao mesmo tempo (o mapeamento chat → lane não muda)"""
+        self.concurrency = max(1, min(concurrency, len(self.queues)))
+        self.permits.set_limit(self.concurrency)
+        if not self.max_inflight:
+            self.slots.set_limit(self.concurrency * 2)
+        metrics.gauge('worker_concurrency', self.concurrency)
+    
+    def start(self):
+        """Iniciar uma task por lane"""
+        for lane in range(len(self.queues)):
+            self.tasks.append(asyncio.create_task(self._run_lane(lane)))
+    
+    async def _run_lane(self, lane: int):
+        queue = self.queues[lane]
+        while True:
+            work = await queue.get()
+            self.current[lane] = work
+            try:
+                await self.permits.acquire()
+            except asyncio.CancelledError:
+                self.current[lane] = None
+                self.slots.release()
+                queue.task_done()
+                raise
+            
+            self.busy[lane] = True
+            started = time.monotonic()
+            try:
+                await self.handler(work)
+            except Exception as e:
+                print(f"❌ Erro na lane {lane}: {str(e)}")
+            finally:
+                self.busy_time[lane] += time.monotonic() - started
+                self.busy[lane] = False
+                self.current[lane] = None
+                self.permits.release()
+                self.slots.release()
+                queue.task_done()
+    
+    async def drain(self):
+        """Aguardar todas as lanes esvaziarem"""
+        for queue in self.queues:
+            await queue.join()
+    
+    async def stop(self):
+        """Esvaziar as lanes e encerrar as tasks"""
+        await self.drain()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+    
+    async def shutdown(self, timeout: float) -> Tuple[List[Dict], List[Dict]]:
+        """Encerrar com prazo: (itens que nem começaram, itens interrompidos no prazo)
+        
+        O que ainda está na fila das lanes sai na hora; o que está em execução
+        tem até `timeout` segundos para terminar e depois é cancelado.
+        """
+        unstarted = []
+        for queue in self.queues:
+            while not queue.empty():
+                unstarted.append(queue.get_nowait())
+                queue.task_done()
+                self.slots.release()
+        
+        try:
+            await asyncio.wait_for(self.drain(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        
+        # Lane ainda esperando vez para executar conta como não iniciada
+        interrupted = []
+        for lane, work in enumerate(self.current):
+            if work is not None:
+                (interrupted if self.busy[lane] else unstarted).append(work)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        return unstarted, interrupted
+    
+    def occupancy(self) -> Dict:
+        """Ocupação das lanes: ocupadas agora, fila por lane e utilização desde a última amostra"""
+        now = time.monotonic()
+        elapsed = max(now - self._sampled_at, 1e-9)
+        utilization = min(1.0, sum(self.busy_time) / (elapsed * self.concurrency))
+        self.busy_time = [0.0] * len(self.queues)
+        self._sampled_at = now
+        
+        snapshot = {
+            'lanes': len(self.queues),
+            'concurrency': self.concurrency,
+            'busy': sum(self.busy),
+            'queued': [queue.qsize() for queue in self.queues],
+            'utilization': utilization
+        }
+        
+        metrics.gauge('worker_lanes', snapshot['lanes'])
+        metrics.gauge('worker_concurrency', snapshot['concurrency'])
+        metrics.gauge('worker_lanes_busy', snapshot['busy'])
+        metrics.gauge('worker_lanes_queued', sum(snapshot['queued']))
+        metrics.gauge('worker_lanes_max_queued', max(snapshot['queued'], default=0))
+        metrics.gauge('worker_lanes_utilization', snapshot['utilization'])
+        return snapshot
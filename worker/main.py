@@ -7,48 +7,489 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from worker.processors import MessageProcessor
+from worker.dispatcher import Dispatcher, chat_id_of
+from worker.scheduler import FairScheduler, PriorityScheduler, parse_weights
+from worker.retry import RetryScheduler
+from worker.autoscale import Autoscaler
 from app.redis.client import redis_client
+from app.redis.envelope import (
+    UpdateEnvelope, UPDATE_QUEUES, PRIORITY_BACKGROUND, partition_of, partition_queue, queue_for, update_queues
+)
+from app.redis.dead_letters import DeadLetterQueue
 from app.database.connection import AsyncSessionLocal
+from app.database.buffers import interaction_buffer, stats_aggregator
+from app.database.rollup import statistics_rollup
+from app.bot.sender import chat_sender, ChatSendFailed
+from app.utils.metrics import metrics
+from app.config import settings
+from functools import partial
+from typing import List, Optional
 import time
 
 class Worker:
-    def __init__(self):
+    def __init__(self, partitions: Optional[List[int]] = None):
         self.running = True
+        # Partições de bot_id deste processo (padrão: todas, para o worker único)
+        self.partitions = sorted(partitions) if partitions is not None else list(range(max(settings.QUEUE_PARTITIONS, 1)))
+        self.owned = set(self.partitions)
         self.processor = MessageProcessor()
-        
+        self.tasks = []
+        self.reclaim_task = None
+        self.lease_task = None
+        self.metrics_task = None
+        self.metrics_runner = None
+        self.schedule_task = None
+        self.dispatcher = None
+        self.scheduler = None
+        self.retries = None
+        self.autoscaler = None
+        self.loop = None
+        # Item do escalonador esperando vaga nas lanes
+        self.dispatching = None
+        # Itens respondidos esperando o chat_sender entregar para o ack
+        self.deliveries = set()
+    
     def signal_handler(self, sig, frame):
         """Handler para shutdown gracioso"""
         print("\n🔄 Encerrando worker...")
         self.running = False
+        # Os Events do scheduler só podem ser mexidos de dentro do loop
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.request_stop)
+    
+    def request_stop(self):
+        """Parar a leitura: leitores parados na janela cheia acordam e `run()` chega ao `stop()`"""
+        self.running = False
+        if self.scheduler:
+            self.scheduler.stop_intake()
+    
+    def owns(self, bot_id: str) -> bool:
+        """Bot pertence a uma partição deste processo"""
+        return settings.QUEUE_PARTITIONS <= 1 or partition_of(bot_id) in self.owned
     
-    async def process_queue(self):
-        """Processar fila de updates"""
-        print("🚀 Worker iniciado - Processando fila...")
+    async def process_queue(self, priority: int, queue_name: str):
+        """Ler a fila de uma classe para as sub-filas por bot (um leitor por fila preserva a ordem por chat)"""
+        scheduler = self.scheduler.classes[priority]
+        print(f"🚀 Worker iniciado - Processando fila {queue_name}...")
         
         while self.running:
             try:
                 # Pegar item da fila
-                update_data = await redis_client.get_from_queue('telegram_updates', timeout=1)
+                item = await redis_client.get_from_queue(queue_name, timeout=1)
+                if not item:
+                    continue
                 
-                if update_data:
-                    print(f"📦 Processando update do bot {update_data['bot_id']}")
-                    
-                    # Processar com nova sessão do banco
-                    async with AsyncSessionLocal() as db:
-                        await self.processor.process_update(
-                            db,
-                            update_data['bot_id'],
-                            update_data['update']
-                        )
-                
-                await asyncio.sleep(0.1)  # Pequena pausa
+                work = self.prepare_item(item, queue_name, priority)
+                if work is None:
+                    await redis_client.ack_from_queue(queue_name, item['id'])
+                    continue
                 
+                # Janela cheia segura a leitura (backpressure em vez de buffer sem limite)
+                await scheduler.put(work)
+            
             except Exception as e:
                 print(f"❌ Erro no worker: {str(e)}")
                 await asyncio.sleep(1)
     
+    async def schedule_loop(self):
+        """Entregar às lanes por prioridade da classe e, dentro dela, de forma justa entre bots"""
+        # No desligamento para de entregar: o que sobrou na janela volta para a fila
+        while self.running:
+            try:
+                work = await self.scheduler.get(timeout=1)
+                if work:
+                    # Lanes ocupadas seguram a escolha: o próximo bot é decidido o mais tarde possível
+                    self.dispatching = work
+                    await self.dispatcher.dispatch(work)
+                    self.dispatching = None
+            except Exception as e:
+                print(f"❌ Erro no escalonador: {str(e)}")
+                await asyncio.sleep(1)
+    
+    def prepare_item(self, item: dict, queue_name: str, priority: int = PRIORITY_BACKGROUND):
+        """Decodificar item da fila; None se o payload estiver corrompido"""
+        try:
+            # Único parse do update em todo o caminho
+            envelope = UpdateEnvelope.decode(item['payload'])
+            update = UpdateEnvelope.parse_update(envelope['body'])
+        except Exception as e:
+            # Payload corrompido nunca vai dar certo: descartar
+            print(f"❌ Item inválido na fila: {str(e)}")
+            return None
+        
+        return {
+            'id': item['id'],
+            'queue': queue_name,
+            'payload': item['payload'],
+            'priority': priority,
+            'deferred': envelope.get('deferred', False),
+            'attempts': envelope.get('attempts', 0),
+            'bot_id': envelope['bot_id'],
+            'chat_id': chat_id_of(update),
+            'received_at': envelope.get('received_at'),
+            'progress': envelope.get('progress') or {},
+            'update': update
+        }
+    
+    async def handle_work(self, work: dict):
+        """Processar um update dentro da sua lane e confirmar na fila"""
+        print(f"📦 Processando update do bot {work['bot_id']}")
+        if work.get('received_at'):
+            lag_ms = (time.time() - work['received_at']) * 1000
+            metrics.observe('worker_lag_ms', lag_ms)
+            # Retentativas carregam o horário do primeiro envio: ficam fora do sinal de escala
+            if self.autoscaler and not work['attempts']:
+                self.autoscaler.observe_lag(lag_ms)
+        
+        # Processar com nova sessão do banco
+        started = time.perf_counter()
+        deliveries = []
+        try:
+            async with AsyncSessionLocal() as db:
+                if work['deferred']:
+                    ok = await self.processor.process_bookkeeping(db, work['bot_id'], work['update'])
+                else:
+                    # Callbacks e comandos respondem primeiro; o registro vai para a fila baixa
+                    ok = await self.processor.process_update(
+                        db,
+                        work['bot_id'],
+                        work['update'],
+                        defer_bookkeeping=work['priority'] < PRIORITY_BACKGROUND,
+                        progress=work['progress'],
+                        deliveries=deliveries
+                    )
+        except Exception as e:
+            stats_aggregator.observe(work['bot_id'], 0, False)
+            await self.handle_failure(work, str(e))
+            return
+        
+        # Tempo de resposta do dia só dos updates respondidos (não do registro adiado)
+        if not work['deferred']:
+            stats_aggregator.observe(work['bot_id'], (time.perf_counter() - started) * 1000, ok)
+        
+        # Confirmar só depois de processado; sem ack o item volta via reclaim
+        if ok and deliveries:
+            # A lane fica livre; o ack espera a sequência sair no chat_sender
+            task = asyncio.create_task(self.confirm_delivery(work, deliveries))
+            self.deliveries.add(task)
+            task.add_done_callback(self.deliveries.discard)
+        elif ok:
+            await redis_client.ack_from_queue(work['queue'], work['id'])
+        else:
+            await self.handle_failure(work, 'processamento recusado')
+    
+    async def confirm_delivery(self, work: dict, deliveries: list):
+        """Confirmar o item depois dos envios no chat_sender ou devolvê-lo com as etapas enviadas
+        
+        Uma falha no envio (inclusive 429 acima do teto do cliente) segue o
+        caminho das outras: retentativa com backoff e, no limite, a fila de
+        mortos. `work['progress']` já tem as etapas que saíram. No
+        desligamento o item volta para a fila sem contar tentativa.
+        """
+        try:
+            try:
+                for delivery in deliveries:
+                    await delivery
+            except ChatSendFailed as e:
+                error = e.error
+            except Exception as e:
+                error = str(e)
+            else:
+                await redis_client.ack_from_queue(work['queue'], work['id'])
+                return
+            
+            metrics.increment('worker_delivery_failed')
+            if self.running:
+                await self.handle_failure(work, error)
+            else:
+                await self.requeue(work, work['attempts'], '')
+        except Exception as e:
+            # Sem ack o item volta pelo reclaim / visibility timeout
+            print(f"❌ Erro ao confirmar entrega do bot {work['bot_id']}: {str(e)}")
+    
+    async def handle_failure(self, work: dict, error: str):
+        """Agendar retentativa com backoff ou mandar para a fila de mortos"""
+        attempts = work['attempts'] + 1
+        
+        if attempts >= settings.RETRY_MAX_ATTEMPTS:
+            await DeadLetterQueue.add(work['payload'], attempts, error, queue_for(work['priority'], work['bot_id']))
+            await redis_client.ack_from_queue(work['queue'], work['id'])
+            metrics.increment('worker_dead_lettered')
+            print(f"💀 Update do bot {work['bot_id']} enviado para a fila de mortos após {attempts} tentativas")
+            return
+        
+        delay = self.retries.schedule(work, attempts, error)
+        print(f"🔁 Tentativa {attempts} falhou para o bot {work['bot_id']}, nova tentativa em {delay:.1f}s")
+    
+    async def requeue(self, work: dict, attempts: int, error: str):
+        """Devolver o update à fila da classe com o número de tentativas e as etapas já enviadas"""
+        payload = UpdateEnvelope.reencode(
+            work['payload'],
+            attempts=attempts or None,
+            error=error[:500] if error else None,
+            progress=work['progress'] or None
+        )
+        await redis_client.add_to_queue(queue_for(work['priority'], work['bot_id']), payload)
+        await redis_client.ack_from_queue(work['queue'], work['id'])
+    
+    async def release(self, works: list):
+        """Devolver itens não iniciados à fila de onde vieram, sem esperar o reclaim"""
+        by_queue = {}
+        for work in works:
+            by_queue.setdefault(work['queue'], []).append({'id': work['id'], 'payload': work['payload']})
+        for queue_name, items in by_queue.items():
+            try:
+                await redis_client.release_to_queue(queue_name, items)
+            except Exception as e:
+                print(f"❌ Erro ao devolver itens para {queue_name}: {str(e)}")
+    
+    async def reclaim_loop(self):
+        """Recuperar periodicamente itens de consumidores que morreram"""
+        while self.running:
+            await asyncio.sleep(settings.QUEUE_RECLAIM_INTERVAL)
+            try:
+                claimed = 0
+                for queue_name in update_queues(self.partitions):
+                    claimed += await redis_client.reclaim_from_queue(queue_name, settings.QUEUE_RECLAIM_IDLE_MS)
+                claimed += await self.adopt_spilled()
+                if claimed:
+                    print(f"♻️ {claimed} itens recuperados de consumidores parados")
+            except Exception as e:
+                print(f"❌ Erro no reclaim: {str(e)}")
+    
+    async def lease_loop(self):
+        """Renovar a reserva dos itens retirados e ainda sem ack (janela, lanes, retentativas)
+        
+        Um terço do idle do reclaim (e visibility timeout do SQLite): com
+        backlog o item pode esperar na memória mais que isso, e sem renovação
+        voltaria para a fila e seria processado duas vezes.
+        """
+        interval = settings.QUEUE_RECLAIM_IDLE_MS / 3000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                renewed = await redis_client.renew_queue_leases(interval)
+                if renewed:
+                    metrics.increment('queue_leases_renewed', renewed)
+            except Exception as e:
+                print(f"❌ Erro ao renovar reservas da fila: {str(e)}")
+    
+    async def adopt_spilled(self) -> int:
+        """Retomar filas próprias de bots deixadas por workers anteriores"""
+        claimed = 0
+        for scheduler in self.scheduler.classes:
+            for name in await redis_client.list_queues(scheduler.spill_prefix):
+                # Excedente de bots de outras partições fica com o processo dono
+                if not self.owns(name[len(scheduler.spill_prefix):]):
+                    continue
+                claimed += await redis_client.reclaim_from_queue(name, settings.QUEUE_RECLAIM_IDLE_MS)
+                if await redis_client.get_queue_length(name):
+                    scheduler.adopt(name[len(scheduler.spill_prefix):])
+        return claimed
+    
+    async def metrics_loop(self):
+        """Amostrar ocupação das lanes e tamanho da fila"""
+        while self.running:
+            await asyncio.sleep(settings.WORKER_METRICS_INTERVAL)
+            try:
+                occupancy = self.dispatcher.occupancy()
+                scheduling = self.scheduler.stats()
+                await self.queue_depth()
+                print(
+                    f"📈 Lanes: {occupancy['busy']}/{occupancy['concurrency']} ocupadas ({occupancy['lanes']} no total), "
+                    f"{sum(occupancy['queued'])} aguardando, "
+                    f"utilização {occupancy['utilization'] * 100:.0f}% | "
+                    f"{scheduling['buffered']} na janela {scheduling['by_class']} de {scheduling['active_bots']} bots, "
+                    f"{scheduling['spilled_bots']} com excedente"
+                )
+            except Exception as e:
+                print(f"❌ Erro nas métricas: {str(e)}")
+    
+    async def queue_depth(self) -> int:
+        """Backlog das filas das partições deste processo"""
+        depth = 0
+        for queue_name in update_queues(self.partitions):
+            length = await redis_client.get_queue_length(queue_name)
+            metrics.gauge(f'queue_depth:{queue_name}', length)
+            depth += length
+        metrics.gauge('queue_depth', depth)
+        return depth
+    
+    async def serve_metrics(self, port: int):
+        """Expor GET /metrics no worker avulso (no embutido use /api/metrics)"""
+        from aiohttp import web
+        
+        async def handle(request):
+            return web.json_response(metrics.snapshot())
+        
+        app = web.Application()
+        app.router.add_get('/metrics', handle)
+        self.metrics_runner = web.AppRunner(app)
+        await self.metrics_runner.setup()
+        await web.TCPSite(self.metrics_runner, '0.0.0.0', port).start()
+        print(f"📈 Métricas do worker em http://0.0.0.0:{port}/metrics")
+    
+    async def start(self):
+        """Iniciar tasks de processamento (também usado pelo worker embutido)"""
+        self.running = True
+        
+        # Lanes por (bot, chat): ordem dentro do chat, chats em paralelo
+        if settings.WORKER_AUTOSCALE:
+            # Lanes fixas no máximo (chat sempre na mesma lane); o autoscaler muda quantas executam
+            lanes = settings.WORKER_MAX_CONCURRENCY
+            concurrency = max(settings.WORKER_MIN_CONCURRENCY, min(settings.WORKER_CONCURRENCY, lanes))
+        else:
+            lanes = concurrency = settings.WORKER_CONCURRENCY
+        self.dispatcher = Dispatcher(
+            self.handle_work,
+            lanes=lanes,
+            lane_depth=settings.WORKER_LANE_DEPTH,
+            concurrency=concurrency
+        )
+        self.dispatcher.start()
+        print(f"✅ {lanes} lanes iniciadas ({concurrency} em execução simultânea)")
+        
+        if settings.WORKER_AUTOSCALE:
+            self.autoscaler = Autoscaler(
+                self.dispatcher,
+                self.queue_depth,
+                minimum=settings.WORKER_MIN_CONCURRENCY,
+                maximum=lanes,
+                target_lag_ms=settings.WORKER_TARGET_LAG_MS,
+                interval=settings.WORKER_AUTOSCALE_INTERVAL,
+                scale_down_delay=settings.WORKER_SCALE_DOWN_DELAY
+            )
+            self.autoscaler.start()
+        
+        # Uma classe por fila de prioridade, cada uma com sub-filas por bot
+        ready = asyncio.Event()
+        weights = parse_weights(settings.WORKER_BOT_WEIGHTS)
+        self.scheduler = PriorityScheduler(
+            [
+                FairScheduler(
+                    queue_name,
+                    partial(self.prepare_item, priority=priority),
+                    capacity=settings.WORKER_PREFETCH,
+                    bot_prefetch=settings.WORKER_BOT_PREFETCH,
+                    weights=weights,
+                    ready=ready
+                )
+                for priority, queue_name in enumerate(UPDATE_QUEUES)
+            ],
+            starvation_limit=settings.WORKER_STARVATION_LIMIT,
+            ready=ready
+        )
+        self.scheduler.start()
+        
+        # Espera menor que o visibility timeout: o original sem ack não reaparece antes da hora
+        self.retries = RetryScheduler(
+            self.requeue,
+            base_delay=settings.RETRY_BASE_DELAY,
+            max_delay=min(settings.RETRY_MAX_DELAY, settings.QUEUE_RECLAIM_IDLE_MS / 2000)
+        )
+        self.retries.start()
+        try:
+            await self.adopt_spilled()
+        except Exception as e:
+            print(f"❌ Erro ao retomar filas por bot: {str(e)}")
+        
+        for partition in self.partitions:
+            for priority in range(len(UPDATE_QUEUES)):
+                queue_name = partition_queue(priority, partition)
+                self.tasks.append(asyncio.create_task(self.process_queue(priority, queue_name)))
+        self.schedule_task = asyncio.create_task(self.schedule_loop())
+        self.reclaim_task = asyncio.create_task(self.reclaim_loop())
+        self.lease_task = asyncio.create_task(self.lease_loop())
+        self.metrics_task = asyncio.create_task(self.metrics_loop())
+        statistics_rollup.start()
+    
+    async def stop(self, drain_timeout: float = None):
+        """Parar o worker em tempo limitado
+        
+        Para de ler e de entregar às lanes, dá até `drain_timeout` segundos
+        para os updates em execução terminarem e devolve o resto: o que não
+        começou volta para a fila como estava, o que foi interrompido volta
+        com as etapas já enviadas (`progress`) para não repetir a sequência.
+        """
+        if drain_timeout is None:
+            drain_timeout = settings.WORKER_DRAIN_TIMEOUT
+        started = time.monotonic()
+        self.running = False
+        for task in (self.reclaim_task, self.metrics_task):
+            if task:
+                task.cancel()
+        if self.autoscaler:
+            await self.autoscaler.stop()
+        
+        # Leitores parados na janela cheia saem na próxima volta
+        if self.scheduler:
+            self.scheduler.stop_intake()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        
+        unstarted, interrupted = [], []
+        if self.schedule_task:
+            # Com as lanes cheias o escalonador fica preso em dispatch e a drenagem não começaria
+            if self.dispatching is not None:
+                self.schedule_task.cancel()
+            await asyncio.gather(self.schedule_task, return_exceptions=True)
+            if self.dispatching is not None:
+                unstarted.append(self.dispatching)
+                self.dispatching = None
+        
+        if self.dispatcher:
+            inflight = sum(work is not None for work in self.dispatcher.current)
+            print(f"⏳ Aguardando {inflight} updates em execução (até {drain_timeout:.0f}s)")
+            waiting, interrupted = await self.dispatcher.shutdown(drain_timeout)
+            unstarted.extend(waiting)
+        
+        # Excedente vai para o broker; a janela em memória volta para a fila de origem
+        if self.scheduler:
+            await self.scheduler.close()
+            unstarted.extend(self.scheduler.drain_items())
+        await self.release(unstarted)
+        
+        for work in interrupted:
+            try:
+                await self.requeue(work, work['attempts'], '')
+            except Exception as e:
+                # Sem ack o item volta pelo reclaim / visibility timeout
+                print(f"❌ Erro ao devolver update interrompido: {str(e)}")
+        metrics.increment('worker_drain_released', len(unstarted))
+        metrics.increment('worker_drain_interrupted', len(interrupted))
+        
+        # Respostas em envio terminam (no restante do prazo); o que não sair volta com o progresso
+        await chat_sender.close(max(drain_timeout - (time.monotonic() - started), 1))
+        if self.deliveries:
+            await asyncio.gather(*self.deliveries, return_exceptions=True)
+        
+        # Reservas renovadas até a drenagem terminar
+        if self.lease_task:
+            self.lease_task.cancel()
+            await asyncio.gather(self.lease_task, return_exceptions=True)
+            self.lease_task = None
+        
+        # Retentativas pendentes voltam já para a fila
+        if self.retries:
+            await self.retries.flush()
+        
+        # Interações ainda em memória vão para o banco antes de sair
+        await interaction_buffer.close()
+        await stats_aggregator.close()
+        await statistics_rollup.stop()
+        
+        print(
+            f"🧹 Drenagem em {time.monotonic() - started:.1f}s: "
+            f"{len(unstarted)} devolvidos, {len(interrupted)} interrompidos"
+        )
+        if self.metrics_runner:
+            await self.metrics_runner.cleanup()
+            self.metrics_runner = None
+    
     async def run(self):
         """Executar worker"""
+        self.loop = asyncio.get_running_loop()
+        
         # Configurar signal handlers
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
@@ -56,15 +497,15 @@ class Worker:
         print("🔄 Conectando ao sistema...")
         await redis_client.connect()
         
-        # Criar múltiplas tasks para processar em paralelo
-        tasks = []
-        for i in range(3):  # 3 workers paralelos
-            print(f"✅ Worker {i+1} iniciado")
-            task = asyncio.create_task(self.process_queue())
-            tasks.append(task)
+        if settings.WORKER_METRICS_PORT:
+            await self.serve_metrics(settings.WORKER_METRICS_PORT)
+        
+        await self.start()
         
         # Aguardar todas as tasks
-        await asyncio.gather(*tasks)
+        await asyncio.gather(*self.tasks)
+        await self.stop()
+        await redis_client.close()
         
         print("✅ Worker encerrado")
 
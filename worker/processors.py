@@ -1,40 +1,65 @@
-from typing import Dict
+from typing import Dict, List
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.bot.webhook import WebhookHandler
 from app.bot.manager import BotManager
+from app.bot.responses import ResponseBuilder
 from app.bot.telegram_api import telegram_api
-from app.database.crud import BotCRUD, InteractionCRUD
+from app.bot.sender import chat_sender
+from app.redis.client import redis_client
+from app.redis.envelope import UpdateEnvelope, PRIORITY_BACKGROUND, queue_for
+from app.database.crud import BotCRUD
+from app.database.connection import AsyncSessionLocal
+from app.database.buffers import interaction_buffer, stats_aggregator
 from app.utils.rate_limiter import rate_limiter
 from app.redis.cache import cache_manager
+from functools import partial
 import json
-import asyncio
 
 class MessageProcessor:
-    async def process_update(self, db: AsyncSession, bot_id: str, update: Dict):
-        """Processar update do Telegram"""
+    async def process_update(self, db: AsyncSession, bot_id: str, update: Dict, defer_bookkeeping: bool = False,
+                             progress: Dict = None, deliveries: List = None) -> bool:
+        """Processar update do Telegram (True quando o item pode ser confirmado na fila)
+        
+        Com `defer_bookkeeping`, o registro da interação e as estatísticas vão
+        para a fila de baixa prioridade em vez de atrasar a resposta. Erros são
+        registrados em `last_error` e repassados para o worker agendar a
+        retentativa. `progress` guarda as etapas já enviadas: em uma nova
+        tentativa (ou após desligamento) a sequência continua de onde parou.
+        Os envios entregues ao `chat_sender` vão para `deliveries`; o item só
+        pode ser confirmado depois deles.
+        """
+        progress = progress if progress is not None else {}
+        deliveries = deliveries if deliveries is not None else []
         try:
             print(f"🔍 Processando update para bot {bot_id}")
             
             # Verificar rate limit
             if not await rate_limiter.is_allowed(bot_id):
                 print(f"⚠️ Rate limit excedido para bot {bot_id}")
-                return
+                return True
             
             # Extrair informações do update
             info = await WebhookHandler.extract_update_info(update)
             
             if not info['type']:
-                return
+                return True
             
             print(f"📝 Tipo: {info['type']}, Comando: {info.get('text')}")
             
-            # Registrar interação
-            await self._register_interaction(db, bot_id, info)
+            # Registrar interação (uma vez: a retentativa de um envio não duplica)
+            booked = progress.get('booked', False)
+            if not defer_bookkeeping and not booked:
+                await self._register_interaction(db, bot_id, info)
             
             # Processar comando /start
             if info['type'] == 'message' and info['text'] == '/start':
                 print(f"🚀 Processando comando /start")
-                await self._handle_start_command(db, bot_id, info['chat_id'])
+                await self._handle_start_command(db, bot_id, info['chat_id'], progress, deliveries)
+            
+            # Processar seleção de plano
+            elif info['type'] == 'callback_query' and (info['callback_data'] or '').startswith('buy_plan_'):
+                print(f"💰 Processando seleção de plano")
+                await self._handle_buy_plan_callback(db, bot_id, info, progress, deliveries)
             
             # Processar callback de planos
             elif info['type'] == 'callback_query' and info['callback_data'] == 'view_plans':
@@ -42,15 +67,46 @@ class MessageProcessor:
                 await self._handle_plans_callback(db, bot_id, info)
             
             # Incrementar estatísticas
-            await BotCRUD.increment_stats(db, bot_id, 'total_messages')
+            if not booked:
+                if defer_bookkeeping:
+                    await self._defer_bookkeeping(bot_id, update)
+                else:
+                    stats_aggregator.increment(bot_id)
+                progress['booked'] = True
             
             print(f"✅ Update processado com sucesso!")
-            
+            return True
+        
         except Exception as e:
             print(f"❌ Erro ao processar update: {str(e)}")
             import traceback
             traceback.print_exc()
-            await BotCRUD.update_bot(db, bot_id, {'last_error': str(e)})
+            try:
+                await db.rollback()
+                await BotCRUD.update_bot(db, bot_id, {'last_error': str(e)})
+            except Exception as record_error:
+                print(f"❌ Erro ao registrar last_error: {str(record_error)}")
+            raise
+    
+    async def process_bookkeeping(self, db: AsyncSession, bot_id: str, update: Dict) -> bool:
+        """Registrar interação e estatísticas adiadas de um update já respondido"""
+        try:
+            info = await WebhookHandler.extract_update_info(update)
+            if not info['type']:
+                return True
+            
+            await self._register_interaction(db, bot_id, info)
+            stats_aggregator.increment(bot_id)
+            return True
+        
+        except Exception as e:
+            print(f"❌ Erro ao registrar interação adiada: {str(e)}")
+            raise
+    
+    async def _defer_bookkeeping(self, bot_id: str, update: Dict):
+        """Enfileirar o registro da interação na fila de baixa prioridade"""
+        payload = UpdateEnvelope.encode(bot_id, UpdateEnvelope.dump_update(update), deferred=True)
+        await redis_client.add_to_queue(queue_for(PRIORITY_BACKGROUND, bot_id), payload)
     
     async def _register_interaction(self, db: AsyncSession, bot_id: str, info: Dict):
         """Registrar interação do usuário"""
@@ -59,16 +115,24 @@ class MessageProcessor:
             'user_id': info['user_id'],
             'username': info.get('username'),
             'first_name': info.get('first_name'),
-            'command': info['text'] if info.get('text', '').startswith('/') else None,
+            'command': info['text'] if (info.get('text') or '').startswith('/') else None,
             'callback_data': info.get('callback_data'),
             'message_text': info.get('text')
         }
         
-        await InteractionCRUD.create_interaction(db, interaction_data)
+        # Write-behind: entra no próximo INSERT em lote
+        await interaction_buffer.add(interaction_data)
         print(f"📊 Interação registrada: {info['username']} - {info.get('text')}")
     
-    async def _handle_start_command(self, db: AsyncSession, bot_id: str, chat_id: str):
-        """Processar comando /start"""
+    async def _handle_start_command(self, db: AsyncSession, bot_id: str, chat_id: str, progress: Dict = None,
+                                    deliveries: List = None):
+        """Processar comando /start (etapa i = passo i do `ResponseBuilder.start_plan`)
+        
+        A resposta vira uma sequência de envios entregue ao `chat_sender`: a
+        ordem no chat é mantida por ele e o ritmo pelos limites do Telegram,
+        sem segurar a lane esperando. Cada passo enviado avança
+        `progress['sent']`; o future da sequência vai para `deliveries`.
+        """
         print(f"💬 Enviando resposta para chat_id: {chat_id}")
         
         # Buscar configuração do bot (com cache)
@@ -79,82 +143,78 @@ class MessageProcessor:
             return
         
         token = config['token']
+        progress = progress if progress is not None else {}
+        sent = progress.get('sent', 0)
         
-        try:
-            # 1. Enviar mídia (se configurada)
-            if config.get('media_url'):
-                print(f"📸 Enviando mídia: {config['media_url']}")
-                if config.get('media_type') == 'video':
-                    await telegram_api.send_video(token, chat_id, config['media_url'])
-                else:
-                    await telegram_api.send_photo(token, chat_id, config['media_url'])
-                
-                await asyncio.sleep(0.5)
-            
-            # 2. Preparar botões dos PLANOS
-            plans = config.get('plans', [])
-            reply_markup = None
-            
-            if plans and len(plans) > 0:
-                keyboard = []
-                
-                for i, plan in enumerate(plans):
-                    if isinstance(plan, dict):
-                        plan_text = f"💎 {plan.get('name', 'Plano')} - R$ {plan.get('value', '0')} ({plan.get('days', '30')} dias)"
-                    else:
-                        plan_text = str(plan)
-                    
-                    keyboard.append([{
-                        'text': plan_text,
-                        'callback_data': f'buy_plan_{i}'
-                    }])
-                
-                reply_markup = {'inline_keyboard': keyboard}
-            
-            # 3. Enviar mensagens com botões dos planos
-            has_message_1 = config.get('message_1')
-            has_message_2 = config.get('message_2')
-            
-            if has_message_1 and has_message_2:
-                print(f"💬 Enviando mensagem 1")
-                await telegram_api.send_message(token, chat_id, config['message_1'])
-                await asyncio.sleep(0.5)
-                
-                if reply_markup:
-                    print(f"💬 Enviando mensagem 2 com planos")
-                    await telegram_api.send_message(token, chat_id, config['message_2'], reply_markup)
-                else:
-                    print(f"💬 Enviando mensagem 2")
-                    await telegram_api.send_message(token, chat_id, config['message_2'])
-                
-            elif has_message_1:
-                if reply_markup:
-                    print(f"💬 Enviando mensagem 1 com planos")
-                    await telegram_api.send_message(token, chat_id, config['message_1'], reply_markup)
-                else:
-                    print(f"💬 Enviando mensagem 1")
-                    await telegram_api.send_message(token, chat_id, config['message_1'])
-                
-            elif has_message_2:
-                if reply_markup:
-                    print(f"💬 Enviando mensagem 2 com planos")
-                    await telegram_api.send_message(token, chat_id, config['message_2'], reply_markup)
-                else:
-                    print(f"💬 Enviando mensagem 2")
-                    await telegram_api.send_message(token, chat_id, config['message_2'])
-                    
-            elif reply_markup:
-                # Sem texto mas com planos
-                print(f"💎 Enviando apenas planos")
-                await telegram_api.send_message(token, chat_id, "📋 *Escolha seu plano:*", reply_markup)
+        # Mídia (com a primeira mensagem de legenda quando cabe) e mensagens com botões dos planos
+        plan = ResponseBuilder.start_plan(config)
+        steps = []
+        for i, step in enumerate(plan):
+            if i < sent:
+                # Já enviado antes da interrupção
+                continue
+            if step['media']:
+                send = partial(self._send_start_step, bot_id, chat_id, config, step)
             else:
-                print(f"📸 Apenas mídia enviada")
-            
-            print(f"✅ Comando /start processado com sucesso!")
-            
-        except Exception as e:
-            print(f"❌ Erro ao enviar mensagens: {str(e)}")
-            raise
+                send = partial(telegram_api.send_message, token, chat_id, step['text'], step['reply_markup'])
+            steps.append(partial(self._checkpoint, send, progress, i + 1))
+        
+        delivery = await chat_sender.submit(f"{bot_id}:{chat_id}", steps)
+        if delivery is not None and deliveries is not None:
+            deliveries.append(delivery)
+        print(f"✅ Comando /start entregue para envio ({len(steps)} envios)")
+    
+    @staticmethod
+    async def _checkpoint(send, progress: Dict, sent: int):
+        """Executar um envio e, se saiu, marcar as `sent` primeiras etapas como enviadas"""
+        result = await send()
+        if result is not None and result is not False:
+            progress['sent'] = sent
+        return result
+    
+    @staticmethod
+    async def _send_start_step(bot_id: str, chat_id: str, config: Dict, step: Dict) -> bool:
+        """Passo de mídia do /start (sessão própria: roda depois da lane liberar a dela)"""
+        async with AsyncSessionLocal() as db:
+            return await BotManager.send_start_step(db, bot_id, chat_id, config, step)
+    
+    async def _handle_buy_plan_callback(self, db: AsyncSession, bot_id: str, info: Dict, progress: Dict = None,
+                                        deliveries: List = None):
+        """Processar seleção de plano (buy_plan_N; etapa 0 = callback respondido, 1 = mensagem enviada)"""
+        config = await BotManager.get_bot_config(db, bot_id)
+        
+        if not config:
+            return
+        
+        token = config['token']
+        plan_index = int(info['callback_data'].replace('buy_plan_', ''))
+        message = ResponseBuilder.plan_selected_text(config.get('plans', []), plan_index)
+        
+        if not message:
+            return
+        
+        progress = progress if progress is not None else {}
+        if progress.get('sent', 0) >= 2:
+            return
+        
+        if progress.get('sent', 0) < 1:
+            await telegram_api.answer_callback_query(
+                token,
+                info['callback_id'],
+                "Plano selecionado!",
+                show_alert=False
+            )
+            progress['sent'] = 1
+        
+        # Mesmo caminho do /start: não passa na frente de mensagens ainda na fila do chat
+        send = partial(telegram_api.send_message, token, info['chat_id'], message)
+        delivery = await chat_sender.submit(
+            f"{bot_id}:{info['chat_id']}",
+            [partial(self._checkpoint, send, progress, 2)]
+        )
+        if delivery is not None and deliveries is not None:
+            deliveries.append(delivery)
+        print(f"💰 Seleção de plano respondida")
     
     async def _handle_plans_callback(self, db: AsyncSession, bot_id: str, info: Dict):
         """Processar callback de visualizar planos"""
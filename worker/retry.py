@@ -0,0 +1,84 @@
+from typing import Awaitable, Callable, Dict, List, Tuple
+from app.utils.metrics import metrics
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+class RetryScheduler:
+    """Retentativas agendadas em heap por horário (O(log n) por item)
+    
+    O item original continua sem ack enquanto espera; quando o horário chega
+    `requeue` devolve o update à fila da classe com `attempts` atualizado.
+    """
+    
+    def __init__(self, requeue: Callable[[Dict, int, str], Awaitable[None]], base_delay: float, max_delay: float):
+        self.requeue = requeue
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.heap: List[Tuple] = []
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task = None
+    
+    def __len__(self) -> int:
+        return len(self.heap)
+    
+    def delay_for(self, attempts: int) -> float:
+        """Backoff exponencial com jitter: metade fixa + metade aleatória"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** min(attempts - 1, 30)))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+    
+    def schedule(self, work: Dict, attempts: int, error: str) -> float:
+        """Agendar nova tentativa; retorna o atraso escolhido"""
+        delay = self.delay_for(attempts)
+        heapq.heappush(self.heap, (time.monotonic() + delay, next(self._seq), work, attempts, error))
+        self._wake.set()
+        metrics.increment('retry_scheduled')
+        metrics.gauge('retry_pending', len(self.heap))
+        return delay
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while True:
+            if not self.heap:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            
+            delay = self.heap[0][0] - time.monotonic()
+            if delay > 0:
+                # Acorda antes se entrar um item com horário mais cedo
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            due, seq, work, attempts, error = heapq.heappop(self.heap)
+            try:
+                await self.requeue(work, attempts, error)
+            except Exception as e:
+                print(f"❌ Erro ao reenfileirar retentativa: {str(e)}")
+                heapq.heappush(self.heap, (time.monotonic() + 1, seq, work, attempts, error))
+            metrics.gauge('retry_pending', len(self.heap))
+    
+    async def flush(self):
+        """Parar o timer e devolver já tudo o que está agendado"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        
+        while self.heap:
+            _, _, work, attempts, error = heapq.heappop(self.heap)
+            try:
+                await self.requeue(work, attempts, error)
+            except Exception as e:
+                # Sem ack o item volta pelo reclaim / visibility timeout
+                print(f"❌ Erro ao reenfileirar retentativa: {str(e)}")
+        metrics.gauge('retry_pending', 0)
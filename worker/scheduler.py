@@ -0,0 +1,313 @@
+from typing import Callable, Dict, List, Optional
+from collections import deque
+from app.redis.client import redis_client
+from app.utils.metrics import metrics
+import asyncio
+
+def parse_weights(raw: str) -> Dict[str, float]:
+    """Pesos por bot no formato 'bot_id:peso,bot_id:peso'"""
+    weights = {}
+    for entry in (raw or '').split(','):
+        if ':' not in entry:
+            continue
+        bot_id, weight = entry.rsplit(':', 1)
+        try:
+            weights[bot_id.strip()] = max(float(weight), 0.01)
+        except ValueError:
+            print(f"⚠️ Peso inválido ignorado: {entry}")
+    return weights
+
+class FairScheduler:
+    """Sub-fila por bot com deficit round robin entre os bots
+    
+    Cada bot guarda até `bot_prefetch` itens em memória; o excedente vai para a
+    fila própria do bot no broker e volta conforme a sub-fila esvazia. Assim a
+    leitura da fila compartilhada nunca fica presa atrás do bot que está em pico
+    e os demais bots entram na rodada assim que chegam. O excedente é gravado em
+    lote por uma task própria, sem segurar a leitura a cada item.
+    """
+    
+    def __init__(self, queue_name: str, prepare: Callable[[Dict, str], Optional[Dict]], capacity: int,
+                 bot_prefetch: int, weights: Dict[str, float] = None, ready: asyncio.Event = None):
+        self.queue_name = queue_name
+        self.spill_prefix = f"{queue_name}:bot:"
+        self.prepare = prepare
+        self.capacity = capacity
+        self.bot_prefetch = bot_prefetch
+        self.weights = weights or {}
+        self.queues: Dict[str, deque] = {}
+        self.deficit: Dict[str, float] = {}
+        self.active: deque = deque()
+        self.spilled: Dict[str, int] = {}
+        self._spill_buffer: Dict[str, List[Dict]] = {}
+        self._spill_pending = 0
+        self._spill_flushing = None
+        self._spill_wake = asyncio.Event()
+        self._spill_room = asyncio.Event()
+        self._spill_room.set()
+        self._spill_task = None
+        self.size = 0
+        self.closed = False
+        self._ready = ready or asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+    
+    def start(self):
+        """Iniciar a task que grava o excedente no broker"""
+        self._spill_task = asyncio.create_task(self._spill_loop())
+    
+    async def close(self):
+        """Gravar o excedente pendente e parar a task"""
+        if self._spill_task:
+            self._spill_task.cancel()
+            await asyncio.gather(self._spill_task, return_exceptions=True)
+            self._spill_task = None
+        await self._flush_spill()
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def spill_queue(self, bot_id: str) -> str:
+        return f"{self.spill_prefix}{bot_id}"
+    
+    def _append(self, work: Dict):
+        bot_id = work['bot_id']
+        if bot_id not in self.queues:
+            self.queues[bot_id] = deque()
+            self.deficit[bot_id] = 0.0
+            self.active.append(bot_id)
+        self.queues[bot_id].append(work)
+        self.size += 1
+        self._ready.set()
+        if self.size >= self.capacity:
+            self._space.clear()
+    
+    async def put(self, work: Dict):
+        """Receber item da fila compartilhada (excedente do bot vai para a fila dele)"""
+        bot_id = work['bot_id']
+        queue = self.queues.get(bot_id)
+        
+        if bot_id in self.spilled or (queue is not None and len(queue) >= self.bot_prefetch):
+            self.spilled[bot_id] = self.spilled.get(bot_id, 0) + 1
+            self._spill_buffer.setdefault(bot_id, []).append(work)
+            self._spill_pending += 1
+            self._spill_wake.set()
+            
+            # Broker lento segura a leitura em vez de acumular excedente sem limite
+            if self._spill_pending >= self.capacity and not self.closed:
+                self._spill_room.clear()
+                await self._spill_room.wait()
+            return
+        
+        # O refill pode passar da capacidade: o evento aceso não basta, vale o tamanho
+        while self.size >= self.capacity and not self.closed:
+            self._space.clear()
+            await self._space.wait()
+        self._append(work)
+    
+    def stop_intake(self):
+        """Liberar leitores parados na janela cheia (desligamento: o item entra e é devolvido depois)"""
+        self.closed = True
+        self._space.set()
+        self._spill_room.set()
+    
+    def drain_items(self) -> List[Dict]:
+        """Retirar tudo o que está na janela em memória (para devolver à fila)"""
+        works = [work for queue in self.queues.values() for work in queue]
+        self.queues.clear()
+        self.deficit.clear()
+        self.active.clear()
+        self.size = 0
+        self._space.set()
+        return works
+    
+    async def _spill_loop(self):
+        while True:
+            await self._spill_wake.wait()
+            self._spill_wake.clear()
+            try:
+                await self._flush_spill()
+            except Exception as e:
+                print(f"❌ Erro ao gravar excedente: {str(e)}")
+                await asyncio.sleep(1)
+                self._spill_wake.set()
+    
+    async def _flush_spill(self):
+        """Gravar o excedente de cada bot em lote e só então confirmar na fila compartilhada"""
+        while self._spill_buffer:
+            bot_id = next(iter(self._spill_buffer))
+            works = self._spill_buffer.pop(bot_id)
+            self._spill_flushing = bot_id
+            try:
+                await redis_client.add_many_to_queue(self.spill_queue(bot_id), [work['payload'] for work in works])
+            except Exception:
+                # Devolver na frente para manter a ordem do bot
+                self._spill_buffer[bot_id] = works + self._spill_buffer.get(bot_id, [])
+                raise
+            finally:
+                self._spill_flushing = None
+            
+            by_queue: Dict[str, List] = {}
+            for work in works:
+                by_queue.setdefault(work['queue'], []).append(work['id'])
+            for queue_name, ids in by_queue.items():
+                await redis_client.ack_many_from_queue(queue_name, ids)
+            
+            self._spill_pending -= len(works)
+            metrics.increment('scheduler_spilled', len(works))
+            self._spill_room.set()
+            self._ready.set()
+    
+    def adopt(self, bot_id: str):
+        """Passar a ler a fila própria de um bot (itens de um worker anterior)"""
+        self.spilled.setdefault(bot_id, 0)
+    
+    async def refill(self):
+        """Trazer de volta o excedente dos bots cuja sub-fila esvaziou"""
+        for bot_id in list(self.spilled):
+            queue = self.queues.get(bot_id)
+            missing = self.bot_prefetch - (len(queue) if queue else 0)
+            if missing < self.bot_prefetch // 2:
+                continue
+            
+            name = self.spill_queue(bot_id)
+            while missing > 0:
+                item = await redis_client.get_from_queue(name, timeout=0)
+                if not item:
+                    # Fila do bot vazia: novos itens voltam direto para a memória
+                    if bot_id not in self._spill_buffer and bot_id != self._spill_flushing:
+                        self.spilled.pop(bot_id, None)
+                    break
+                
+                work = self.prepare(item, name)
+                if work is None:
+                    await redis_client.ack_from_queue(name, item['id'])
+                    continue
+                self._append(work)
+                missing -= 1
+                metrics.increment('scheduler_refilled')
+    
+    def _weight(self, bot_id: str) -> float:
+        return self.weights.get(bot_id, 1.0)
+    
+    def take(self) -> Dict:
+        """Próximo item pela rodada DRR (custo 1 por update)"""
+        while True:
+            bot_id = self.active[0]
+            if self.deficit[bot_id] < 1:
+                self.deficit[bot_id] += self._weight(bot_id)
+                if self.deficit[bot_id] < 1:
+                    # Peso fracionário: acumula até a próxima volta
+                    self.active.rotate(-1)
+                    continue
+            
+            queue = self.queues[bot_id]
+            work = queue.popleft()
+            self.deficit[bot_id] -= 1
+            self.size -= 1
+            if self.size < self.capacity:
+                self._space.set()
+            
+            if not queue:
+                # Bot sem itens sai da rodada e perde o crédito acumulado
+                self.active.popleft()
+                del self.queues[bot_id]
+                del self.deficit[bot_id]
+            elif self.deficit[bot_id] < 1:
+                self.active.rotate(-1)
+            return work
+    
+    def stats(self) -> Dict:
+        """Backlog em memória, bots na rodada e bots com excedente no broker"""
+        snapshot = {
+            'buffered': self.size,
+            'active_bots': len(self.active),
+            'spilled_bots': len(self.spilled)
+        }
+        metrics.gauge(f'scheduler_buffered:{self.queue_name}', snapshot['buffered'])
+        metrics.gauge(f'scheduler_active_bots:{self.queue_name}', snapshot['active_bots'])
+        metrics.gauge(f'scheduler_spilled_bots:{self.queue_name}', snapshot['spilled_bots'])
+        return snapshot
+
+class PriorityScheduler:
+    """Prioridade estrita entre classes (0 primeiro), com proteção contra inanição
+    
+    Uma classe com itens que foi preterida `starvation_limit` vezes seguidas
+    passa na frente uma vez, então as classes baixas recebem ao menos um item a
+    cada `starvation_limit + 1` entregas mesmo sob pico das classes altas.
+    """
+    
+    def __init__(self, classes: List[FairScheduler], starvation_limit: int, ready: asyncio.Event):
+        self.classes = classes
+        self.starvation_limit = starvation_limit
+        self.skipped = [0] * len(classes)
+        self._ready = ready
+    
+    def __len__(self) -> int:
+        return sum(len(scheduler) for scheduler in self.classes)
+    
+    def start(self):
+        for scheduler in self.classes:
+            scheduler.start()
+    
+    async def close(self):
+        for scheduler in self.classes:
+            await scheduler.close()
+    
+    def stop_intake(self):
+        for scheduler in self.classes:
+            scheduler.stop_intake()
+    
+    def drain_items(self) -> List[Dict]:
+        """Itens de todas as classes ainda não entregues às lanes"""
+        return [work for scheduler in self.classes for work in scheduler.drain_items()]
+    
+    def _pick(self) -> Optional[int]:
+        waiting = [priority for priority, scheduler in enumerate(self.classes) if scheduler.size]
+        if not waiting:
+            return None
+        
+        chosen = waiting[0]
+        for priority in reversed(waiting[1:]):
+            if self.skipped[priority] >= self.starvation_limit:
+                chosen = priority
+                metrics.increment('scheduler_starvation_picks')
+                break
+        
+        for priority in waiting:
+            self.skipped[priority] = 0 if priority == chosen else self.skipped[priority] + 1
+        return chosen
+    
+    async def get(self, timeout: float = 1) -> Optional[Dict]:
+        """Próximo item pela prioridade da classe e, dentro dela, pela rodada entre bots"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        
+        while True:
+            for scheduler in self.classes:
+                if scheduler.spilled:
+                    await scheduler.refill()
+            
+            chosen = self._pick()
+            if chosen is not None:
+                return self.classes[chosen].take()
+            
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+    
+    def stats(self) -> Dict:
+        """Resumo das classes somadas"""
+        snapshots = [scheduler.stats() for scheduler in self.classes]
+        return {
+            'buffered': sum(snapshot['buffered'] for snapshot in snapshots),
+            'active_bots': sum(snapshot['active_bots'] for snapshot in snapshots),
+            'spilled_bots': sum(snapshot['spilled_bots'] for snapshot in snapshots),
+            'by_class': [snapshot['buffered'] for snapshot in snapshots]
+        }
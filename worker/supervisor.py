@@ -0,0 +1,157 @@
+import multiprocessing
+import asyncio
+import signal
+import time
+import sys
+import os
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from typing import Callable, List, Optional
+
+def run_worker(index: int, partitions: List[int]):
+    """Processo filho: um Worker com o loop próprio, dono das partições recebidas"""
+    from worker.main import Worker
+    
+    # Handlers herdados do supervisor: o Worker instala os próprios em run()
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    
+    # Cada filho expõe as métricas na porta base + índice
+    if settings.WORKER_METRICS_PORT:
+        settings.WORKER_METRICS_PORT += index
+    
+    print(f"🧩 Worker {index} (pid {os.getpid()}) com as partições {partitions}")
+    asyncio.run(Worker(partitions).run())
+
+class Supervisor:
+    """Processos de worker, cada um dono de um conjunto fixo de partições de bot_id
+    
+    O bot cai sempre na mesma partição (jump hash em `partition_of`) e a
+    partição sempre no mesmo processo, então caches por bot ficam quentes e a
+    ordem por chat se mantém. Filho que morre é recriado com as mesmas
+    partições; SIGTERM/SIGINT é repassado para os filhos drenarem.
+    """
+    
+    def __init__(self, processes: int = None, target: Callable = run_worker, args: tuple = ()):
+        partitions = max(settings.QUEUE_PARTITIONS, 1)
+        requested = processes or settings.WORKER_PROCESSES
+        if not requested:
+            # Padrão: um por núcleo, sem passar do número de partições
+            processes = min(os.cpu_count() or 1, partitions)
+        elif requested > partitions:
+            print(f"⚠️ {requested} processos para {partitions} partições: usando {partitions} (aumente QUEUE_PARTITIONS)")
+            processes = partitions
+        else:
+            processes = requested
+        
+        # Partição p fica com o processo p % n
+        self.assignments = [list(range(index, partitions, processes)) for index in range(processes)]
+        self.target = target
+        self.args = args
+        self.running = True
+        self.children: List[Optional[multiprocessing.Process]] = [None] * processes
+        self.started_at = [0.0] * processes
+        self.restart_at = [0.0] * processes
+        self.failures = [0] * processes
+        
+        # fork: o filho herda os módulos já importados; o backend da fila só é aberto depois
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+    
+    def signal_handler(self, sig, frame):
+        """Primeiro sinal drena os filhos; o segundo encerra na hora"""
+        if not self.running:
+            print("\n⛔ Encerrando workers imediatamente...")
+            self._signal_children(signal.SIGKILL if hasattr(signal, 'SIGKILL') else signal.SIGTERM)
+            return
+        
+        # O loop de run() sai e stop() repassa o SIGTERM
+        print("\n🔄 Encerrando workers...")
+        self.running = False
+    
+    def _signal_children(self, sig):
+        for process in self.children:
+            if process is not None and process.is_alive():
+                try:
+                    os.kill(process.pid, sig)
+                except ProcessLookupError:
+                    pass
+    
+    def _spawn(self, index: int):
+        process = self.context.Process(
+            target=self.target,
+            args=(index, self.assignments[index]) + self.args,
+            name=f"worker-{index}",
+            daemon=False
+        )
+        process.start()
+        self.children[index] = process
+        self.started_at[index] = time.monotonic()
+    
+    def start(self):
+        """Criar um processo por conjunto de partições"""
+        if settings.QUEUE_BACKEND == 'memory' and len(self.assignments) > 1:
+            raise RuntimeError("Fila em memória não é compartilhada entre processos: use QUEUE_BACKEND=redis ou sqlite")
+        
+        for index in range(len(self.assignments)):
+            self._spawn(index)
+        print(f"✅ {len(self.assignments)} processos de worker iniciados ({settings.QUEUE_PARTITIONS} partições)")
+    
+    def check(self):
+        """Recriar filhos que morreram (espera crescente se morrem logo após subir)"""
+        now = time.monotonic()
+        for index, process in enumerate(self.children):
+            if process is None:
+                if now >= self.restart_at[index]:
+                    self._spawn(index)
+                continue
+            
+            if process.is_alive():
+                continue
+            
+            process.join()
+            quick = now - self.started_at[index] < 30
+            self.failures[index] = self.failures[index] + 1 if quick else 0
+            delay = min(30, 2 ** (self.failures[index] - 1)) if quick else 0
+            
+            print(f"💥 Worker {index} (pid {process.pid}) saiu com código {process.exitcode}, reiniciando em {delay}s")
+            self.children[index] = None
+            self.restart_at[index] = now + delay
+    
+    def stop(self):
+        """Repassar SIGTERM e aguardar os filhos drenarem (prazo da drenagem + folga)"""
+        self.running = False
+        self._signal_children(signal.SIGTERM)
+        deadline = time.monotonic() + settings.WORKER_DRAIN_TIMEOUT + 10
+        for index, process in enumerate(self.children):
+            if process is None:
+                continue
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                print(f"⛔ Worker {index} (pid {process.pid}) não encerrou no prazo, finalizando")
+                process.kill()
+                process.join()
+        self.children = [None] * len(self.assignments)
+    
+    def run(self):
+        """Executar supervisor até SIGTERM/SIGINT"""
+        signal.signal(signal.SIGINT, self.signal_handler)
+        signal.signal(signal.SIGTERM, self.signal_handler)
+        
+        self.start()
+        while self.running:
+            time.sleep(0.5)
+            if self.running:
+                self.check()
+        
+        self.stop()
+        print("✅ Workers encerrados")
+
+if __name__ == "__main__":
+    print("="*50)
+    print("🤖 TELEGRAM BOT WORKER (SUPERVISOR)")
+    print("="*50)
+    Supervisor().run()